@@ -2,103 +2,465 @@
 Claude Code 可视化工具 Web 应用
 """
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+from markupsafe import Markup, escape
 from claude_parser import ClaudeDataParser
+from records import json_default
+import http_cache
+import metrics
+from datetime import datetime, timedelta
+import argparse
+import hashlib
+import json
+import multiprocessing
 import os
+import re
+import threading
+import time
+
+
+class RecordJSONProvider(DefaultJSONProvider):
+    """支持消息、历史记录等紧凑记录类型的 JSON 序列化"""
+
+    @staticmethod
+    def default(o):
+        try:
+            return json_default(o)
+        except TypeError:
+            return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs):
+        with metrics.stage('serialize'):
+            return super().dumps(obj, **kwargs)
+
 
 app = Flask(__name__)
-parser = ClaudeDataParser()
+app.json = RecordJSONProvider(app)
+http_cache.init_app(app)
+metrics.init_app(app)
+# Claude 目录可通过环境变量 CLAUDE_VIS_CLAUDE_DIR 指定（生产模式 serve.py 的 --claude-dir）
+parser = ClaudeDataParser(os.environ.get('CLAUDE_VIS_CLAUDE_DIR'))
+
+# 对话详情每次返回的消息数，以及未指定 full=1 时每条消息内容保留的字符数
+MESSAGE_PAGE_SIZE = 50
+MESSAGE_PREVIEW_CHARS = 2000
+
+# 时间序列统计按项目、会话或类型分组时最多返回的分组数
+TIMELINE_MAX_GROUPS = 1000
+
+# 对话详情 ETag 的格式版本，接口返回结构变化时递增，使旧的客户端缓存失效
+CONVERSATION_ETAG_VERSION = 1
+
+# 实时推送: 检查新数据的间隔，以及无数据时发送保活注释的间隔（秒）
+STREAM_POLL_INTERVAL = 1.0
+STREAM_KEEPALIVE_INTERVAL = 15.0
+
+# 实时推送: 单个连接的最长时间（秒）。到时服务端结束响应，浏览器自动重连并通过 Last-Event-ID
+# 从断开的位置继续，长连接不会一直占用同一个处理线程
+STREAM_MAX_DURATION = 300.0
+
+# 每个进程同时保持的实时推送连接数上限（每个连接占用一个处理线程），
+# 可通过环境变量 CLAUDE_VIS_STREAM_MAX 或 app.config['STREAM_MAX_CONNECTIONS'] 修改，0 表示关闭实时推送
+app.config.setdefault('STREAM_MAX_CONNECTIONS', int(os.environ.get('CLAUDE_VIS_STREAM_MAX', '8')))
+_stream_lock = threading.Lock()
+_active_streams = 0
+
+
+@app.template_filter('highlight')
+def highlight(text, query):
+    """转义文本，并用 <mark> 标出查询中的各个关键词"""
+    terms = [term for term in re.split(r'[\s"]+', query or '') if term]
+    escaped = str(escape(text))
+    if not terms:
+        return Markup(escaped)
+
+    pattern = re.compile('|'.join(re.escape(str(escape(term))) for term in terms), re.IGNORECASE)
+    return Markup(pattern.sub(lambda m: f'<mark>{m.group(0)}</mark>', escaped))
 
 
 @app.route('/')
 def index():
     """主页"""
     summary = parser.get_conversation_summary()
-    recent_conversations = parser.parse_full_conversations()[:10]  # 最近10条对话
+    recent_conversations = parser.parse_conversation_summaries(limit=10, preview_count=2)  # 最近10条对话
 
     return render_template('index.html',
                          summary=summary,
                          recent_conversations=recent_conversations)
 
 
+def parse_time_param(name: str, end: bool = False):
+    """
+    解析时间范围查询参数（from / to）
+
+    支持日期（YYYY-MM-DD，本地时间；作为结束时间时包含当天）和毫秒级时间戳
+
+    Args:
+        name: 参数名
+        end: 是否为结束时间
+
+    Returns:
+        int: 毫秒级时间戳，参数为空或格式错误时返回 None
+    """
+    value = request.args.get(name, '').strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    try:
+        day = datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return None
+    if end:
+        day += timedelta(days=1)
+    return int(day.timestamp() * 1000)
+
+
 @app.route('/conversations')
 def conversations():
-    """对话列表页"""
+    """对话列表页，支持 from / to 按时间范围过滤"""
     page = request.args.get('page', 1, type=int)
+    cursor = request.args.get('cursor')
     per_page = 20
 
-    all_conversations = parser.parse_full_conversations()
-    total = len(all_conversations)
-
-    # 分页
-    start = (page - 1) * per_page
-    end = start + per_page
-    conversations = all_conversations[start:end]
-
-    # 分页信息
-    pagination = {
-        'page': page,
-        'per_page': per_page,
-        'total': total,
-        'pages': (total + per_page - 1) // per_page,
-        'has_prev': page > 1,
-        'has_next': end < total
-    }
+    # 分页在解析器中完成，只读取当前页的会话摘要
+    result = parser.get_conversations_page(page=page, per_page=per_page, cursor=cursor,
+                                           start_time=parse_time_param('from'),
+                                           end_time=parse_time_param('to', end=True))
+    conversations = result.pop('conversations')
+    pagination = result
 
     return render_template('conversations.html',
                          conversations=conversations,
-                         pagination=pagination)
+                         pagination=pagination,
+                         date_from=request.args.get('from', '').strip(),
+                         date_to=request.args.get('to', '').strip())
 
 
 @app.route('/search')
 def search():
-    """搜索页面"""
+    """搜索页面，支持 from / to 按时间范围过滤"""
     query = request.args.get('q', '').strip()
     project = request.args.get('project', '').strip()
+    date_from = request.args.get('from', '').strip()
+    date_to = request.args.get('to', '').strip()
 
     results = []
     if query:
-        results = parser.search_full_conversations(query, project if project else None)
+        results = parser.search_conversation_summaries(query, project if project else None,
+                                                       preview_count=4,
+                                                       start_time=parse_time_param('from'),
+                                                       end_time=parse_time_param('to', end=True))
 
     # 获取所有项目用于过滤
-    all_conversations = parser.parse_full_conversations()
-    projects = sorted(set(conv.get('project', 'Unknown') for conv in all_conversations))
+    projects = sorted(parser.get_conversation_summary()['projects'])
 
     return render_template('search.html',
                          query=query,
                          project=project,
+                         date_from=date_from,
+                         date_to=date_to,
                          results=results,
                          projects=projects)
 
 
 @app.route('/api/conversation/<session_id>')
 def get_conversation_details(session_id):
-    """获取对话详情API"""
-    debug_logs = parser.get_debug_logs(session_id)
+    """
+    获取对话详情API
+
+    查询参数:
+        offset: 起始消息序号，负数表示从末尾倒数（默认 0）
+        limit: 返回的消息数（默认 MESSAGE_PAGE_SIZE，full=1 时默认返回全部）
+        before / after: 返回指定 uuid 的消息之前 / 之后的消息
+        full: 为 1 时返回完整消息内容，否则超过 MESSAGE_PREVIEW_CHARS 的内容会被截断
+    """
+    # 相关文件都没有变化时直接返回 304，不读取对话文件
+    etag = None
+    if app.config['HTTP_ETAGS']:
+        version = parser.get_session_version(session_id)
+        etag = hashlib.sha1(
+            f"{CONVERSATION_ETAG_VERSION}|{version}|{request.query_string.decode()}".encode()
+        ).hexdigest()
+        if http_cache.not_modified(etag):
+            return http_cache.not_modified_response(etag)
+
+    full = request.args.get('full') == '1'
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', None if full else MESSAGE_PAGE_SIZE, type=int)
+    before = request.args.get('before') or None
+    after = request.args.get('after') or None
+
+    # 调试日志只返回是否存在及大小，内容通过 /api/conversation/<id>/debug-log 单独读取
+    debug_log = parser.get_debug_log_info(session_id)
+
+    # 只解析该会话自己的对话文件，并且只返回请求的一段消息
+    entries = parser.get_session_entries(session_id)
+    page = None
+    if entries:
+        try:
+            page = parser.get_session_messages(session_id, offset=offset, limit=limit,
+                                               before=before, after=after)
+        except KeyError:
+            return jsonify({'error': '指定的消息不存在'}), 404
 
-    # 从完整对话记录中找到对应的对话
-    conversations = parser.parse_full_conversations()
     conversation = None
-    for conv in conversations:
-        if conv.get('sessionId') == session_id:
-            conversation = conv
-            break
+    total = page['total'] if page else 0
+    start = page['offset'] if page else 0
+    messages = page['messages'] if page else []
+
+    if entries:
+        if not full:
+            messages = [truncate_message(message) for message in messages]
+        conversation = {**entries[0], 'has_full_content': total > 0}
+        if total > 0:
+            conversation['full_conversation'] = messages
 
-    return jsonify({
+    response = jsonify({
         'conversation': conversation,
-        'debug_logs': debug_logs,
-        'has_logs': debug_logs is not None,
-        'has_full_content': conversation.get('has_full_content', False) if conversation else False
+        'has_logs': debug_log is not None,
+        'debug_log_size': debug_log['size'] if debug_log else 0,
+        'has_full_content': total > 0,
+        'total_messages': total,
+        'offset': start,
+        'has_before': start > 0,
+        'has_after': start + len(messages) < total
     })
+    if etag is not None:
+        response.set_etag(etag)
+    return response
+
+
+@app.route('/api/conversation/<session_id>/debug-log')
+def get_debug_log(session_id):
+    """
+    调试日志API
+
+    查询参数:
+        tail: 返回末尾的行数（默认 200）
+        offset / length: 按字节范围读取，offset 为负数时从末尾倒数
+        grep: 只返回包含该关键词的行（不区分大小写）
+    """
+    result = parser.read_debug_log(
+        session_id,
+        tail=request.args.get('tail', None, type=int),
+        offset=request.args.get('offset', None, type=int),
+        length=request.args.get('length', None, type=int),
+        keyword=request.args.get('grep', '').strip() or None
+    )
+    if result is None:
+        return jsonify({'error': '调试日志不存在'}), 404
+    return jsonify(result)
+
+
+def truncate_message(message):
+    """内容超过 MESSAGE_PREVIEW_CHARS 的消息截断并标记 truncated"""
+    if len(message['content']) <= MESSAGE_PREVIEW_CHARS:
+        return message
+    return {**message, 'content': message['content'][:MESSAGE_PREVIEW_CHARS], 'truncated': True}
+
+
+@app.route('/api/conversations')
+def list_conversations():
+    """对话摘要分页API，支持游标分页（用于无限滚动）和 from / to 时间范围过滤"""
+    page = request.args.get('page', 1, type=int)
+    per_page = max(1, min(request.args.get('per_page', 20, type=int), 100))
+    cursor = request.args.get('cursor')
+
+    return jsonify(parser.get_conversations_page(page=page, per_page=per_page, cursor=cursor,
+                                                 start_time=parse_time_param('from'),
+                                                 end_time=parse_time_param('to', end=True)))
+
+
+@app.route('/api/timeline')
+def get_timeline():
+    """
+    时间序列统计API
+
+    查询参数:
+        source: history（提问，默认）或 messages（对话消息）
+        from / to: 时间范围，日期（YYYY-MM-DD）或毫秒级时间戳
+        by: 分组方式，day（默认）、month、project、session 或 type（仅 messages）
+        limit: 按项目、会话或类型分组时最多返回的分组数，不能小于 1，超过 TIMELINE_MAX_GROUPS 时按该值处理
+    """
+    limit = request.args.get('limit', None, type=int)
+    if limit is not None and limit < 1:
+        return jsonify({'error': f"limit 必须大于 0: {limit}"}), 400
+    if limit is not None:
+        limit = min(limit, TIMELINE_MAX_GROUPS)
+
+    try:
+        result = parser.get_timeline(source=request.args.get('source', 'history'),
+                                     start_time=parse_time_param('from'),
+                                     end_time=parse_time_param('to', end=True),
+                                     by=request.args.get('by', 'day'),
+                                     limit=limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(result)
+
+
+def _acquire_stream_slot() -> bool:
+    """占用一个实时推送连接名额，已达上限时返回 False"""
+    global _active_streams
+    with _stream_lock:
+        if _active_streams >= app.config['STREAM_MAX_CONNECTIONS']:
+            return False
+        _active_streams += 1
+        return True
+
+
+def _release_stream_slot():
+    """释放实时推送连接名额"""
+    global _active_streams
+    with _stream_lock:
+        _active_streams -= 1
+
+
+def stream_position(session_id: str = None):
+    """
+    确定实时推送的起点
+
+    浏览器重连时带有 Last-Event-ID 请求头，页面重新打开连接时带有 since 参数，
+    格式均为 "history.jsonl 位置:对话文件位置"，从该位置继续推送；
+    没有或格式错误时从文件当前末尾开始，超过文件当前大小的位置（文件被替换）同样从末尾开始
+
+    Args:
+        session_id: 需要跟踪的会话ID（可选）
+
+    Returns:
+        tuple: (history.jsonl 位置, 对话文件位置)
+    """
+    offsets = parser.get_stream_offsets(session_id)
+    history_offset, session_offset = offsets['history'], offsets['session']
+
+    value = request.headers.get('Last-Event-ID') or request.args.get('since', '')
+    parts = value.strip().split(':')
+    if parts[0].isdigit():
+        history_offset = min(int(parts[0]), history_offset)
+        if session_id and len(parts) > 1 and parts[1].isdigit():
+            session_offset = min(int(parts[1]), session_offset)
+    return history_offset, session_offset
+
+
+@app.route('/api/stream')
+def stream_updates():
+    """
+    实时推送API（Server-Sent Events）
+
+    从连接建立时的文件末尾（或 Last-Event-ID / since 指定的位置）开始跟踪 history.jsonl，
+    新问题以 prompt 事件推送；指定 session 参数时同时跟踪该会话的对话文件，新消息以 message 事件推送。
+    每批事件带有 id（当前读取位置），连接在 STREAM_MAX_DURATION 秒后结束，浏览器重连后从该位置继续；
+    同时保持的连接数超过 STREAM_MAX_CONNECTIONS 时返回 503
+    """
+    session_id = request.args.get('session', '').strip() or None
+
+    if not _acquire_stream_slot():
+        return jsonify({'error': '实时推送连接数已达上限'}), 503
+
+    try:
+        history_offset, session_offset = stream_position(session_id)
+    except Exception:
+        _release_stream_slot()
+        raise
+
+    def format_event(event: str, data) -> str:
+        return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=json_default)}\n\n"
+
+    def generate():
+        nonlocal history_offset, session_offset
+        deadline = time.monotonic() + STREAM_MAX_DURATION
+        last_sent = time.monotonic()
+
+        yield "retry: 3000\n\n"
+
+        while time.monotonic() < deadline:
+            events = []
+
+            entries, history_offset = parser.read_history_since(history_offset)
+            events.extend(format_event('prompt', entry) for entry in entries)
+
+            if session_id:
+                messages, session_offset = parser.read_messages_since(session_id, session_offset)
+                events.extend(format_event('message', {**message, 'sessionId': session_id})
+                              for message in messages)
+
+            if events:
+                # 批次最后一个事件带上当前位置，浏览器据此更新 Last-Event-ID
+                events[-1] = events[-1][:-1] + f"id: {history_offset}:{session_offset}\n\n"
+                yield ''.join(events)
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= STREAM_KEEPALIVE_INTERVAL:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+
+            parser.wait_for_change(STREAM_POLL_INTERVAL)
+
+        # 结束前告知当前位置，重连后不会遗漏或重复
+        yield f"id: {history_offset}:{session_offset}\n\n"
+
+    response = Response(stream_with_context(generate()),
+                        mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # 连接断开或响应结束时由 WSGI 服务器关闭响应，此时释放名额
+    response.call_on_close(_release_stream_slot)
+    return response
+
+
+@app.route('/api/metrics')
+def get_metrics():
+    """性能指标API（Prometheus 文本格式），需要设置 CLAUDE_VIS_METRICS=1 开启"""
+    if not app.config['METRICS']:
+        return jsonify({'error': '性能指标未开启'}), 404
+    return Response(metrics.export_prometheus(), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/api/stats')
 def get_stats():
-    """获取统计信息API"""
-    return jsonify(parser.get_conversation_summary())
+    """获取统计信息API，支持 ETag / Last-Modified 条件请求"""
+    version = parser.get_history_version()
+    parse_errors = parser.get_parse_errors()
+
+    response = jsonify({**parser.get_conversation_summary(), 'parse_errors': parse_errors})
+    # 解析错误计数随对话文件变化，也计入 ETag
+    response.set_etag(f"{version['etag']}-{sum(parse_errors.values())}")
+    if version['last_modified'] is not None:
+        response.last_modified = version['last_modified']
+    # 允许浏览器缓存，但每次使用前都要重新验证
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@app.route('/api/analytics')
+@app.route('/api/analytics/<section>')
+def get_analytics(section=None):
+    """获取统计分析数据API，可以只获取某一部分（overview、daily、tools、projects、sessions）"""
+    analytics = parser.get_analytics()
+    if section is not None and (section == 'version' or section not in analytics):
+        return jsonify({'error': f'未知的统计项: {section}'}), 404
+
+    response = jsonify(analytics if section is None else analytics[section])
+    response.set_etag(analytics['version'])
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    arg_parser = argparse.ArgumentParser(description="Claude Code 可视化工具")
+    arg_parser.add_argument('--workers', type=int, default=0,
+                            help="冷启动时并行解析对话文件的进程数，0 表示使用 CPU 核数，1 表示不并行")
+    return arg_parser.parse_args(argv)
 
 
 if __name__ == '__main__':
+    # 打包为可执行文件后，进程池的子进程也从这里启动
+    multiprocessing.freeze_support()
+    args = parse_args()
+    if args.workers > 0:
+        parser.workers = args.workers
+
     print("启动 Claude Code 可视化工具...")
     print("访问 http://localhost:5000 查看界面")
 
@@ -107,4 +469,8 @@ if __name__ == '__main__':
         print("警告: 未找到 Claude 配置目录 ~/.claude")
         print("请确保已安装并使用过 Claude Code")
 
+    # 调试模式下 reloader 会启动父子两个进程，只在实际处理请求的子进程中监听文件
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true' and parser.start_watching():
+        print("已启用文件监听，数据变化会自动更新")
+
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
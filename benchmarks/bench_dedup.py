@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+会话去重解析基准测试
+对比 "每条历史记录解析一次对话文件" 与 "每个会话只解析一次" 的文件打开次数和耗时
+
+用法:
+    python3 benchmarks/bench_dedup.py [会话数] [每个会话的提问数]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_suite import count_file_opens  # noqa: E402
+from claude_parser import ClaudeDataParser  # noqa: E402
+from synthetic_corpus import build_corpus  # noqa: E402
+
+
+def count_transcript_opens(func):
+    """执行 func 并统计打开 .jsonl 对话文件的次数和耗时"""
+    with count_file_opens(lambda path: path.endswith('.jsonl') and 'projects' in path) as counter:
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+
+    return counter['opens'], elapsed
+
+
+def per_entry_parse(parser: ClaudeDataParser):
+    """旧实现：每条历史记录都重新解析一次对话文件"""
+    for entry in parser.parse_history():
+        parser._get_full_conversation(entry['sessionId'], entry.get('project', ''))
+
+
+def main():
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    prompts = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        # 每条提问对应一条回答，不需要调试日志
+        build_corpus(root, sessions=sessions, messages=prompts * 2, message_size=100, debug_lines=0)
+
+        # 关闭持久化缓存，只比较解析流程本身；在当前进程中解析，文件打开才能被统计到
+        parser = ClaudeDataParser(str(root), use_cache=False, workers=1)
+        parser.parse_history()
+
+        old_opens, old_time = count_transcript_opens(lambda: per_entry_parse(parser))
+        new_opens, new_time = count_transcript_opens(parser.parse_full_conversations)
+
+    print(f"语料: {sessions} 个会话 x {prompts} 条提问")
+    print(f"{'方式':<16}{'文件打开次数':>12}{'耗时(秒)':>12}")
+    print(f"{'逐条记录解析':<16}{old_opens:>12}{old_time:>12.3f}")
+    print(f"{'按会话去重':<16}{new_opens:>12}{new_time:>12.3f}")
+    if new_time > 0:
+        print(f"加速比: {old_time / new_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
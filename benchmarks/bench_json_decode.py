@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+对话文件 JSON 解码基准测试
+对比 "每行 json.loads 完整解码" 与 "字节预过滤 + 可选 orjson/msgspec 解码" 的吞吐量
+
+用法:
+    python3 benchmarks/bench_json_decode.py [语料大小(MB)，默认 1024]
+"""
+
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fast_json  # noqa: E402
+from claude_parser import ClaudeDataParser  # noqa: E402
+
+# 每个对话文件的大致大小
+FILE_SIZE = 4 * 1024 * 1024
+
+
+def make_line(rng: random.Random, index: int) -> dict:
+    """按真实对话文件的大致比例生成一行记录"""
+    timestamp = f"2025-06-15T10:{index // 60 % 60:02d}:{index % 60:02d}.000Z"
+    base = {
+        'parentUuid': f"p-{index}", 'isSidechain': False, 'userType': 'external',
+        'cwd': '/Users/bench/project', 'sessionId': 'bench', 'version': '1.0.0',
+        'uuid': f"u-{index}", 'timestamp': timestamp,
+    }
+    kind = rng.random()
+
+    if kind < 0.15:
+        return {**base, 'type': 'user',
+                'message': {'role': 'user', 'content': "请帮我看看这个问题 " + "内容" * rng.randint(10, 200)}}
+    if kind < 0.45:
+        return {**base, 'type': 'assistant', 'message': {
+            'role': 'assistant', 'model': 'claude', 'content': [
+                {'type': 'text', 'text': "好的，" + "analysis " * rng.randint(20, 400)},
+                {'type': 'tool_use', 'id': f"t-{index}", 'name': 'Read',
+                 'input': {'file_path': '/Users/bench/project/main.py'}},
+            ],
+            'usage': {'input_tokens': 1000, 'output_tokens': 200}}}
+    if kind < 0.75:
+        # 工具结果：type 为 user 但没有文本内容，通常是最大的行
+        return {**base, 'type': 'user', 'message': {'role': 'user', 'content': [
+            {'type': 'tool_result', 'tool_use_id': f"t-{index}",
+             'content': "def main():\n    pass\n" * rng.randint(50, 1500)}]},
+                'toolUseResult': {'stdout': "ok\n" * rng.randint(10, 500)}}
+    if kind < 0.85:
+        return {'type': 'summary', 'summary': "会话摘要 " * 20, 'leafUuid': f"u-{index}"}
+    if kind < 0.95:
+        return {**base, 'type': 'system', 'content': "Running hook " * rng.randint(5, 100),
+                'level': 'info'}
+    return {'type': 'file-history-snapshot', 'messageId': f"m-{index}",
+            'snapshot': {'trackedFileBackups': {f"file{i}.py": "x" * 200 for i in range(20)}}}
+
+
+def build_corpus(root: Path, total_bytes: int) -> int:
+    """生成对话文件，返回实际写入的字节数"""
+    project_dir = root / "projects" / "-Users-bench-project"
+    project_dir.mkdir(parents=True)
+    rng = random.Random(42)
+
+    written = 0
+    index = 0
+    file_index = 0
+    while written < total_bytes:
+        file_written = 0
+        with open(project_dir / f"session-{file_index:05d}.jsonl", 'w', encoding='utf-8') as f:
+            while file_written < FILE_SIZE and written + file_written < total_bytes:
+                line = json.dumps(make_line(rng, index), ensure_ascii=False,
+                                  separators=(',', ':')) + "\n"
+                f.write(line)
+                file_written += len(line.encode('utf-8'))
+                index += 1
+        written += file_written
+        file_index += 1
+
+    return written
+
+
+def full_decode(parser: ClaudeDataParser, path: Path) -> list:
+    """旧实现：文本模式逐行 json.loads 完整解码后再筛选"""
+    messages = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            if data.get('type') not in ['user', 'assistant']:
+                continue
+            content = parser._extract_message_content(data.get('message', {}))
+            if content:
+                messages.append({
+                    'type': data.get('type'),
+                    'content': content,
+                    'timestamp': data.get('timestamp'),
+                    'uuid': data.get('uuid'),
+                    'formatted_time': parser._format_iso_timestamp(data.get('timestamp'))
+                })
+    return messages
+
+
+def run(label: str, func, files, total_bytes: int):
+    """执行并打印吞吐量"""
+    start = time.perf_counter()
+    for path in files:
+        func(path)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28}{elapsed:>10.2f}{total_bytes / 1024 / 1024 / elapsed:>12.1f}")
+    return elapsed
+
+
+def main():
+    size_mb = int(sys.argv[1]) if len(sys.argv) > 1 else 1024
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        total_bytes = build_corpus(root, size_mb * 1024 * 1024)
+        files = sorted((root / "projects").rglob("*.jsonl"))
+        parser = ClaudeDataParser(str(root), use_cache=False, workers=1)
+
+        print(f"语料: {len(files)} 个对话文件, {total_bytes / 1024 / 1024:.0f} MB")
+        print(f"{'方式':<28}{'耗时(秒)':>10}{'吞吐(MB/s)':>12}")
+
+        baseline = run("json.loads 完整解码", lambda path: full_decode(parser, path),
+                       files, total_bytes)
+        for backend in fast_json.AVAILABLE_BACKENDS:
+            fast_json.set_backend(backend)
+            elapsed = run(f"预过滤 + {backend}", parser._parse_conversation_file, files, total_bytes)
+            print(f"{'':<28}加速比: {baseline / elapsed:.1f}x")
+        fast_json.set_backend()
+
+
+if __name__ == "__main__":
+    main()
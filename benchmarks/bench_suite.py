@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+综合基准测试
+在合成的 Claude 数据目录上测量解析器主要方法和各个页面 / API 路由的耗时，
+报告冷启动耗时、重复调用的延迟分位数、打开文件次数、每个用例的内存变化和解析子进程的 CPU 时间，
+可以保存为基线文件，升级后与基线对比。
+默认以单进程解析（--workers 1），所有文件打开和内存占用都发生在当前进程中；
+指定多个解析进程时，子进程中的文件打开无法统计，打开次数显示为 "-"
+
+用法:
+    python3 benchmarks/bench_suite.py [--sessions 200] [--messages 40] [--message-size 400]
+                                      [--cjk-ratio 0.5] [--repeat 10] [--workers 1]
+                                      [--save baseline.json] [--compare baseline.json]
+"""
+
+import argparse
+import builtins
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from synthetic_corpus import add_corpus_arguments, build_corpus, corpus_options  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，不报告峰值内存
+    resource = None
+
+# 对比基线时，耗时超过基线该比例即视为变慢
+DEFAULT_THRESHOLD = 0.2
+
+# 差值小于该秒数时不视为变慢，避免亚毫秒级用例的计时抖动
+MIN_REGRESSION_SECONDS = 0.001
+
+# 报告的延迟分位数
+PERCENTILES = (50, 90, 99)
+
+# 测试的解析器方法
+PARSER_METHODS = ('parse_history', 'parse_full_conversations', 'search_full_conversations',
+                  'get_conversation_summary')
+
+
+@contextmanager
+def count_file_opens(predicate: Callable[[str], bool] = None):
+    """
+    统计代码块中通过 open() 打开文件的次数
+
+    只统计当前进程，解析进程池等子进程中的文件打开不会被统计
+
+    Args:
+        predicate: 只统计路径满足该条件的文件，默认统计全部
+
+    Yields:
+        Dict: 代码块结束后 'opens' 为打开次数
+    """
+    counter = {'opens': 0}
+    real_open = builtins.open
+
+    def counting_open(file, *args, **kwargs):
+        if predicate is None or predicate(str(file)):
+            counter['opens'] += 1
+        return real_open(file, *args, **kwargs)
+
+    # Path.open() 使用 io.open，需要同时替换
+    builtins.open = io.open = counting_open
+    try:
+        yield counter
+    finally:
+        builtins.open = io.open = real_open
+
+
+def _maxrss_mb(who) -> float:
+    """getrusage() 报告的峰值常驻内存（MB）"""
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def current_rss_mb() -> Optional[float]:
+    """
+    当前进程的常驻内存（MB）
+
+    Linux 读取 /proc/self/statm；其他平台没有当前值，使用进程启动以来的峰值代替，
+    此时只有超过之前峰值的增长才会体现在差值中。不支持的平台返回 None
+    """
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if resource is None:
+        return None
+    return _maxrss_mb(resource.RUSAGE_SELF)
+
+
+def children_usage() -> Optional[Dict]:
+    """
+    已结束的子进程（如解析进程池）累计的 CPU 时间（秒）和其中最大的峰值常驻内存（MB），
+    不支持的平台返回 None
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {'cpu': usage.ru_utime + usage.ru_stime,
+            'peak_rss_mb': _maxrss_mb(resource.RUSAGE_CHILDREN)}
+
+
+def percentile(samples: List[float], p: float) -> float:
+    """按最近秩法计算分位数"""
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * p // 100))
+    return ordered[int(rank) - 1]
+
+
+def measure(func: Callable, repeat: int, count_opens: bool = True) -> Dict:
+    """
+    测量 func 的耗时
+
+    第一次调用的耗时记为冷启动耗时，之后重复 repeat 次计算分位数；
+    打开文件次数为冷启动调用和之后每次调用的平均值；
+    rss_delta_mb 为用例前后当前进程常驻内存的变化，children_cpu 为期间结束的子进程消耗的 CPU 时间，
+    children_peak_rss_mb 为子进程的峰值常驻内存（没有子进程时为 None）
+
+    Args:
+        func: 被测函数
+        repeat: 冷启动之后重复调用的次数
+        count_opens: 是否统计打开文件次数，解析在子进程中进行时应为 False
+
+    Returns:
+        Dict: 包含 cold、p50/p90/p99、max（秒）、cold_opens、opens、rss_delta_mb、
+              children_cpu 和 children_peak_rss_mb 的字典
+    """
+    rss_before = current_rss_mb()
+    children_before = children_usage()
+
+    with count_file_opens() as cold_counter:
+        start = time.perf_counter()
+        func()
+        cold = time.perf_counter() - start
+
+    samples = []
+    with count_file_opens() as counter:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+
+    result = {'cold': cold}
+    if samples:
+        for p in PERCENTILES:
+            result[f"p{p}"] = percentile(samples, p)
+        result['max'] = max(samples)
+    result['cold_opens'] = cold_counter['opens'] if count_opens else None
+    result['opens'] = (counter['opens'] / repeat if repeat else 0) if count_opens else None
+
+    rss_after = current_rss_mb()
+    result['rss_delta_mb'] = rss_after - rss_before if rss_before is not None else None
+
+    children_after = children_usage()
+    result['children_cpu'] = result['children_peak_rss_mb'] = None
+    if children_before is not None and children_after['cpu'] > children_before['cpu']:
+        result['children_cpu'] = children_after['cpu'] - children_before['cpu']
+        result['children_peak_rss_mb'] = children_after['peak_rss_mb']
+    return result
+
+
+def parser_case(parser, name: str, query: str) -> Callable:
+    """解析器方法的测试用例，搜索方法使用 query 作为关键词"""
+    method = getattr(parser, name)
+    if name.startswith('search'):
+        return lambda: method(query)
+    return method
+
+
+def route_cases(client, session_id: str, query: str) -> Dict[str, Callable]:
+    """页面和 API 路由的测试用例（实时推送是长连接，不参与测试）"""
+    def get(url):
+        def request():
+            response = client.get(url)
+            if response.status_code != 200:
+                raise RuntimeError(f"{url} 返回 {response.status_code}")
+            response.get_data()
+        return request
+
+    # 用例名称中的会话ID用 <id> 表示，不同语料的结果可以对比
+    urls = [
+        '/',
+        '/conversations',
+        '/conversations?page=2',
+        f'/search?q={query}',
+        '/api/conversation/<id>',
+        '/api/conversation/<id>/debug-log',
+        '/api/conversations',
+        '/api/stats',
+    ]
+    return {f"GET {url}": get(url.replace('<id>', session_id)) for url in urls}
+
+
+def run_cases(cases: Dict[str, Callable], repeat: int, results: Dict, count_opens: bool = True):
+    """依次执行测试用例并打印结果"""
+    for name, func in cases.items():
+        results[name] = result = measure(func, repeat, count_opens)
+        print(format_row(name, result))
+
+
+def format_row(name: str, result: Dict) -> str:
+    """格式化一行结果，耗时以毫秒显示"""
+    def ms(key):
+        value = result.get(key)
+        return f"{value * 1000:>9.1f}" if value is not None else f"{'-':>9}"
+
+    def number(key, width, digits):
+        value = result.get(key)
+        return f"{value:>{width}.{digits}f}" if value is not None else f"{'-':>{width}}"
+
+    return (f"{name:<46}{ms('cold')}{ms('p50')}{ms('p90')}{ms('p99')}"
+            f"{number('cold_opens', 8, 0)}{number('opens', 8, 1)}{number('rss_delta_mb', 9, 1)}"
+            f"{number('children_cpu', 10, 2)}")
+
+
+def print_header():
+    print(f"{'用例':<44}{'冷启动':>7}{'p50':>9}{'p90':>9}{'p99':>9}"
+          f"{'冷打开':>5}{'打开':>6}{'内存变化':>5}{'子进程CPU':>7}")
+    print(f"{'':<44}{'(毫秒)':>7}{'':<45}{'(MB)':>9}{'(秒)':>9}")
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """
+    与基线对比冷启动耗时和 p50
+
+    Args:
+        results: 本次结果
+        baseline: 基线文件内容
+        threshold: 允许变慢的比例
+
+    Returns:
+        List[str]: 变慢的用例说明
+    """
+    regressions = []
+    print(f"\n与基线对比（{baseline.get('created', '未知时间')}，超过 {threshold:.0%} 视为变慢）")
+    print(f"{'用例':<44}{'冷启动':>10}{'p50':>10}")
+
+    for name, result in results.items():
+        old = baseline['results'].get(name)
+        if old is None:
+            print(f"{name:<46}{'(基线中没有)':>20}")
+            continue
+
+        ratios = []
+        for key in ('cold', 'p50'):
+            if result.get(key) and old.get(key):
+                ratio = result[key] / old[key]
+                ratios.append(f"{ratio:>9.2f}x")
+                if ratio > 1 + threshold and result[key] - old[key] >= MIN_REGRESSION_SECONDS:
+                    regressions.append(f"{name} {key}: {old[key] * 1000:.1f}ms -> {result[key] * 1000:.1f}ms")
+            else:
+                ratios.append(f"{'-':>10}")
+        print(f"{name:<46}{''.join(ratios)}")
+
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Claude Code 可视化工具综合基准测试")
+    add_corpus_arguments(arg_parser)
+    arg_parser.add_argument('--corpus', help="使用已有的 Claude 数据目录，不生成合成数据")
+    arg_parser.add_argument('--repeat', type=int, default=10, help="冷启动之后每个用例的重复次数")
+    arg_parser.add_argument('--query', default='python', help="搜索用例使用的关键词")
+    arg_parser.add_argument('--workers', type=int, default=1,
+                            help="冷启动时并行解析对话文件的进程数，默认 1 表示在当前进程中解析")
+    arg_parser.add_argument('--no-routes', action='store_true', help="只测试解析器方法")
+    arg_parser.add_argument('--save', help="将结果保存为基线文件")
+    arg_parser.add_argument('--compare', help="与基线文件对比，有用例变慢时以状态码 1 退出")
+    arg_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                            help="对比基线时允许变慢的比例")
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        options = corpus_options(args)
+        if args.corpus:
+            root = Path(args.corpus).expanduser()
+            options = {'corpus': str(root)}
+            print(f"语料: {root}")
+        else:
+            root = tmp / "claude"
+            info = build_corpus(root, **options)
+            print(f"语料: {info['sessions']} 个会话, {info['messages']} 条消息, "
+                  f"{info['history_entries']} 条历史记录, {info['bytes'] / 1024 / 1024:.1f} MB")
+
+        # 应用在导入时按环境变量创建解析器，缓存放在临时目录，避免影响本机缓存
+        os.environ['CLAUDE_VIS_CLAUDE_DIR'] = str(root)
+        os.environ['CLAUDE_VIS_CACHE_DIR'] = str(tmp / "cache-app")
+
+        from claude_parser import ClaudeDataParser
+
+        results = {}
+        # 子进程中的文件打开无法统计
+        count_opens = args.workers <= 1
+        print_header()
+
+        # 每个用例使用新的解析器和空缓存，冷启动耗时包含解析和建立缓存、索引
+        for name in PARSER_METHODS:
+            parser = ClaudeDataParser(str(root), cache_dir=str(tmp / f"cache-{name}"), workers=args.workers)
+            run_cases({name: parser_case(parser, name, args.query)}, args.repeat, results, count_opens)
+
+        if not args.no_routes:
+            from app import app, parser as app_parser
+            app_parser.workers = args.workers
+            session_id = next(iter(app_parser.iter_sessions()))['sessionId']
+            run_cases(route_cases(app.test_client(), session_id, args.query), args.repeat, results,
+                      count_opens)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('corpus') != options:
+            print("警告: 基线使用的语料参数与本次不同，对比结果仅供参考")
+        if baseline.get('workers', 1) != args.workers:
+            print("警告: 基线使用的解析进程数与本次不同，对比结果仅供参考")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\n变慢的用例:")
+            for line in regressions:
+                print(f"  {line}")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({
+                'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'corpus': options,
+                'repeat': args.repeat,
+                'workers': args.workers,
+                'results': results
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.save}")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
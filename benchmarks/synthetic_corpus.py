@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+合成 Claude 数据目录生成器
+按指定规模生成与 ~/.claude 结构相同的 history.jsonl、projects/*/*.jsonl 和 debug/*.txt，
+供基准测试使用，相同参数和随机种子生成的内容完全相同
+
+用法:
+    python3 benchmarks/synthetic_corpus.py 输出目录 [--sessions 200] [--messages 40]
+                                          [--message-size 400] [--cjk-ratio 0.5]
+"""
+
+import argparse
+import json
+import random
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict
+
+# 生成文本使用的词表
+CJK_WORDS = ('问题', '代码', '函数', '修改', '测试', '错误', '文件', '程序员', '实现', '分析',
+             '配置', '数据', '性能', '优化', '接口', '页面', '缓存', '索引', '日志', '会话')
+ASCII_WORDS = ('python', 'function', 'return', 'import', 'error', 'value', 'class', 'request',
+               'response', 'cache', 'index', 'parser', 'session', 'server', 'test', 'data')
+TOOL_NAMES = ('Bash', 'Read', 'Edit', 'Write', 'Grep', 'Glob', 'TodoWrite')
+
+# 第一个会话开始的时间（毫秒）和相邻两条消息的间隔（毫秒）
+BASE_TIMESTAMP = 1750000000000
+MESSAGE_INTERVAL = 15000
+
+
+def make_text(rng: random.Random, size: int, cjk_ratio: float) -> str:
+    """
+    生成大约 size 个字符的文本
+
+    Args:
+        rng: 随机数生成器
+        size: 字符数
+        cjk_ratio: 中文词所占的比例（0-1）
+
+    Returns:
+        str: 文本
+    """
+    words = []
+    length = 0
+    while length < size:
+        if rng.random() < cjk_ratio:
+            word = rng.choice(CJK_WORDS)
+        else:
+            word = rng.choice(ASCII_WORDS) + ' '
+        words.append(word)
+        length += len(word)
+    return ''.join(words)[:size]
+
+
+def _iso(timestamp: int) -> str:
+    """毫秒时间戳转换为对话文件中使用的 ISO 格式"""
+    dt = datetime.fromtimestamp(timestamp / 1000, tz=timezone.utc)
+    return dt.strftime('%Y-%m-%dT%H:%M:%S.') + f"{timestamp % 1000:03d}Z"
+
+
+def _dumps(data: Dict) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')) + "\n"
+
+
+def build_corpus(root: Path, sessions: int = 200, messages: int = 40, message_size: int = 400,
+                 cjk_ratio: float = 0.5, projects: int = 8, debug_lines: int = 500,
+                 seed: int = 42) -> Dict:
+    """
+    生成合成 Claude 数据目录
+
+    每个会话交替写入用户提问和助手回答，每条提问同时写入 history.jsonl；
+    回答之间穿插工具调用结果、摘要等不展示的记录，与真实对话文件的结构一致
+
+    Args:
+        root: 输出目录（相当于 ~/.claude）
+        sessions: 会话数
+        messages: 每个会话的消息数（提问和回答合计）
+        message_size: 每条消息的平均字符数
+        cjk_ratio: 文本中中文词所占的比例（0-1）
+        projects: 项目数，会话平均分配到各项目
+        debug_lines: 每个会话调试日志的行数，0 表示不生成调试日志
+        seed: 随机种子
+
+    Returns:
+        Dict: 包含 sessions、history_entries、messages、bytes（生成的文件总字节数）
+              和 session_ids 的字典
+    """
+    rng = random.Random(seed)
+    root = Path(root)
+    (root / "projects").mkdir(parents=True, exist_ok=True)
+    if debug_lines:
+        (root / "debug").mkdir(parents=True, exist_ok=True)
+
+    history_lines = []
+    session_ids = []
+    total_messages = 0
+    total_bytes = 0
+
+    for s in range(sessions):
+        session_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        session_ids.append(session_id)
+        project = f"/Users/bench/project{s % projects}"
+        project_dir = root / "projects" / project.replace('/', '-')
+        project_dir.mkdir(exist_ok=True)
+
+        timestamp = BASE_TIMESTAMP + s * messages * MESSAGE_INTERVAL
+        lines = [_dumps({'type': 'summary', 'summary': make_text(rng, 40, cjk_ratio),
+                         'leafUuid': str(uuid.UUID(int=rng.getrandbits(128)))})]
+
+        for m in range(messages):
+            timestamp += MESSAGE_INTERVAL
+            size = max(1, int(rng.gauss(message_size, message_size / 4)))
+            text = make_text(rng, size, cjk_ratio)
+            base = {
+                'parentUuid': None, 'isSidechain': False, 'userType': 'external',
+                'cwd': project, 'sessionId': session_id, 'version': '1.0.0',
+                'uuid': str(uuid.UUID(int=rng.getrandbits(128))), 'timestamp': _iso(timestamp),
+            }
+
+            if m % 2 == 0:
+                lines.append(_dumps({**base, 'type': 'user',
+                                     'message': {'role': 'user', 'content': text}}))
+                history_lines.append((timestamp, _dumps({
+                    'display': text[:200], 'pastedContents': {}, 'timestamp': timestamp,
+                    'project': project, 'sessionId': session_id})))
+            else:
+                tool_id = f"toolu_{s}_{m}"
+                lines.append(_dumps({**base, 'type': 'assistant', 'message': {
+                    'role': 'assistant', 'model': 'claude', 'content': [
+                        {'type': 'text', 'text': text},
+                        {'type': 'tool_use', 'id': tool_id, 'name': rng.choice(TOOL_NAMES),
+                         'input': {'file_path': f"{project}/main.py"}},
+                    ], 'usage': {'input_tokens': 1000, 'output_tokens': 200}}}))
+                # 工具调用结果：type 为 user 但没有文本内容，不计入消息
+                lines.append(_dumps({**base, 'type': 'user', 'message': {'role': 'user', 'content': [
+                    {'type': 'tool_result', 'tool_use_id': tool_id,
+                     'content': make_text(rng, message_size, 0.0)}]}}))
+            total_messages += 1
+
+        path = project_dir / f"{session_id}.jsonl"
+        data = ''.join(lines).encode('utf-8')
+        path.write_bytes(data)
+        total_bytes += len(data)
+
+        if debug_lines:
+            log = ''.join(f"[DEBUG] {_iso(timestamp + i)} {rng.choice(ASCII_WORDS)} line {i}\n"
+                          for i in range(debug_lines)).encode('utf-8')
+            (root / "debug" / f"{session_id}.txt").write_bytes(log)
+            total_bytes += len(log)
+
+    # history.jsonl 按时间顺序追加，各会话的提问交错在一起
+    history_lines.sort(key=lambda item: item[0])
+    data = ''.join(line for _, line in history_lines).encode('utf-8')
+    (root / "history.jsonl").write_bytes(data)
+    total_bytes += len(data)
+
+    return {
+        'sessions': sessions,
+        'history_entries': len(history_lines),
+        'messages': total_messages,
+        'bytes': total_bytes,
+        'session_ids': session_ids
+    }
+
+
+def add_corpus_arguments(arg_parser: argparse.ArgumentParser):
+    """为命令行添加语料规模参数"""
+    arg_parser.add_argument('--sessions', type=int, default=200, help="会话数")
+    arg_parser.add_argument('--messages', type=int, default=40, help="每个会话的消息数")
+    arg_parser.add_argument('--message-size', type=int, default=400, help="每条消息的平均字符数")
+    arg_parser.add_argument('--cjk-ratio', type=float, default=0.5, help="中文词所占比例（0-1）")
+    arg_parser.add_argument('--projects', type=int, default=8, help="项目数")
+    arg_parser.add_argument('--debug-lines', type=int, default=500, help="每个会话调试日志的行数")
+    arg_parser.add_argument('--seed', type=int, default=42, help="随机种子")
+
+
+def corpus_options(args: argparse.Namespace) -> Dict:
+    """从命令行参数中取出 build_corpus 的参数"""
+    return {
+        'sessions': args.sessions,
+        'messages': args.messages,
+        'message_size': args.message_size,
+        'cjk_ratio': args.cjk_ratio,
+        'projects': args.projects,
+        'debug_lines': args.debug_lines,
+        'seed': args.seed
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="生成合成 Claude 数据目录")
+    arg_parser.add_argument('output', help="输出目录")
+    add_corpus_arguments(arg_parser)
+    args = arg_parser.parse_args()
+
+    info = build_corpus(Path(args.output), **corpus_options(args))
+    print(f"已生成 {info['sessions']} 个会话, {info['messages']} 条消息, "
+          f"{info['history_entries']} 条历史记录, {info['bytes'] / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
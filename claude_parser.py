@@ -3,59 +3,663 @@ Claude Code 数据解析器
 解析 Claude Code 的历史记录和对话数据
 """
 
-import json
+import bisect
+import heapq
 import os
 import re
-from datetime import datetime
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import debug_log
+import fast_json
+import metrics
+from records import HistoryEntry, Message, format_iso_timestamp, format_timestamp
+from session_analytics import SessionAnalytics, aggregate_messages, merge_aggregates
+from session_cache import PREVIEW_MESSAGE_LIMIT, SessionCache
+from file_watcher import ClaudeDirWatcher
+from search_index import SearchIndex, query_terms
+from session_locator import SessionLocator
+from timeline_store import TimelineStore
+from transcript_index import build_message_offsets, find_lines_containing, read_lines_at
+
+# 摘要模式下单个对话文件最多读取的字节数
+SUMMARY_READ_LIMIT = 1024 * 1024
+
+# 内存中保留的最近查看会话数
+RECENT_SESSION_LIMIT = 32
+
+# 超过该大小的对话文件分段读取消息时使用 mmap 行偏移索引，不整体解析到内存（字节）
+LARGE_TRANSCRIPT_SIZE = 8 * 1024 * 1024
+
+# 调试日志默认读取末尾的行数，以及按范围读取的默认字节数
+DEBUG_LOG_TAIL_LINES = 200
+DEBUG_LOG_RANGE_BYTES = 64 * 1024
+
+# 统计分析中按消息数对会话分组的区间下限，以及消息最多的会话列出的数量
+SESSION_SIZE_BUCKETS = (1, 5, 10, 20, 50, 100, 200)
+ANALYTICS_TOP_SESSIONS = 10
+
+# 未启用文件监听时，统计分析最多每隔多久检查一次全部对话文件的变化（秒）；
+# 两次检查之间的请求直接返回已汇总的结果，对话文件的变化最多延迟这么久才会体现
+ANALYTICS_CHECK_INTERVAL = 5.0
+
+# 待解析的对话文件达到该数量时才启用并行解析，文件较少时进程池的启动开销得不偿失
+PARALLEL_MIN_FILES = 8
+
+# 子进程中用于解析对话文件的解析器实例（不启用缓存）
+_worker_parser = None
+
+
+def default_workers() -> int:
+    """
+    获取默认的并行解析进程数
+
+    Returns:
+        int: CPU 核数
+    """
+    return os.cpu_count() or 1
+
+
+def _parse_transcript_worker(conversation_file: Path) -> Optional[Tuple[List[Dict], int, int]]:
+    """在进程池中解析单个对话文件（模块级函数，子进程才能按名称调用）"""
+    global _worker_parser
+    if _worker_parser is None:
+        _worker_parser = ClaudeDataParser(use_cache=False, workers=1)
+    return _worker_parser._parse_conversation_range(conversation_file)
+
+
+def read_new_lines(path: Path, offset: int) -> Tuple[List[bytes], int]:
+    """
+    读取文件中 offset 之后新追加的完整行
+
+    最后一行若还没写完（没有换行符）则留到下次读取；文件比 offset 短（被截断）时从头读取
+
+    Args:
+        path: 文件路径
+        offset: 上次读取到的字节位置
+
+    Returns:
+        tuple: (新增的行列表, 新的读取位置)
+    """
+    try:
+        size = path.stat().st_size
+    except OSError:
+        return [], 0
+
+    if size < offset:
+        offset = 0
+    if size == offset:
+        return [], offset
+
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        chunk = f.read(size - offset)
+
+    end = chunk.rfind(b'\n')
+    if end < 0:
+        return [], offset
+
+    lines = [line for line in chunk[:end].split(b'\n') if line.strip()]
+    return lines, offset + end + 1
 
 
 class ClaudeDataParser:
     """Claude Code 数据解析器"""
 
-    def __init__(self, claude_dir: str = None):
+    def __init__(self, claude_dir: str = None, cache_dir: str = None, use_cache: bool = True,
+                 workers: int = None):
         """
         初始化解析器
 
         Args:
             claude_dir: Claude 配置目录路径，默认为 ~/.claude
+            cache_dir: 解析缓存目录，默认为 ~/.cache/claude-code-visualization
+            use_cache: 是否启用持久化解析缓存
+            workers: 冷启动时并行解析对话文件的进程数，默认为 CPU 核数，1 表示不并行
         """
         if claude_dir is None:
             claude_dir = os.path.expanduser("~/.claude")
 
+        self.workers = workers if workers and workers > 0 else default_workers()
+
         self.claude_dir = Path(claude_dir)
         self.history_file = self.claude_dir / "history.jsonl"
         self.debug_dir = self.claude_dir / "debug"
         self.projects_dir = self.claude_dir / "projects"
 
+        # 持久化解析缓存，缓存目录不可用时退化为每次直接解析
+        self.cache = None
+        if use_cache:
+            try:
+                self.cache = SessionCache(cache_dir)
+            except Exception as e:
+                print(f"初始化解析缓存失败，将不使用缓存: {e}")
+
+        # 全文索引，与解析缓存放在同一目录；不可用时搜索退化为逐条扫描
+        self.search_index = None
+        if self.cache is not None:
+            try:
+                self.search_index = SearchIndex(self.cache.cache_dir)
+            except Exception as e:
+                print(f"初始化全文索引失败，搜索将逐条扫描: {e}")
+
+        # sessionId -> 对话文件/调试日志 的定位索引
+        self.locator = SessionLocator(self.projects_dir, self.debug_dir)
+
+        # 历史记录和消息元数据的列式存储，与解析缓存放在同一目录；没有缓存目录时只保存在内存中
+        self.timeline = TimelineStore(self.cache.cache_dir if self.cache is not None else None)
+        self._timeline_lock = threading.Lock()
+        self._timeline_synced = False
+
+        # history.jsonl 增量解析状态
+        self._history_lock = threading.RLock()
+        self._reset_history()
+
+        # 最近查看的会话: sessionId -> ((路径, mtime_ns, size), 消息列表)
+        self._recent_sessions: OrderedDict = OrderedDict()
+        self._recent_lock = threading.Lock()
+
+        # 文件监听器，启动后由它增量维护定位索引和全文索引
+        self.watcher = None
+        self._index_synced = False
+
+        # 文件变化通知，实时推送接口用它代替轮询等待
+        self._change_condition = threading.Condition()
+
+        # 各会话统计数据的汇总，对话文件解析时增量更新
+        self.analytics = SessionAnalytics()
+        self._analytics_lock = threading.Lock()
+        self._analytics_synced = False
+        self._analytics_checked_at = 0.0
+        self._analytics_snapshot = None
+
+        # 自启动以来解析对话文件时跳过的无法解析的行数，以及无法读取的文件数
+        self._parse_errors = Counter()
+        self._errors_lock = threading.Lock()
+
     def parse_history(self) -> List[Dict]:
         """
         解析历史记录文件
 
+        history.jsonl 只会追加写入，因此只解析上次读取位置之后新增的行，
+        文件被截断或替换时才重新完整解析
+
         Returns:
-            List[Dict]: 历史记录列表
+            List[Dict]: 历史记录列表，按时间倒序
         """
-        conversations = []
+        return list(self.iter_history())
+
+    def iter_history(self) -> Iterator[Dict]:
+        """
+        逐条遍历历史记录（按时间倒序），不复制整个列表
+
+        新记录合并时会生成新的列表，因此遍历过程中不受并发刷新影响
+
+        Yields:
+            Dict: 历史记录
+        """
+        with self._history_lock:
+            self._refresh_history()
+            entries = self._history_entries
+
+        yield from entries
+
+    def iter_sessions(self) -> Iterator[Dict]:
+        """
+        按最近活动时间倒序逐个遍历会话
+
+        Yields:
+            Dict: 包含 sessionId、project、entries（该会话的历史记录，按时间倒序）的字典
+        """
+        with self._history_lock:
+            self._refresh_history()
+            entries = self._history_entries
+            by_session = self._history_by_session
+
+        seen = set()
+        for entry in entries:
+            session_id = entry.get('sessionId')
+            if not session_id or session_id in seen:
+                continue
+            seen.add(session_id)
+
+            yield {
+                'sessionId': session_id,
+                'project': entry.get('project', ''),
+                'entries': by_session.get(session_id, [entry])
+            }
+
+    def iter_messages(self, session_id: str) -> Iterator[Dict]:
+        """
+        逐条遍历会话的消息
+
+        对话文件已缓存时从缓存读取，否则逐行流式解析文件，不会一次性构建完整消息列表
+
+        Args:
+            session_id: 会话ID
+
+        Yields:
+            Dict: 消息字典
+        """
+        conversation_file = self._find_conversation_file(session_id)
+        stat = self._stat_or_none(conversation_file)
+        if stat is None:
+            return
+
+        if self.cache is not None:
+            try:
+                cached = self.cache.get_messages(str(conversation_file), stat.st_mtime_ns, stat.st_size)
+            except Exception as e:
+                print(f"读取解析缓存时出错 {conversation_file}: {e}")
+                cached = None
+            if cached is not None:
+                yield from cached
+                return
+
+        progress = {}
+        try:
+            with open(conversation_file, 'rb') as f:
+                yield from self._scan_transcript(f, 0, progress)
+        except OSError as e:
+            self._count_parse_errors(conversation_file, files=1, error=e)
+        self._count_parse_errors(conversation_file, lines=progress.get('errors', 0))
+
+    def _refresh_history(self):
+        """增量读取 history.jsonl 新追加的内容并合并到已排序的历史记录中"""
+        try:
+            stat = self.history_file.stat()
+        except OSError:
+            self._reset_history()
+            return
+
+        # 文件被替换（inode 变化）或被截断时从头重新解析
+        if stat.st_ino != self._history_inode or stat.st_size < self._history_offset:
+            self._reset_history()
+            self._history_inode = stat.st_ino
+        self._history_mtime = stat.st_mtime
+
+        if stat.st_size == self._history_offset:
+            return
+
+        with metrics.stage('history'):
+            # 最后一行可能还没写完，只处理到最后一个换行符，剩余部分下次再读
+            previous_offset = self._history_offset
+            try:
+                lines, self._history_offset = read_new_lines(self.history_file, self._history_offset)
+            except Exception as e:
+                print(f"解析历史记录时出错: {e}")
+                return
+            metrics.record_read('history', stat.st_size - previous_offset)
+
+            # 单行无法解析时跳过该行并计数，不影响其他记录
+            new_entries = []
+            for line in lines:
+                try:
+                    data = fast_json.loads(line)
+                except ValueError as e:
+                    print(f"解析历史记录时出错: {e}")
+                    self._stats['invalid_lines'] += 1
+                    continue
+
+                # formatted_time 由记录在访问时计算
+                if isinstance(data, dict):
+                    new_entries.append(HistoryEntry(data))
+                else:
+                    self._stats['invalid_lines'] += 1
+
+        self.timeline.append_history(new_entries, stat.st_ino, previous_offset, self._history_offset)
+        # 距上次写入不足 SAVE_INTERVAL 秒时不写盘
+        self.timeline.save()
+
+        if not new_entries:
+            return
+
+        # 按时间排序，最新的在前；新增部分单独排序后与已有列表归并
+        new_entries.sort(key=self._history_sort_key, reverse=True)
+        self._history_entries = list(heapq.merge(
+            self._history_entries, new_entries, key=self._history_sort_key, reverse=True
+        ))
+
+        # 对话列表只包含带会话ID的记录，单独维护一份已排序列表用于分页
+        new_listed = [entry for entry in new_entries if entry.get('sessionId')]
+        if new_listed:
+            self._listed_entries = list(heapq.merge(
+                self._listed_entries, new_listed, key=self._history_sort_key, reverse=True
+            ))
+
+        # 维护 sessionId -> 历史记录 的索引；与 _history_entries 一样总是替换为新对象，
+        # 正在遍历旧快照的调用方不受影响
+        by_session = dict(self._history_by_session)
+        changed_sessions = {}
+        for entry in new_entries:
+            session_id = entry.get('sessionId')
+            if session_id:
+                changed_sessions.setdefault(session_id, []).append(entry)
+        for session_id, session_entries in changed_sessions.items():
+            merged = by_session.get(session_id, []) + session_entries
+            merged.sort(key=self._history_sort_key, reverse=True)
+            by_session[session_id] = merged
+        self._history_by_session = by_session
+
+        self._update_stats(new_entries)
+
+    def _update_stats(self, new_entries: List[Dict]):
+        """将新增的历史记录累加到统计数据中"""
+        stats = self._stats
+        for entry in new_entries:
+            project = entry.get('project', 'Unknown')
+            stats['total'] += 1
+            stats['projects'][project] += 1
+
+            if entry.get('sessionId'):
+                stats['sessions'].add(entry['sessionId'])
+                stats['project_sessions'].setdefault(project, set()).add(entry['sessionId'])
+
+            timestamp = entry.get('timestamp')
+            if timestamp:
+                if stats['earliest'] is None or timestamp < stats['earliest']:
+                    stats['earliest'] = timestamp
+                if stats['latest'] is None or timestamp > stats['latest']:
+                    stats['latest'] = timestamp
+                if timestamp > stats['project_latest'].get(project, 0):
+                    stats['project_latest'][project] = timestamp
+
+                # 按本地日期统计每天的提问数
+                day = self._format_timestamp(timestamp)[:10]
+                if day != 'Unknown':
+                    stats['days'][day] += 1
+
+        self._summary = None
+
+    def _reset_history(self):
+        """清空已解析的历史记录状态"""
+        self._history_entries = []
+        self._listed_entries = []
+        self._history_by_session = {}
+        self._history_offset = 0
+        self._history_inode = None
+        self._history_mtime = None
+
+        # 增量维护的统计数据，以及据此生成的摘要（数据变化时置空）
+        self._stats = {
+            'total': 0,
+            'invalid_lines': 0,
+            'days': Counter(),
+            'project_sessions': {},
+            'project_latest': {},
+            'projects': Counter(),
+            'sessions': set(),
+            'earliest': None,
+            'latest': None
+        }
+        self._summary = None
+
+    @staticmethod
+    def _history_sort_key(entry: Dict):
+        """历史记录排序键"""
+        return entry.get('timestamp', 0)
+
+    def get_session_entries(self, session_id: str) -> List[Dict]:
+        """
+        获取指定会话的历史记录
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            List[Dict]: 该会话的历史记录列表，按时间倒序
+        """
+        with self._history_lock:
+            self._refresh_history()
+            return list(self._history_by_session.get(session_id, []))
+
+    def _get_session_messages(self, session_id: str) -> Optional[List[Dict]]:
+        """
+        获取会话的消息列表，最近查看过且文件未变化的会话直接从内存返回
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            List[Dict]: 对话消息列表，如果不存在则返回 None
+        """
+        conversation_file, stat = self._locate_transcript(session_id)
+        if stat is None:
+            return None
 
-        if not self.history_file.exists():
-            return conversations
+        key = (str(conversation_file), stat.st_mtime_ns, stat.st_size)
+        with self._recent_lock:
+            recent = self._recent_sessions.get(session_id)
+            if recent is not None and recent[0] == key:
+                self._recent_sessions.move_to_end(session_id)
+                return recent[1]
 
+        messages = self._load_conversation_file(conversation_file, session_id) or None
+
+        with self._recent_lock:
+            self._recent_sessions[session_id] = (key, messages)
+            self._recent_sessions.move_to_end(session_id)
+            while len(self._recent_sessions) > RECENT_SESSION_LIMIT:
+                self._recent_sessions.popitem(last=False)
+
+        return messages
+
+    def _locate_transcript(self, session_id: str) -> Tuple[Optional[Path], Optional[os.stat_result]]:
+        """
+        查找会话的对话文件并获取文件信息
+
+        定位索引中没有或文件已被移动时，重新扫描一次目录
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            tuple: (对话文件路径, 文件信息)，文件不存在时文件信息为 None
+        """
+        conversation_file = self.locator.find_transcript(session_id)
+        stat = self._stat_or_none(conversation_file)
+
+        if stat is None:
+            self.locator.refresh()
+            conversation_file = self.locator.find_transcript(session_id)
+            stat = self._stat_or_none(conversation_file)
+
+        return conversation_file, stat
+
+    def get_session_messages(self, session_id: str, offset: int = 0, limit: int = None,
+                             before: str = None, after: str = None) -> Optional[Dict]:
+        """
+        分段获取会话的消息
+
+        超过 LARGE_TRANSCRIPT_SIZE 的对话文件通过 mmap 行偏移索引只解码请求的消息，
+        较小的文件整体解析后切片
+
+        Args:
+            session_id: 会话ID
+            offset: 起始消息序号，负数表示从末尾倒数；指定 before/after 时忽略
+            limit: 最多返回的消息数，None 表示不限
+            before: 返回该 uuid 对应消息之前的 limit 条消息
+            after: 返回该 uuid 对应消息之后的 limit 条消息
+
+        Returns:
+            Dict: 包含 messages、total、offset（实际起始序号）的字典；对话文件不存在时返回 None
+
+        Raises:
+            KeyError: before/after 指定的消息不存在
+        """
+        conversation_file, stat = self._locate_transcript(session_id)
+        if stat is None:
+            return None
+
+        if stat.st_size < LARGE_TRANSCRIPT_SIZE:
+            messages = self._get_session_messages(session_id) or []
+            offsets = None
+            total = len(messages)
+        else:
+            messages = None
+            offsets = self._get_message_offsets(conversation_file, stat)
+            total = len(offsets)
+
+        anchor = before or after
+        if anchor:
+            if messages is not None:
+                index = next((i for i, message in enumerate(messages)
+                              if message.get('uuid') == anchor), None)
+            else:
+                index = self._find_message_index(conversation_file, offsets, anchor)
+            if index is None:
+                raise KeyError(anchor)
+
+            if before:
+                stop = index
+                start = 0 if limit is None else max(stop - max(limit, 0), 0)
+            else:
+                start = index + 1
+                stop = total if limit is None else min(start + max(limit, 0), total)
+        else:
+            start = max(total + offset, 0) if offset < 0 else min(offset, total)
+            stop = total if limit is None else min(start + max(limit, 0), total)
+
+        if messages is not None:
+            window = messages[start:stop]
+        else:
+            window = self._read_messages_at(conversation_file, offsets[start:stop])
+
+        return {'messages': window, 'total': total, 'offset': start}
+
+    def _find_message_index(self, conversation_file: Path, offsets, uuid: str) -> Optional[int]:
+        """
+        在大型对话文件中查找 uuid 对应消息的序号
+
+        先按字节查找 uuid 出现的位置，只解码包含它的消息行进行确认
+        （同一 uuid 也会作为下一条记录的 parentUuid 出现）
+
+        Args:
+            conversation_file: 对话文件路径
+            offsets: 消息行偏移索引
+            uuid: 消息 uuid
+
+        Returns:
+            int: 消息序号，找不到时返回 None
+        """
+        try:
+            for line_start in find_lines_containing(conversation_file, uuid.encode('utf-8')):
+                index = bisect.bisect_left(offsets, line_start)
+                if index >= len(offsets) or offsets[index] != line_start:
+                    continue
+                messages = self._read_messages_at(conversation_file, [line_start])
+                if messages and messages[0].get('uuid') == uuid:
+                    return index
+        except OSError as e:
+            print(f"读取对话文件时出错 {conversation_file}: {e}")
+        return None
+
+    def _get_message_offsets(self, conversation_file: Path, stat: os.stat_result):
+        """
+        获取对话文件的消息行偏移索引，优先使用持久化缓存
+
+        文件仍是同一个（inode 相同）且只是变长时，从上次扫描到的位置继续扫描，不重新扫描整个文件
+
+        Args:
+            conversation_file: 对话文件路径
+            stat: 文件信息
+
+        Returns:
+            array: 每条消息所在行的起始字节位置
+        """
+        path = str(conversation_file)
+        offsets, scanned_offset = None, 0
+
+        if self.cache is not None:
+            try:
+                with metrics.stage('cache'):
+                    cached = self.cache.get_line_index(path, stat.st_mtime_ns, stat.st_size)
+                    if cached is not None:
+                        return cached
+                    resumable = self.cache.get_resumable_line_index(path, stat.st_ino, stat.st_size)
+                if resumable is not None:
+                    offsets, scanned_offset = resumable
+            except Exception as e:
+                print(f"读取行偏移索引时出错 {conversation_file}: {e}")
+
+        start = scanned_offset
+        try:
+            with metrics.stage('transcript_index'):
+                offsets, scanned_offset = build_message_offsets(conversation_file, self._is_message_line,
+                                                                start, offsets)
+            metrics.record_read('transcript', stat.st_size - start)
+        except OSError as e:
+            print(f"扫描对话文件时出错 {conversation_file}: {e}")
+            return []
+
+        if self.cache is not None:
+            try:
+                self.cache.put_line_index(path, stat.st_mtime_ns, stat.st_size, offsets,
+                                          scanned_offset, stat.st_ino)
+            except Exception as e:
+                print(f"写入行偏移索引时出错 {conversation_file}: {e}")
+
+        return offsets
+
+    def _prune_line_index(self, paths):
+        """删除已不存在的对话文件的行偏移索引"""
+        if self.cache is None:
+            return
         try:
-            with open(self.history_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    if line.strip():
-                        data = json.loads(line.strip())
-                        # 转换时间戳
-                        if 'timestamp' in data:
-                            data['formatted_time'] = self._format_timestamp(data['timestamp'])
-                        conversations.append(data)
+            self.cache.prune_line_index(paths)
         except Exception as e:
-            print(f"解析历史记录时出错: {e}")
+            print(f"清理行偏移索引时出错: {e}")
 
-        # 按时间排序，最新的在前
-        conversations.sort(key=lambda x: x.get('timestamp', 0), reverse=True)
-        return conversations
+    def _is_message_line(self, line: bytes) -> bool:
+        """判断一行是否会被解析为消息；无法解码的行（如正在写入的最后一行）视为不是"""
+        try:
+            return self._parse_message_line(line) is not None
+        except ValueError:
+            return False
+
+    def _read_messages_at(self, conversation_file: Path, offsets) -> List[Dict]:
+        """
+        解码指定位置的消息行
+
+        Args:
+            conversation_file: 对话文件路径
+            offsets: 消息行起始字节位置
+
+        Returns:
+            List[Dict]: 消息列表
+        """
+        with metrics.stage('transcript'):
+            try:
+                lines = read_lines_at(conversation_file, offsets)
+            except OSError as e:
+                print(f"读取对话文件时出错 {conversation_file}: {e}")
+                return []
+            metrics.record_read('transcript', sum(len(line) for line in lines))
+
+            messages = []
+            for line in lines:
+                try:
+                    message = self._parse_message_line(line)
+                except ValueError:
+                    continue
+                if message:
+                    messages.append(message)
+        return messages
+
+    @staticmethod
+    def _stat_or_none(path: Optional[Path]):
+        """获取文件状态，文件不存在时返回 None"""
+        if path is None:
+            return None
+        try:
+            return path.stat()
+        except OSError:
+            return None
 
     def get_debug_logs(self, session_id: str) -> Optional[str]:
         """
@@ -67,55 +671,363 @@ class ClaudeDataParser:
         Returns:
             str: 调试日志内容，如果不存在则返回 None
         """
-        debug_file = self.debug_dir / f"{session_id}.txt"
+        self.locator.refresh()
+        debug_file = self.locator.find_debug_log(session_id)
 
-        if not debug_file.exists():
+        if debug_file is None:
             return None
 
         try:
-            with open(debug_file, 'r', encoding='utf-8') as f:
-                return f.read()
+            with metrics.stage('debug_log'), open(debug_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+                metrics.record_read('debug_log', f.buffer.tell())
+                return content
         except Exception as e:
             print(f"读取调试日志时出错: {e}")
             return None
 
+    def get_debug_log_info(self, session_id: str) -> Optional[Dict]:
+        """
+        获取调试日志的文件信息，不读取内容
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            Dict: 包含 size（字节数）的字典，日志不存在时返回 None
+        """
+        self.locator.refresh()
+        stat = self._stat_or_none(self.locator.find_debug_log(session_id))
+        if stat is None:
+            return None
+        return {'size': stat.st_size}
+
+    def read_debug_log(self, session_id: str, tail: int = None, offset: int = None,
+                       length: int = None, keyword: str = None) -> Optional[Dict]:
+        """
+        分段读取调试日志
+
+        指定 offset 时按字节范围读取，否则从文件末尾向前读取最后 tail 行
+
+        Args:
+            session_id: 会话ID
+            tail: 读取末尾的行数（默认 DEBUG_LOG_TAIL_LINES）
+            offset: 按范围读取的起始字节位置，负数表示从末尾倒数
+            length: 按范围读取的字节数（默认 DEBUG_LOG_RANGE_BYTES）
+            keyword: 只返回包含该关键词的行（不区分大小写）
+
+        Returns:
+            Dict: 读取结果（字段见 debug_log.read_tail / read_range），日志不存在时返回 None
+        """
+        self.locator.refresh()
+        debug_file = self.locator.find_debug_log(session_id)
+        if debug_file is None:
+            return None
+
+        try:
+            with metrics.stage('debug_log'):
+                if offset is not None:
+                    length = DEBUG_LOG_RANGE_BYTES if length is None else length
+                    result = debug_log.read_range(debug_file, offset, length, keyword)
+                    metrics.record_read('debug_log', result['end'] - result['start'])
+                else:
+                    tail = DEBUG_LOG_TAIL_LINES if tail is None else tail
+                    result = debug_log.read_tail(debug_file, max(tail, 0), keyword)
+                    if metrics.current() is not None:
+                        metrics.record_read('debug_log', len(result['content'].encode('utf-8')))
+            return result
+        except OSError as e:
+            print(f"读取调试日志时出错: {e}")
+            return None
+
     def get_conversation_summary(self) -> Dict:
         """
         获取对话统计摘要
 
+        统计数据随新增的历史记录增量更新，数据不变时直接返回同一份摘要
+
         Returns:
-            Dict: 包含统计信息的字典
+            Dict: 包含统计信息的字典（共享对象，调用方不应修改）
         """
-        conversations = self.parse_history()
+        with self._history_lock:
+            self._refresh_history()
+            if self._summary is None:
+                self._summary = self._build_summary()
+            return self._summary
 
-        if not conversations:
+    def _build_summary(self) -> Dict:
+        """根据增量维护的统计数据生成摘要"""
+        stats = self._stats
+
+        if not stats['total']:
             return {
                 'total_conversations': 0,
                 'projects': [],
                 'date_range': None
             }
 
-        # 统计项目
-        projects = list(set(conv.get('project', 'Unknown') for conv in conversations))
-
-        # 时间范围
-        timestamps = [conv.get('timestamp', 0) for conv in conversations if conv.get('timestamp')]
         date_range = None
-        if timestamps:
-            earliest = min(timestamps)
-            latest = max(timestamps)
+        if stats['earliest'] is not None:
             date_range = {
-                'earliest': self._format_timestamp(earliest),
-                'latest': self._format_timestamp(latest)
+                'earliest': self._format_timestamp(stats['earliest']),
+                'latest': self._format_timestamp(stats['latest'])
             }
 
         return {
-            'total_conversations': len(conversations),
-            'projects': projects,
+            'total_conversations': stats['total'],
+            'projects': list(stats['projects']),
             'date_range': date_range,
-            'sessions': len(set(conv.get('sessionId') for conv in conversations if conv.get('sessionId')))
+            'sessions': len(stats['sessions'])
+        }
+
+    def get_analytics(self) -> Dict:
+        """
+        获取统计分析数据
+
+        各会话的统计数据在解析对话文件时已计算好，按天、按项目的提问数随历史记录增量更新；
+        这里只在数据变化后汇总一次，之后直接返回同一份结果。
+        未启用文件监听时需要检查每个对话文件的状态，耗时与文件数成正比，
+        因此最多每 ANALYTICS_CHECK_INTERVAL 秒检查一次
+
+        Returns:
+            Dict: 包含 version、overview、daily、tools、projects、sessions 的字典（共享对象，调用方不应修改）
+        """
+        self._refresh_analytics()
+
+        with self._history_lock:
+            self._refresh_history()
+            key = (self._history_inode, self._history_offset, self.analytics.version)
+            snapshot = self._analytics_snapshot
+            if snapshot is None or snapshot[0] != key:
+                snapshot = (key, self._build_analytics(key))
+                self._analytics_snapshot = snapshot
+            return snapshot[1]
+
+    def _refresh_analytics(self):
+        """
+        使统计汇总与对话文件同步；启用文件监听后由监听回调逐个更新，不再逐个检查文件，
+        未启用时距上次检查不足 ANALYTICS_CHECK_INTERVAL 秒则跳过
+        """
+        if self._analytics_synced and (
+                self.watcher is not None
+                or time.monotonic() - self._analytics_checked_at < ANALYTICS_CHECK_INTERVAL):
+            return
+
+        with self._analytics_lock:
+            self.locator.refresh()
+            transcripts = self.locator.all_transcripts()
+
+            if not self._analytics_synced:
+                # 首次汇总时先读取缓存中已有的统计数据，再并行解析缓存中没有的对话文件
+                if self.cache is not None:
+                    try:
+                        for path, session_id, mtime_ns, size, stats in self.cache.iter_stats():
+                            self.analytics.update(path, session_id, (mtime_ns, size), stats)
+                    except Exception as e:
+                        print(f"读取统计数据缓存时出错: {e}")
+                self._parse_transcripts_parallel(transcripts, keep_results=False)
+
+            current = set()
+            for session_id, conversation_file in transcripts.items():
+                current.add(str(conversation_file))
+                self._refresh_session_analytics(session_id, conversation_file)
+
+            for path in self.analytics.paths():
+                if path not in current:
+                    self.analytics.remove(path)
+            self._prune_line_index(current)
+            self._analytics_checked_at = time.monotonic()
+
+            self._analytics_synced = True
+
+    def _refresh_session_analytics(self, session_id: str, conversation_file: Path):
+        """更新单个对话文件的统计数据，优先从缓存读取，缓存中没有时解析对话文件"""
+        path = str(conversation_file)
+        stat = self._stat_or_none(conversation_file)
+        if stat is None:
+            self.analytics.remove(path)
+            return
+
+        version = (stat.st_mtime_ns, stat.st_size)
+        if self.analytics.is_current(path, version):
+            return
+
+        stats = None
+        if self.cache is not None:
+            try:
+                stats = self.cache.get_stats(path, stat.st_mtime_ns, stat.st_size)
+            except Exception as e:
+                print(f"读取统计数据缓存时出错 {conversation_file}: {e}")
+
+        if stats is not None:
+            self.analytics.update(path, session_id, version, stats)
+        else:
+            # 解析后由 _store_messages 更新统计数据
+            self._load_conversation_file(conversation_file, session_id)
+
+    def _build_analytics(self, key: tuple) -> Dict:
+        """根据增量维护的统计数据生成统计分析结果"""
+        stats = self._stats
+        analytics = self.analytics
+
+        projects = {
+            project: {
+                'project': project,
+                'prompts': prompts,
+                'sessions': len(stats['project_sessions'].get(project, ())),
+                'messages': 0,
+                'last_activity': (self._format_timestamp(stats['project_latest'][project])
+                                  if project in stats['project_latest'] else None)
+            }
+            for project, prompts in stats['projects'].items()
         }
 
+        # 会话所属项目取自历史记录；只有对话文件、没有历史记录的会话只计入总数
+        histogram = [0] * len(SESSION_SIZE_BUCKETS)
+        session_sizes = []
+        for session_id, aggregate in analytics.sessions():
+            size = aggregate['user_messages'] + aggregate['assistant_messages']
+            entries = self._history_by_session.get(session_id)
+            project = entries[0].get('project', 'Unknown') if entries else None
+            if project in projects:
+                projects[project]['messages'] += size
+
+            if size:
+                histogram[bisect.bisect_right(SESSION_SIZE_BUCKETS, size) - 1] += 1
+                session_sizes.append((size, session_id, project, sum(aggregate['tools'].values())))
+
+        buckets = []
+        for i, low in enumerate(SESSION_SIZE_BUCKETS):
+            high = SESSION_SIZE_BUCKETS[i + 1] - 1 if i + 1 < len(SESSION_SIZE_BUCKETS) else None
+            buckets.append({'min': low, 'max': high, 'count': histogram[i]})
+
+        days = sorted(stats['days'].items())
+        tools = analytics.tools.most_common()
+        total_messages = analytics.user_messages + analytics.assistant_messages
+
+        return {
+            'version': '-'.join(str(part) for part in key),
+            'overview': {
+                'prompts': stats['total'],
+                'sessions': len(stats['sessions']),
+                'transcripts': len(session_sizes),
+                'user_messages': analytics.user_messages,
+                'assistant_messages': analytics.assistant_messages,
+                'tool_calls': sum(count for _, count in tools),
+                'active_days': len(days),
+                'first_day': days[0][0] if days else None,
+                'last_day': days[-1][0] if days else None
+            },
+            'daily': [{'date': day, 'prompts': count} for day, count in days],
+            'tools': [{'name': name, 'count': count} for name, count in tools],
+            'projects': sorted(projects.values(), key=lambda item: item['prompts'], reverse=True),
+            'sessions': {
+                'average': round(total_messages / len(session_sizes), 1) if session_sizes else 0,
+                'max': max(session_sizes)[0] if session_sizes else 0,
+                'histogram': buckets,
+                'top': [
+                    {'sessionId': session_id, 'project': project, 'messages': size, 'tool_calls': tool_calls}
+                    for size, session_id, project, tool_calls in heapq.nlargest(ANALYTICS_TOP_SESSIONS, session_sizes)
+                ]
+            }
+        }
+
+    def get_timeline(self, source: str = 'history', start_time: int = None, end_time: int = None,
+                     by: str = 'day', limit: int = None) -> Dict:
+        """
+        按时间范围和分组方式统计历史记录中的提问或对话消息（日期选择器和图表使用）
+
+        Args:
+            source: history（历史记录中的提问）或 messages（对话消息）
+            start_time: 时间范围起点（毫秒，包含，可选）
+            end_time: 时间范围终点（毫秒，不包含，可选）
+            by: 分组方式，day、month、project、session 或 type（仅 messages）
+            limit: 按项目、会话或类型分组时最多返回的分组数（可选）
+
+        Returns:
+            Dict: 包含 count、length 和 groups 的字典，见 TimelineStore.query()
+
+        Raises:
+            ValueError: source 或 by 不支持，或 limit 小于 1
+        """
+        with self._history_lock:
+            self._refresh_history()
+        if source == 'messages':
+            self._refresh_timeline()
+
+        result = self.timeline.query(source, start_time, end_time, by, limit)
+        self.timeline.save()
+        return result
+
+    def _refresh_timeline(self):
+        """使消息元数据与对话文件同步；启用文件监听后由监听回调逐个更新，不再逐个检查文件"""
+        if self.watcher is not None and self._timeline_synced:
+            return
+
+        with self._timeline_lock:
+            self.locator.refresh()
+            transcripts = self.locator.all_transcripts()
+
+            if not self._timeline_synced:
+                self._parse_transcripts_parallel(transcripts, keep_results=False)
+
+            for session_id, conversation_file in transcripts.items():
+                self._refresh_session_timeline(session_id, conversation_file)
+
+            for session_id in self.timeline.transcripts():
+                if session_id not in transcripts:
+                    self.timeline.remove_transcript(session_id)
+
+            self._timeline_synced = True
+
+    def _refresh_session_timeline(self, session_id: str, conversation_file: Path):
+        """对话文件变化后更新它的消息元数据，消息优先从解析缓存读取"""
+        stat = self._stat_or_none(conversation_file)
+        if stat is None:
+            self.timeline.remove_transcript(session_id)
+            return
+
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if self.timeline.is_current(session_id, version):
+            return
+
+        messages = self._load_conversation_file(conversation_file, session_id)
+        self.timeline.update_transcript(session_id, str(conversation_file), version, messages)
+
+    def get_history_version(self) -> Dict:
+        """
+        获取历史记录的版本信息，用于 HTTP 缓存校验
+
+        Returns:
+            Dict: 包含 etag（随 history.jsonl 内容变化）和 last_modified（文件修改时间戳，可能为 None）
+        """
+        with self._history_lock:
+            self._refresh_history()
+            return {
+                'etag': f"history-{self._history_inode}-{self._history_offset}",
+                'last_modified': self._history_mtime
+            }
+
+    def get_session_version(self, session_id: str) -> str:
+        """
+        获取会话详情的版本标识，用于 HTTP 缓存校验
+
+        只检查文件信息（对话文件、调试日志、history.jsonl 的 mtime 和大小），不读取也不解析文件
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            str: 任意一个相关文件变化时都会改变的字符串
+        """
+        parts = []
+        for path in (self.locator.find_transcript(session_id),
+                     self.locator.find_debug_log(session_id),
+                     self.history_file):
+            stat = self._stat_or_none(path)
+            parts.append(f"{stat.st_ino}-{stat.st_mtime_ns}-{stat.st_size}" if stat else "none")
+        return ':'.join(parts)
+
     def search_conversations(self, query: str, project: str = None) -> List[Dict]:
         """
         搜索对话记录
@@ -127,10 +1039,9 @@ class ClaudeDataParser:
         Returns:
             List[Dict]: 匹配的对话记录
         """
-        conversations = self.parse_history()
         results = []
 
-        for conv in conversations:
+        for conv in self.iter_history():
             # 项目过滤
             if project and conv.get('project') != project:
                 continue
@@ -148,13 +1059,39 @@ class ClaudeDataParser:
         Returns:
             List[Dict]: 包含完整对话的记录列表
         """
-        conversations = []
-
         # 首先获取基础历史记录
         basic_history = self.parse_history()
+        self.locator.refresh()
+
+        return self._attach_full_conversations(basic_history)
+
+    def _attach_full_conversations(self, entries: List[Dict]) -> List[Dict]:
+        """
+        为历史记录附加完整对话内容
+
+        Args:
+            entries: 历史记录列表
+
+        Returns:
+            List[Dict]: 包含完整对话的记录列表
+        """
+        conversations = []
+
+        # 缓存中没有的对话文件先并行解析
+        transcripts = {}
+        for session_id in dict.fromkeys(entry.get('sessionId') for entry in entries):
+            conversation_file = self._find_conversation_file(session_id) if session_id else None
+            if conversation_file is not None:
+                transcripts[session_id] = conversation_file
+
+        # 同一会话的多条历史记录共用同一份对话内容，每个对话文件只解析一次
+        session_conversations: Dict[str, Optional[List[Dict]]] = {
+            session_id: messages or None
+            for session_id, messages in self._parse_transcripts_parallel(transcripts).items()
+        }
 
         # 为每个会话获取完整对话
-        for entry in basic_history:
+        for entry in entries:
             session_id = entry.get('sessionId')
             project = entry.get('project', '')
 
@@ -162,7 +1099,9 @@ class ClaudeDataParser:
                 continue
 
             # 获取完整对话内容
-            full_conversation = self._get_full_conversation(session_id, project)
+            if session_id not in session_conversations:
+                session_conversations[session_id] = self._get_full_conversation(session_id, project)
+            full_conversation = session_conversations[session_id]
 
             if full_conversation:
                 # 合并基础信息和完整对话
@@ -174,85 +1113,590 @@ class ClaudeDataParser:
                 conversations.append(enhanced_entry)
             else:
                 # 如果没有找到完整对话，保留原始记录
-                entry['has_full_content'] = False
-                conversations.append(entry)
+                conversations.append({**entry, 'has_full_content': False})
+
+        return conversations
+
+    def parse_conversation_summaries(self, limit: int = None, offset: int = 0,
+                                     preview_count: int = PREVIEW_MESSAGE_LIMIT) -> List[Dict]:
+        """
+        解析对话摘要（轻量模式），列表页使用，不加载完整对话内容
+
+        每条记录包含 preview_messages（前 preview_count 条消息）、message_count、
+        first_timestamp、last_timestamp 和 has_full_content。
+        对话文件已缓存时直接读取缓存中的摘要，否则只读取文件开头的一部分；
+        此时若文件未读完，message_count 和 last_timestamp 为 None
+
+        Args:
+            limit: 最多返回的记录数（可选）
+            offset: 跳过的记录数，用于分页
+            preview_count: 每个会话的预览消息数
+
+        Returns:
+            List[Dict]: 对话摘要列表，按时间倒序
+        """
+        with self._history_lock:
+            self._refresh_history()
+            listed = self._listed_entries
+
+        stop = offset + limit if limit is not None else None
+
+        self.locator.refresh()
+        return self._summarize_entries(listed[offset:stop], preview_count)
+
+    def get_conversations_page(self, page: int = 1, per_page: int = 20, cursor: str = None,
+                               preview_count: int = PREVIEW_MESSAGE_LIMIT,
+                               start_time: int = None, end_time: int = None) -> Dict:
+        """
+        获取一页对话摘要，只读取这一页涉及的对话文件
+
+        支持按页码分页，也支持按游标（上一页返回的 next_cursor）分页，
+        游标分页在翻页期间有新记录写入时不会出现重复或遗漏。
+        对话列表按时间排序，时间范围通过二分查找确定，不逐条比较
+
+        Args:
+            page: 页码，从 1 开始；指定 cursor 时忽略
+            per_page: 每页条数
+            cursor: 游标，格式为 "时间戳:同一时间戳已返回的条数"
+            preview_count: 每个会话的预览消息数
+            start_time: 只返回该时间（毫秒，包含）之后的记录（可选）
+            end_time: 只返回该时间（毫秒，不包含）之前的记录（可选）
+
+        Returns:
+            Dict: 包含 conversations 和分页信息（page、per_page、total、pages、
+                  has_prev、has_next、next_cursor）的字典
+
+        Raises:
+            ValueError: per_page 小于 1
+        """
+        if per_page < 1:
+            raise ValueError(f"每页条数必须大于 0: {per_page}")
+
+        with self._history_lock:
+            self._refresh_history()
+            listed = self._listed_entries
+
+        # 时间范围对应的下标区间 [first, last)
+        first = self._time_position(listed, end_time - 1) if end_time is not None else 0
+        last = self._time_position(listed, start_time - 1) if start_time is not None else len(listed)
+        last = max(first, last)
+
+        total = last - first
+        if cursor:
+            start = max(self._cursor_position(listed, cursor), first)
+        else:
+            start = first + (max(page, 1) - 1) * per_page
+        end = min(start + per_page, last)
+
+        self.locator.refresh()
+        conversations = self._summarize_entries(listed[start:end], preview_count)
+
+        return {
+            'conversations': conversations,
+            'page': (start - first) // per_page + 1,
+            'per_page': per_page,
+            'total': total,
+            'pages': (total + per_page - 1) // per_page,
+            'has_prev': start > first,
+            'has_next': end < last,
+            'next_cursor': self._make_cursor(listed, end - 1) if end < last else None
+        }
+
+    def _make_cursor(self, entries: List[Dict], index: int) -> str:
+        """
+        生成指向 entries[index] 之后位置的游标
+
+        Args:
+            entries: 按时间倒序排列的记录
+            index: 当前页最后一条记录的下标
+
+        Returns:
+            str: 游标
+        """
+        timestamp = self._history_sort_key(entries[index])
+        seen = 0
+        while index - seen >= 0 and self._history_sort_key(entries[index - seen]) == timestamp:
+            seen += 1
+        return f"{timestamp}:{seen}"
+
+    def _cursor_position(self, entries: List[Dict], cursor: str) -> int:
+        """
+        二分查找游标对应的起始下标
+
+        Args:
+            entries: 按时间倒序排列的记录
+            cursor: 游标
+
+        Returns:
+            int: 下一页第一条记录的下标，游标格式错误时返回 0
+        """
+        try:
+            timestamp, seen = (int(part) for part in cursor.split(':', 1))
+        except ValueError:
+            return 0
+
+        return min(self._time_position(entries, timestamp) + seen, len(entries))
+
+    def _time_position(self, entries: List[Dict], timestamp: int) -> int:
+        """
+        二分查找第一条时间戳 <= timestamp 的记录
+
+        Args:
+            entries: 按时间倒序排列的记录
+            timestamp: 毫秒级时间戳
+
+        Returns:
+            int: 记录的下标，没有时返回 len(entries)
+        """
+        low, high = 0, len(entries)
+        while low < high:
+            mid = (low + high) // 2
+            if self._history_sort_key(entries[mid]) > timestamp:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def _summarize_entries(self, entries: Iterable[Dict], preview_count: int) -> List[Dict]:
+        """
+        为历史记录附加会话摘要，同一会话只计算一次
+
+        Args:
+            entries: 历史记录
+            preview_count: 每个会话的预览消息数
+
+        Returns:
+            List[Dict]: 附加了摘要信息的记录列表
+        """
+        conversations = []
+        session_summaries: Dict[str, Dict] = {}
+
+        for entry in entries:
+            session_id = entry.get('sessionId')
+            if not session_id:
+                continue
+
+            if session_id not in session_summaries:
+                session_summaries[session_id] = self._get_session_summary(session_id, preview_count)
+
+            conversations.append({**entry, **session_summaries[session_id]})
 
         return conversations
 
+    def _get_session_summary(self, session_id: str, preview_count: int) -> Dict:
+        """
+        获取会话摘要
+
+        Args:
+            session_id: 会话ID
+            preview_count: 预览消息数
+
+        Returns:
+            Dict: 会话摘要
+        """
+        summary = {
+            'preview_messages': [],
+            'message_count': 0,
+            'first_timestamp': None,
+            'last_timestamp': None,
+            'has_full_content': False
+        }
+
+        conversation_file = self._find_conversation_file(session_id)
+        if not conversation_file:
+            return summary
+
+        try:
+            stat = conversation_file.stat()
+        except OSError as e:
+            print(f"读取对话文件信息时出错 {conversation_file}: {e}")
+            return summary
+
+        cached = None
+        if self.cache is not None and preview_count <= PREVIEW_MESSAGE_LIMIT:
+            try:
+                cached = self.cache.get_summary(str(conversation_file), stat.st_mtime_ns, stat.st_size)
+            except Exception as e:
+                print(f"读取解析缓存时出错 {conversation_file}: {e}")
+
+        if cached is not None:
+            summary.update(cached)
+            summary['preview_messages'] = cached['preview_messages'][:preview_count]
+        else:
+            messages, complete, parsed_offset = self._read_conversation_prefix(
+                conversation_file, preview_count)
+
+            # 整个文件都已读完，顺便写入缓存
+            if complete:
+                self._store_messages(conversation_file, session_id, stat, messages, parsed_offset)
+
+            summary.update({
+                'preview_messages': messages[:preview_count],
+                'message_count': len(messages) if complete else None,
+                'first_timestamp': messages[0].get('timestamp') if messages else None,
+                'last_timestamp': messages[-1].get('timestamp') if messages and complete else None
+            })
+
+        summary['has_full_content'] = bool(summary['preview_messages'])
+        return summary
+
+    def _read_conversation_prefix(self, conversation_file: Path, max_messages: int):
+        """
+        只读取对话文件开头的部分消息
+
+        读取到 max_messages 条以上消息或超过 SUMMARY_READ_LIMIT 字节时停止
+
+        Args:
+            conversation_file: 对话文件路径
+            max_messages: 需要的消息数
+
+        Returns:
+            tuple: (消息列表, 是否已读完整个文件, 已完整解析到的字节位置)
+        """
+        messages = []
+        progress = {}
+
+        try:
+            with metrics.stage('transcript'), open(conversation_file, 'rb') as f:
+                for message in self._scan_transcript(f, 0, progress):
+                    messages.append(message)
+
+                    # 多读一条消息，用于判断后面是否还有内容
+                    if len(messages) > max_messages or progress['offset'] >= SUMMARY_READ_LIMIT:
+                        return messages, False, progress['offset']
+        except OSError as e:
+            self._count_parse_errors(conversation_file, files=1, error=e)
+            return messages, False, 0
+        finally:
+            metrics.record_read('transcript', progress.get('offset', 0))
+            self._count_parse_errors(conversation_file, lines=progress.get('errors', 0))
+
+        return messages, True, progress['offset']
+
     def _get_full_conversation(self, session_id: str, project: str) -> Optional[List[Dict]]:
         """
         获取指定会话的完整对话记录
 
         Args:
             session_id: 会话ID
-            project: 项目路径
+            project: 项目路径（对话文件由定位索引按会话ID查找，不再依赖项目路径）
 
         Returns:
             List[Dict]: 对话消息列表，如果不存在则返回 None
         """
-        # 构建项目目录路径
-        project_safe = project.replace('/', '-').replace('\\', '-')
-        if project_safe.startswith('-'):
-            project_safe = project_safe[1:]
+        conversation_file = self._find_conversation_file(session_id)
 
-        # 查找对话文件
-        conversation_file = None
-        project_dir = self.projects_dir / project_safe
+        if not conversation_file:
+            return None
 
-        if project_dir.exists():
-            # 查找以session_id命名的文件
-            session_file = project_dir / f"{session_id}.jsonl"
-            if session_file.exists():
-                conversation_file = session_file
+        messages = self._load_conversation_file(conversation_file, session_id)
+        return messages if messages else None
 
-        if not conversation_file:
-            # 如果没有找到，尝试在所有项目目录中搜索
-            for project_path in self.projects_dir.glob("*"):
-                if project_path.is_dir():
-                    session_file = project_path / f"{session_id}.jsonl"
-                    if session_file.exists():
-                        conversation_file = session_file
-                        break
+    def _find_conversation_file(self, session_id: str) -> Optional[Path]:
+        """
+        通过定位索引查找会话对应的对话文件
 
-        if not conversation_file:
-            return None
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            Path: 对话文件路径，如果不存在则返回 None
+        """
+        return self.locator.find_transcript(session_id)
+
+    def _load_conversation_file(self, conversation_file: Path, session_id: str) -> List[Dict]:
+        """
+        读取对话文件中的消息，优先使用持久化缓存
 
+        Args:
+            conversation_file: 对话文件路径
+            session_id: 会话ID
+
+        Returns:
+            List[Dict]: 对话消息列表，解析失败时返回空列表
+        """
         try:
-            messages = []
-            with open(conversation_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    if line.strip():
-                        data = json.loads(line.strip())
-
-                        # 只处理用户和助手消息
-                        if data.get('type') in ['user', 'assistant']:
-                            message_data = data.get('message', {})
-
-                            # 提取消息内容
-                            content = self._extract_message_content(message_data)
-
-                            if content:
-                                message = {
-                                    'type': data.get('type'),
-                                    'content': content,
-                                    'timestamp': data.get('timestamp'),
-                                    'uuid': data.get('uuid'),
-                                    'formatted_time': self._format_iso_timestamp(data.get('timestamp'))
-                                }
-                                messages.append(message)
-
-            return messages if messages else None
+            stat = conversation_file.stat()
+        except OSError as e:
+            print(f"读取对话文件信息时出错 {conversation_file}: {e}")
+            return []
+
+        path = str(conversation_file)
+
+        # 文件只是追加了内容时，从上次解析到的位置继续解析，不重新解析整个文件
+        previous, offset, previous_stats = [], 0, None
+        if self.cache is not None:
+            try:
+                with metrics.stage('cache'):
+                    cached = self.cache.get_messages(path, stat.st_mtime_ns, stat.st_size)
+                    if cached is not None:
+                        return cached
+                    resumable = self.cache.get_resumable(path, stat.st_ino, stat.st_size)
+                if resumable is not None:
+                    previous, offset, previous_stats = resumable
+            except Exception as e:
+                print(f"读取解析缓存时出错 {conversation_file}: {e}")
+
+        parsed = self._parse_conversation_range(conversation_file, offset)
+        if parsed is None:
+            self._count_parse_errors(conversation_file, files=1)
+            return previous
+        messages, parsed_offset, errors = parsed
+        self._count_parse_errors(conversation_file, lines=errors)
+
+        # 统计数据同样只计算新追加的部分，再与之前的合并
+        stats = None
+        if previous_stats is not None:
+            stats = merge_aggregates(previous_stats, aggregate_messages(messages))
+        messages = previous + messages
+
+        self._store_messages(conversation_file, session_id, stat, messages, parsed_offset, stats)
+        return messages
+
+    def _store_messages(self, conversation_file: Path, session_id: str, stat: os.stat_result,
+                        messages: List[Dict], parsed_offset: int, stats: Dict = None):
+        """
+        保存新解析的对话文件：更新统计汇总并写入缓存
 
-        except Exception as e:
+        Args:
+            conversation_file: 对话文件路径
+            session_id: 会话ID
+            stat: 解析前获取的文件信息
+            messages: 完整的消息列表
+            parsed_offset: 已完整解析到的字节位置
+            stats: 统计数据，默认根据 messages 计算
+        """
+        if stats is None:
+            stats = aggregate_messages(messages)
+        self.analytics.update(str(conversation_file), session_id,
+                              (stat.st_mtime_ns, stat.st_size), stats)
+
+        if self.cache is not None:
+            try:
+                self.cache.put_messages(str(conversation_file), session_id, stat.st_mtime_ns,
+                                        stat.st_size, messages, parsed_offset, stat.st_ino, stats)
+            except Exception as e:
+                print(f"写入解析缓存时出错 {conversation_file}: {e}")
+
+    def _parse_transcripts_parallel(self, transcripts: Dict[str, Path],
+                                    keep_results: bool = True) -> Dict[str, List[Dict]]:
+        """
+        并行解析缓存中没有（或已过期）的对话文件，并写入缓存
+
+        待解析文件少于 PARALLEL_MIN_FILES 或 workers 为 1 时不做任何处理，由调用方逐个读取
+
+        Args:
+            transcripts: sessionId -> 对话文件路径
+            keep_results: 是否返回解析结果；只需预先填充缓存时传 False 以节省内存
+
+        Returns:
+            Dict[str, List[Dict]]: 本次解析成功的 sessionId -> 消息列表
+        """
+        if self.workers <= 1 or len(transcripts) < PARALLEL_MIN_FILES:
+            return {}
+
+        pending = []
+        for session_id, conversation_file in transcripts.items():
+            stat = self._stat_or_none(conversation_file)
+            if stat is None:
+                continue
+            if self.cache is not None:
+                try:
+                    if self.cache.has_messages(str(conversation_file), stat.st_mtime_ns, stat.st_size):
+                        continue
+                except Exception as e:
+                    print(f"读取解析缓存时出错 {conversation_file}: {e}")
+            pending.append((session_id, conversation_file, stat))
+
+        if len(pending) < PARALLEL_MIN_FILES:
+            return {}
+
+        # 子进程中读取的字节数无法计入当前请求，只记录打开的文件数
+        metrics.record_read('transcript', 0, len(pending))
+        try:
+            with metrics.stage('parse_pool'):
+                return self._run_parse_pool(ProcessPoolExecutor, _parse_transcript_worker,
+                                            pending, keep_results)
+        except (OSError, NotImplementedError, BrokenProcessPool) as e:
+            # 部分环境（如没有 /dev/shm 的容器）无法创建进程池
+            print(f"无法启动进程池，改用线程池解析: {e}")
+            return self._run_parse_pool(ThreadPoolExecutor, self._parse_conversation_range,
+                                        pending, keep_results)
+
+    def _run_parse_pool(self, executor_class, parse, pending: List[tuple],
+                        keep_results: bool) -> Dict[str, List[Dict]]:
+        """用指定的执行器解析对话文件，结果按输入顺序写入缓存"""
+        workers = min(self.workers, len(pending))
+        chunksize = max(1, len(pending) // (workers * 4))
+        parsed = {}
+
+        with executor_class(max_workers=workers) as executor:
+            results = executor.map(parse, [path for _, path, _ in pending], chunksize=chunksize)
+            for (session_id, conversation_file, stat), result in zip(pending, results):
+                # 无法读取的文件留给调用方逐个读取时再报告
+                if result is None:
+                    continue
+                messages, parsed_offset, errors = result
+                self._count_parse_errors(conversation_file, lines=errors)
+                self._store_messages(conversation_file, session_id, stat, messages, parsed_offset)
+
+                if keep_results:
+                    parsed[session_id] = messages
+
+        return parsed
+
+    def _parse_conversation_file(self, conversation_file: Path) -> Optional[List[Dict]]:
+        """
+        解析对话文件
+
+        Args:
+            conversation_file: 对话文件路径
+
+        Returns:
+            List[Dict]: 对话消息列表，文件无法读取时返回 None
+        """
+        parsed = self._parse_conversation_range(conversation_file)
+        if parsed is None:
+            self._count_parse_errors(conversation_file, files=1)
+            return None
+
+        messages, _, errors = parsed
+        self._count_parse_errors(conversation_file, lines=errors)
+        return messages
+
+    def _parse_conversation_range(self, conversation_file: Path,
+                                  offset: int = 0) -> Optional[Tuple[List[Dict], int, int]]:
+        """
+        从 offset 开始解析对话文件
+
+        无法解析的行被跳过；最后一行尚未写完时不解析，返回的位置停在该行开头
+
+        Args:
+            conversation_file: 对话文件路径
+            offset: 开始解析的位置（行首）
+
+        Returns:
+            tuple: (消息列表, 已完整解析到的字节位置, 跳过的行数)，文件无法读取时返回 None
+        """
+        messages = []
+        progress = {}
+        try:
+            with metrics.stage('transcript'), open(conversation_file, 'rb') as f:
+                messages.extend(self._scan_transcript(f, offset, progress))
+        except OSError as e:
             print(f"解析对话文件时出错 {conversation_file}: {e}")
             return None
 
-    def _extract_message_content(self, message_data: Dict) -> Optional[str]:
+        metrics.record_read('transcript', progress['offset'] - offset)
+        return messages, progress['offset'], progress['errors']
+
+    def _scan_transcript(self, f, offset: int, progress: Dict) -> Iterator[Dict]:
+        """
+        从 offset 开始逐行解析已打开的对话文件
+
+        单行无法解析时跳过该行并计入 progress['errors']，不影响同一文件的其他行。
+        errors 统计的是: 解码失败的消息行，以及任何不以 { 开头、以 } 结尾的行；
+        被预筛选跳过的非消息行不解码，首尾字符正常而中间损坏时不计入。
+        没有换行符的最后一行视为正在写入，不论能否解析都不处理（写到一半的行可能还没有
+        type 字段，会被预筛选当作非消息行），progress['offset'] 停在该行开头，下次从这里重新读取
+
+        Args:
+            f: 以二进制模式打开的对话文件
+            offset: 开始解析的位置（行首）
+            progress: 解析进度，更新 offset（已完整解析到的位置）和 errors（跳过的行数）
+
+        Yields:
+            Dict: 消息字典
+        """
+        f.seek(offset)
+        progress['offset'] = offset
+        progress['errors'] = 0
+
+        for line in f:
+            if not line.endswith(b'\n'):
+                return
+
+            message = None
+            if line.strip():
+                try:
+                    message = self._parse_message_line(line)
+                except ValueError:
+                    progress['errors'] += 1
+
+            progress['offset'] += len(line)
+            if message:
+                yield message
+
+    def _count_parse_errors(self, conversation_file: Path, lines: int = 0, files: int = 0,
+                            error: Exception = None):
+        """记录解析对话文件时跳过的行数或无法读取的文件"""
+        if not lines and not files:
+            return
+
+        if error is not None:
+            print(f"解析对话文件时出错 {conversation_file}: {error}")
+        elif lines:
+            print(f"对话文件中有 {lines} 行无法解析，已跳过: {conversation_file}")
+
+        with self._errors_lock:
+            self._parse_errors['transcript_lines'] += lines
+            self._parse_errors['transcript_files'] += files
+
+    def get_parse_errors(self) -> Dict:
+        """
+        获取解析错误计数
+
+        Returns:
+            Dict: 包含 history_lines（history.jsonl 中无法解析的行数）、
+                  transcript_lines（自启动以来对话文件中跳过的行数）、
+                  transcript_files（自启动以来无法读取的对话文件数）的字典
+        """
+        with self._history_lock:
+            self._refresh_history()
+            history_lines = self._stats['invalid_lines']
+        with self._errors_lock:
+            return {
+                'history_lines': history_lines,
+                'transcript_lines': self._parse_errors['transcript_lines'],
+                'transcript_files': self._parse_errors['transcript_files']
+            }
+
+    def _parse_message_line(self, line) -> Optional[Dict]:
+        """
+        解析对话文件中的一行
+
+        Args:
+            line: 一行 JSON 文本（str 或 bytes）
+
+        Returns:
+            Dict: 消息字典；不是用户/助手消息或没有文本内容时返回 None
+
+        Raises:
+            ValueError: 不是合法的 JSON，或记录结构无法识别
+        """
+        # 先按字节跳过 summary、system 等行，只解码用户和助手消息
+        data = fast_json.decode_transcript_line(line)
+        if data is None:
+            return None
+
+        # 提取消息内容，同时记录工具调用
+        tools = []
+        try:
+            content = self._extract_message_content(data.get('message', {}), tools)
+        except (AttributeError, TypeError) as e:
+            raise ValueError(f"无法识别的对话记录: {e}") from e
+        if not content:
+            return None
+
+        return Message(data.get('type'), content, data.get('timestamp'), data.get('uuid'), tools)
+
+    def _extract_message_content(self, message_data: Dict, tools: List[str] = None) -> Optional[str]:
         """
         从消息数据中提取文本内容
 
         Args:
             message_data: 消息数据字典
+            tools: 提供时，每个 tool_use 项的工具名依次追加到其中
 
         Returns:
             str: 提取的文本内容
@@ -272,6 +1716,8 @@ class ClaudeDataParser:
                         # 对于工具调用，显示工具名称和参数摘要
                         tool_name = item.get('name', 'unknown')
                         text_parts.append(f"[使用工具: {tool_name}]")
+                        if tools is not None:
+                            tools.append(tool_name)
                 elif isinstance(item, str):
                     text_parts.append(item)
 
@@ -289,52 +1735,358 @@ class ClaudeDataParser:
         Returns:
             str: 格式化后的时间字符串
         """
-        if not timestamp:
-            return "Unknown"
+        return format_iso_timestamp(timestamp)
 
-        try:
-            # 解析ISO时间戳
-            dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-            # 转换为本地时间
-            local_dt = dt.replace(tzinfo=None)
-            return local_dt.strftime('%Y-%m-%d %H:%M:%S')
-        except:
-            return "Unknown"
-
-    def search_full_conversations(self, query: str, project: str = None) -> List[Dict]:
+    def search_full_conversations(self, query: str, project: str = None,
+                                  start_time: int = None, end_time: int = None) -> List[Dict]:
         """
         搜索完整对话记录（包括用户问题和Claude回复）
 
         Args:
             query: 搜索关键词
             project: 项目路径过滤（可选）
+            start_time: 只返回该时间（毫秒，包含）之后的记录（可选）
+            end_time: 只返回该时间（毫秒，不包含）之前的记录（可选）
 
         Returns:
             List[Dict]: 匹配的对话记录
         """
-        conversations = self.parse_full_conversations()
+        return self._attach_full_conversations(self._search_entries(query, project, start_time, end_time))
+
+    def search_conversation_summaries(self, query: str, project: str = None,
+                                      preview_count: int = PREVIEW_MESSAGE_LIMIT,
+                                      start_time: int = None, end_time: int = None) -> List[Dict]:
+        """
+        搜索完整对话记录，结果只附带会话摘要（轻量模式）
+
+        Args:
+            query: 搜索关键词
+            project: 项目路径过滤（可选）
+            preview_count: 每个会话的预览消息数
+            start_time: 只返回该时间（毫秒，包含）之后的记录（可选）
+            end_time: 只返回该时间（毫秒，不包含）之前的记录（可选）
+
+        Returns:
+            List[Dict]: 匹配的对话摘要
+        """
+        return self._summarize_entries(self._search_entries(query, project, start_time, end_time),
+                                       preview_count)
+
+    @staticmethod
+    def _entry_matches(entry: Dict, project: Optional[str], start_time: Optional[int],
+                       end_time: Optional[int]) -> bool:
+        """历史记录是否满足项目和时间范围过滤条件"""
+        if project and entry.get('project') != project:
+            return False
+        if start_time is None and end_time is None:
+            return True
+        timestamp = entry.get('timestamp', 0)
+        return ((start_time is None or timestamp >= start_time)
+                and (end_time is None or timestamp < end_time))
+
+    def _search_entries(self, query: str, project: str = None,
+                        start_time: int = None, end_time: int = None) -> List[Dict]:
+        """
+        在问题和完整对话内容中搜索，返回匹配的历史记录
+
+        对话内容逐个会话读取并匹配，不会同时保留所有会话的消息；
+        先按项目和时间范围过滤历史记录，没有符合条件记录的会话不读取对话内容。
+        未建立全文索引时逐条扫描，匹配规则与索引相同: 每个关键词都须是同一条问题或消息的子串（不区分大小写）
+
+        Args:
+            query: 搜索关键词
+            project: 项目路径过滤（可选）
+            start_time: 时间范围起点（毫秒，包含，可选）
+            end_time: 时间范围终点（毫秒，不包含，可选）
+
+        Returns:
+            List[Dict]: 匹配的历史记录
+        """
+        if self.search_index is not None:
+            try:
+                results = self._search_entries_indexed(query, project, start_time, end_time)
+                if results is not None:
+                    return results
+            except Exception as e:
+                print(f"查询全文索引时出错，改为逐条扫描: {e}")
+
+        self.locator.refresh()
+
         results = []
+        terms = query_terms(query)
 
-        for conv in conversations:
-            # 项目过滤
-            if project and conv.get('project') != project:
+        def matches(text: str) -> bool:
+            text = text.lower()
+            return all(term in text for term in terms)
+
+        for session in self.iter_sessions():
+            entries = [entry for entry in session['entries']
+                       if self._entry_matches(entry, project, start_time, end_time)]
+            if not entries:
                 continue
 
             # 搜索基础显示内容
-            if query.lower() in conv.get('display', '').lower():
-                results.append(conv)
-                continue
+            display_matched = [matches(entry.get('display', '')) for entry in entries]
 
-            # 搜索完整对话内容
-            if conv.get('has_full_content') and conv.get('full_conversation'):
-                for message in conv['full_conversation']:
-                    content = message.get('content', '')
-                    if query.lower() in content.lower():
-                        results.append(conv)
-                        break
+            # 搜索完整对话内容，逐条读取，找到匹配后立即停止
+            content_matched = not all(display_matched) and any(
+                matches(message.get('content', ''))
+                for message in self.iter_messages(session['sessionId'])
+            )
+
+            if content_matched:
+                results.extend(entries)
+            else:
+                results.extend(entry for entry, matched in zip(entries, display_matched) if matched)
 
+        # 按时间排序，最新的在前
+        results.sort(key=self._history_sort_key, reverse=True)
         return results
 
+    def _search_entries_indexed(self, query: str, project: str = None, start_time: int = None,
+                                end_time: int = None) -> Optional[List[Dict]]:
+        """
+        通过全文索引搜索，结果按相关度排序并附带匹配片段 snippet
+
+        Args:
+            query: 搜索关键词，空格分隔的词为 AND 关系，引号内为短语
+            project: 项目路径过滤（可选）
+            start_time: 时间范围起点（毫秒，包含，可选）
+            end_time: 时间范围终点（毫秒，不包含，可选）
+
+        Returns:
+            List[Dict]: 匹配的历史记录；查询无法使用索引时返回 None
+        """
+        self.sync_search_index()
+
+        with metrics.stage('search_index'):
+            hits = self.search_index.search(query)
+        if hits is None:
+            return None
+
+        # 会话内容命中: sessionId -> (最佳得分, 片段)；问题命中: (sessionId, 时间戳) -> (得分, 片段)
+        session_hits: Dict[str, tuple] = {}
+        prompt_hits: Dict[tuple, tuple] = {}
+        for hit in hits:
+            if hit['kind'] == 'prompt':
+                prompt_hits.setdefault((hit['session_id'], hit['ref']), (hit['score'], hit['snippet']))
+            else:
+                session_hits.setdefault(hit['session_id'], (hit['score'], hit['snippet']))
+
+        ranked = []
+        with self._history_lock:
+            self._refresh_history()
+            for session_id in set(session_hits) | {key[0] for key in prompt_hits}:
+                for entry in self._history_by_session.get(session_id, []):
+                    if not self._entry_matches(entry, project, start_time, end_time):
+                        continue
+
+                    candidates = [prompt_hits.get((session_id, str(entry.get('timestamp', '')))),
+                                  session_hits.get(session_id)]
+                    candidates = [c for c in candidates if c is not None]
+                    if not candidates:
+                        continue
+
+                    score, snippet = min(candidates, key=lambda c: c[0])
+                    ranked.append((score, -self._history_sort_key(entry), {**entry, 'snippet': snippet}))
+
+        ranked.sort(key=lambda item: (item[0], item[1]))
+        return [entry for _, _, entry in ranked]
+
+    def sync_search_index(self):
+        """将 history.jsonl 和对话文件的变化同步到全文索引"""
+        if self.search_index is None:
+            return
+
+        self.locator.refresh()
+        with metrics.stage('index_sync'):
+            self.search_index.sync_history(self.history_file)
+
+        # 文件监听启动后，对话文件的变化由监听回调逐个同步，不再逐个检查文件
+        if self.watcher is not None and self._index_synced:
+            return
+
+        transcripts = self.locator.all_transcripts()
+        if not self._index_synced:
+            # 首次建立索引时先并行解析，索引再从缓存读取
+            self._parse_transcripts_parallel(transcripts, keep_results=False)
+
+        with metrics.stage('index_sync'):
+            self.search_index.sync_transcripts(transcripts, self._load_for_index)
+        self._prune_line_index(str(path) for path in transcripts.values())
+        self._index_synced = True
+
+    def _load_for_index(self, session_id: str, path: Path) -> List[Dict]:
+        """为全文索引读取对话消息"""
+        return self._load_conversation_file(path, session_id)
+
+    def get_stream_offsets(self, session_id: str = None) -> Dict:
+        """
+        获取 history.jsonl 和会话对话文件当前的末尾位置，作为实时推送的起点
+
+        Args:
+            session_id: 需要跟踪的会话ID（可选）
+
+        Returns:
+            Dict: 包含 history 和 session 两个字节位置的字典
+        """
+        conversation_file = self._find_conversation_file(session_id) if session_id else None
+        history_stat = self._stat_or_none(self.history_file)
+        session_stat = self._stat_or_none(conversation_file)
+
+        return {
+            'history': history_stat.st_size if history_stat else 0,
+            'session': session_stat.st_size if session_stat else 0
+        }
+
+    def read_history_since(self, offset: int) -> Tuple[List[Dict], int]:
+        """
+        读取 offset 之后新追加的历史记录
+
+        Args:
+            offset: 上次读取到的字节位置
+
+        Returns:
+            tuple: (新增的历史记录列表, 新的读取位置)
+        """
+        try:
+            lines, offset = read_new_lines(self.history_file, offset)
+        except OSError as e:
+            print(f"读取历史记录时出错: {e}")
+            return [], offset
+
+        entries = []
+        for line in lines:
+            try:
+                data = fast_json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(data, dict):
+                entries.append(HistoryEntry(data))
+        return entries, offset
+
+    def read_messages_since(self, session_id: str, offset: int) -> Tuple[List[Dict], int]:
+        """
+        读取会话对话文件中 offset 之后新追加的消息
+
+        Args:
+            session_id: 会话ID
+            offset: 上次读取到的字节位置
+
+        Returns:
+            tuple: (新增的消息列表, 新的读取位置)
+        """
+        conversation_file = self._find_conversation_file(session_id)
+        if conversation_file is None:
+            return [], offset
+
+        try:
+            lines, offset = read_new_lines(conversation_file, offset)
+        except OSError as e:
+            print(f"读取对话文件时出错 {conversation_file}: {e}")
+            return [], offset
+
+        messages = []
+        for line in lines:
+            try:
+                message = self._parse_message_line(line)
+            except ValueError:
+                continue
+            if message:
+                messages.append(message)
+        return messages, offset
+
+    def wait_for_change(self, timeout: float):
+        """
+        等待数据目录发生变化
+
+        启用文件监听时在收到变化通知或超时后返回；未启用时相当于 sleep(timeout)
+
+        Args:
+            timeout: 最长等待时间（秒）
+        """
+        with self._change_condition:
+            self._change_condition.wait(timeout)
+
+    def start_watching(self) -> bool:
+        """
+        启动文件监听，之后请求不再需要逐个检查目录和文件来判断数据是否过期
+
+        Returns:
+            bool: 是否成功启动（watchdog 未安装或目录不存在时返回 False）
+        """
+        if self.watcher is not None:
+            return True
+
+        watcher = ClaudeDirWatcher(self.claude_dir, self._on_file_changed)
+        if not watcher.start():
+            return False
+
+        self.watcher = watcher
+        self.locator.watched = True
+        self.locator.mark_dirty()
+        return True
+
+    def stop_watching(self):
+        """停止文件监听，恢复为每次请求时检查文件变化"""
+        if self.watcher is None:
+            return
+
+        self.watcher.stop()
+        self.watcher = None
+        self.locator.watched = False
+
+    def _on_file_changed(self, path: Path, structural: bool):
+        """
+        文件监听回调，只更新受影响的会话
+
+        Args:
+            path: 发生变化的文件路径
+            structural: 是否为新建/删除/移动事件
+        """
+        with self._change_condition:
+            self._change_condition.notify_all()
+
+        if path == self.history_file:
+            with self._history_lock:
+                self._refresh_history()
+            if self.search_index is not None:
+                self.search_index.sync_history(self.history_file)
+            return
+
+        if structural:
+            self.locator.mark_dirty()
+
+        if path.suffix != '.jsonl' or path.parent.parent != self.projects_dir:
+            return
+
+        session_id = path.stem
+        with self._recent_lock:
+            self._recent_sessions.pop(session_id, None)
+
+        if not path.exists():
+            if self.search_index is not None:
+                self.search_index.remove_transcript(path)
+            self.analytics.remove(str(path))
+            self.timeline.remove_transcript(session_id)
+            self.timeline.save()
+            self.locator.refresh()
+            self._prune_line_index(str(path) for path in self.locator.all_transcripts().values())
+            return
+
+        # 重新解析该会话并写入缓存和全文索引
+        if self.search_index is not None:
+            self.search_index.sync_transcripts({session_id: path}, self._load_for_index, prune=False)
+        else:
+            self._load_conversation_file(path, session_id)
+
+        # 其他进程可能已经解析并索引了这个版本，此时统计数据从缓存读取
+        if self._analytics_synced:
+            self._refresh_session_analytics(session_id, path)
+        if self._timeline_synced:
+            self._refresh_session_timeline(session_id, path)
+            self.timeline.save()
+
     def _format_timestamp(self, timestamp: int) -> str:
         """
         格式化时间戳
@@ -345,11 +2097,7 @@ class ClaudeDataParser:
         Returns:
             str: 格式化后的时间字符串
         """
-        try:
-            dt = datetime.fromtimestamp(timestamp / 1000)
-            return dt.strftime('%Y-%m-%d %H:%M:%S')
-        except:
-            return "Unknown"
+        return format_timestamp(timestamp)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,123 @@
+"""
+Claude Code 调试日志分段读取
+调试日志可能有数 MB，按字节范围或从文件末尾向前读取最后若干行，
+可按关键词过滤，不需要把整个文件读入内存
+"""
+
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# 从末尾向前读取时每次读取的块大小（字节）
+BLOCK_SIZE = 64 * 1024
+
+# 单次按范围读取的最大字节数
+MAX_RANGE_BYTES = 1024 * 1024
+
+
+def _matcher(keyword: Optional[str]):
+    """生成按关键词（不区分大小写）过滤行的函数，没有关键词时返回 None"""
+    if not keyword:
+        return None
+    needle = keyword.lower().encode('utf-8')
+    return lambda line: needle in line.lower()
+
+
+def _decode(lines: List[bytes]) -> str:
+    """合并并解码若干行，截断位置的不完整字符用替换字符表示"""
+    return b'\n'.join(lines).decode('utf-8', errors='replace')
+
+
+def read_tail(path: Path, count: int, keyword: str = None) -> Dict:
+    """
+    从文件末尾向前读取最后 count 行
+
+    Args:
+        path: 日志文件路径
+        count: 行数
+        keyword: 只保留包含该关键词的行（不区分大小写）
+
+    Returns:
+        Dict: 包含 content、lines（返回的行数）、size（文件大小）、
+              has_more（前面是否还有未返回的行）的字典
+
+    Raises:
+        OSError: 文件无法读取
+    """
+    match = _matcher(keyword)
+
+    # 多读一行用于判断前面是否还有内容
+    lines: List[bytes] = []
+
+    with open(path, 'rb') as f:
+        size = f.seek(0, 2)
+        position = size
+        remainder = b''
+
+        while position > 0 and len(lines) <= count:
+            read = min(BLOCK_SIZE, position)
+            position -= read
+            f.seek(position)
+            block = f.read(read) + remainder
+
+            # 文件末尾的换行符不算作一个空行
+            if position + read == size and block.endswith(b'\n'):
+                block = block[:-1]
+
+            # 块的第一段可能是不完整的行，留到读取前一块时再处理；已读到文件开头时它就是第一行
+            parts = block.split(b'\n')
+            if position > 0:
+                remainder = parts.pop(0)
+
+            for line in reversed(parts):
+                if match is None or match(line):
+                    lines.append(line)
+                    if len(lines) > count:
+                        break
+
+    has_more = len(lines) > count
+    lines = lines[:count]
+    lines.reverse()
+    return {
+        'content': _decode(lines),
+        'lines': len(lines),
+        'size': size,
+        'has_more': has_more
+    }
+
+
+def read_range(path: Path, offset: int, length: int, keyword: str = None) -> Dict:
+    """
+    按字节范围读取日志
+
+    Args:
+        path: 日志文件路径
+        offset: 起始字节位置，负数表示从末尾倒数
+        length: 读取的字节数，最多 MAX_RANGE_BYTES
+        keyword: 只保留范围内包含该关键词的行（不区分大小写）
+
+    Returns:
+        Dict: 包含 content、start、end（实际读取的字节范围）、size（文件大小）的字典
+
+    Raises:
+        OSError: 文件无法读取
+    """
+    length = max(0, min(length, MAX_RANGE_BYTES))
+
+    with open(path, 'rb') as f:
+        size = f.seek(0, 2)
+        start = max(size + offset, 0) if offset < 0 else min(offset, size)
+        f.seek(start)
+        data = f.read(length)
+
+    match = _matcher(keyword)
+    if match is None:
+        content = data.decode('utf-8', errors='replace')
+    else:
+        content = _decode([line for line in data.split(b'\n') if match(line)])
+
+    return {
+        'content': content,
+        'start': start,
+        'end': start + len(data),
+        'size': size
+    }
@@ -0,0 +1,162 @@
+"""
+Claude Code JSON Lines 快速解码
+安装了 orjson 或 msgspec 时使用它们解码，否则使用标准库 json；
+解析对话文件时先按字节检查，跳过明显不是用户/助手消息的行
+"""
+
+import json
+from typing import Any, Dict, Optional
+
+try:
+    import orjson
+except ImportError:  # 未安装 orjson 时尝试 msgspec
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # 未安装 msgspec 时使用标准库 json
+    msgspec = None
+
+# 对话文件中需要解析的行类型
+MESSAGE_TYPES = ('user', 'assistant')
+
+# 用户/助手消息行必然包含 "user" 或 "assistant" 这个 JSON 字符串（type 字段的值），
+# 不包含的行（summary、system、file-history-snapshot 等）无需解码
+_TYPE_MARKERS = tuple(f'"{t}"'.encode() for t in MESSAGE_TYPES)
+_TYPE_MARKERS_STR = tuple(f'"{t}"' for t in MESSAGE_TYPES)
+
+if msgspec is not None:
+    class _TranscriptLine(msgspec.Struct):
+        """对话文件中一行只解码需要的字段，其余字段由 msgspec 直接跳过"""
+        type: Any = None
+        message: Any = msgspec.field(default_factory=dict)
+        timestamp: Any = None
+        uuid: Any = None
+
+    _msgspec_decoder = msgspec.json.Decoder()
+    _msgspec_line_decoder = msgspec.json.Decoder(_TranscriptLine)
+
+# 可用的解码后端，按优先级排列
+AVAILABLE_BACKENDS = tuple(
+    name for name, module in (('orjson', orjson), ('msgspec', msgspec), ('json', json))
+    if module is not None
+)
+
+# 当前使用的解码后端
+BACKEND = AVAILABLE_BACKENDS[0]
+
+
+def set_backend(name: str = None):
+    """
+    切换解码后端（主要用于基准测试）
+
+    Args:
+        name: 'orjson'、'msgspec' 或 'json'，为 None 时恢复默认
+
+    Raises:
+        ValueError: 指定的后端未安装
+    """
+    global BACKEND
+    if name is None:
+        name = AVAILABLE_BACKENDS[0]
+    if name not in AVAILABLE_BACKENDS:
+        raise ValueError(f"JSON 解码后端不可用: {name}")
+    BACKEND = name
+
+
+def loads(data) -> Any:
+    """
+    解码 JSON 文本
+
+    Args:
+        data: JSON 文本（str 或 bytes）
+
+    Returns:
+        Any: 解码后的对象
+
+    Raises:
+        ValueError: JSON 格式错误
+    """
+    if BACKEND == 'orjson':
+        return orjson.loads(data)
+    if BACKEND == 'msgspec':
+        try:
+            return _msgspec_decoder.decode(data)
+        except msgspec.MsgspecError as e:
+            raise ValueError(str(e)) from e
+    return json.loads(data)
+
+
+def might_be_message(line) -> bool:
+    """
+    按字节快速判断一行是否可能是用户/助手消息
+
+    只会误判为"可能是"，不会漏掉真正的消息行
+
+    Args:
+        line: 一行 JSON 文本（str 或 bytes）
+
+    Returns:
+        bool: 是否需要进一步解码
+    """
+    markers = _TYPE_MARKERS if isinstance(line, bytes) else _TYPE_MARKERS_STR
+    return any(marker in line for marker in markers)
+
+
+def looks_like_object(line) -> bool:
+    """
+    按首尾字符快速检查一行是否像一个完整的 JSON 对象（以 { 开头、以 } 结尾）
+
+    Args:
+        line: 一行 JSON 文本（str 或 bytes），可以带有首尾空白
+
+    Returns:
+        bool: 首尾字符是否符合
+    """
+    line = line.strip()
+    if isinstance(line, bytes):
+        return line[:1] == b'{' and line[-1:] == b'}'
+    return line[:1] == '{' and line[-1:] == '}'
+
+
+def decode_transcript_line(line) -> Optional[Dict]:
+    """
+    解码对话文件中的一行，只保留 type、message、timestamp、uuid 字段
+
+    被预筛选跳过的行（不含 "user"/"assistant"）不解码，只检查首尾字符，
+    不像完整 JSON 对象的行（如 {bad json）同样视为格式错误；
+    首尾字符正常但中间损坏的非消息行无法在不解码的情况下发现，按非消息行跳过
+
+    Args:
+        line: 一行 JSON 文本（str 或 bytes）
+
+    Returns:
+        Dict: 包含上述字段的字典；不是用户/助手消息时返回 None
+
+    Raises:
+        ValueError: JSON 格式错误
+    """
+    if not might_be_message(line):
+        if not looks_like_object(line):
+            raise ValueError("不是完整的 JSON 对象")
+        return None
+
+    if BACKEND == 'msgspec':
+        try:
+            record = _msgspec_line_decoder.decode(line)
+        except msgspec.MsgspecError as e:
+            raise ValueError(str(e)) from e
+        data = {
+            'type': record.type,
+            'message': record.message,
+            'timestamp': record.timestamp,
+            'uuid': record.uuid
+        }
+    else:
+        data = loads(line)
+        if not isinstance(data, dict):
+            return None
+
+    if data.get('type') not in MESSAGE_TYPES:
+        return None
+    return data
@@ -0,0 +1,156 @@
+"""
+Claude Code 数据目录监听
+使用 watchdog 监听 history.jsonl、projects/ 和 debug/ 的变化，
+经过去抖后通知解析器只更新受影响的会话；持续写入的文件最多等待 MAX_WAIT_SECONDS 秒也会通知一次
+"""
+
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # watchdog 未安装时不启用监听
+    FileSystemEventHandler = object
+    Observer = None
+
+# 同一文件连续变化时，等待多久没有新变化后再处理（秒）
+DEBOUNCE_SECONDS = 0.5
+
+# 文件一直在变化（如 Claude Code 持续追加对话）时，距第一个未处理的变化最多等待多久就处理一次（秒）
+MAX_WAIT_SECONDS = 2.0
+
+
+class _DebouncedHandler(FileSystemEventHandler):
+    """
+    收集文件事件，同一路径在去抖时间内的多次变化只回调一次；
+    变化一直不停时，距第一个未处理的变化 max_wait 秒后也会回调
+    """
+
+    def __init__(self, on_change: Callable[[Path, bool], None], debounce: float,
+                 max_wait: float = MAX_WAIT_SECONDS):
+        """
+        Args:
+            on_change: 回调函数，参数为 (文件路径, 是否为新建/删除/移动事件)
+            debounce: 去抖时间（秒）
+            max_wait: 最长等待时间（秒），不小于 debounce
+        """
+        super().__init__()
+        self._on_change = on_change
+        self._debounce = debounce
+        self._max_wait = max(max_wait, debounce)
+        self._timers: Dict[str, threading.Timer] = {}
+        self._structural: Dict[str, bool] = {}
+        self._pending_since: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def on_any_event(self, event):
+        if event.event_type not in ('created', 'deleted', 'modified', 'moved'):
+            return
+
+        structural = event.event_type != 'modified'
+        self._schedule(event.src_path, structural)
+        if event.event_type == 'moved':
+            self._schedule(event.dest_path, True)
+
+    def _schedule(self, path: str, structural: bool):
+        with self._lock:
+            timer = self._timers.pop(path, None)
+            if timer is not None:
+                timer.cancel()
+
+            now = time.monotonic()
+            first = self._pending_since.setdefault(path, now)
+            self._structural[path] = self._structural.get(path, False) or structural
+
+            # 不超过第一个未处理变化的最长等待时间
+            delay = min(self._debounce, max(first + self._max_wait - now, 0))
+            # 回调时用 token 确认自己仍是该路径最新的计时器
+            token = object()
+            timer = threading.Timer(delay, self._fire, args=(path, token))
+            timer.token = token
+            timer.daemon = True
+            self._timers[path] = timer
+            timer.start()
+
+    def _fire(self, path: str, token: object):
+        with self._lock:
+            # 等待锁期间已被新的事件取代
+            timer = self._timers.get(path)
+            if timer is None or timer.token is not token:
+                return
+            del self._timers[path]
+            self._pending_since.pop(path, None)
+            structural = self._structural.pop(path, False)
+
+        try:
+            self._on_change(Path(path), structural)
+        except Exception as e:
+            print(f"处理文件变化时出错 {path}: {e}")
+
+    def cancel_all(self):
+        """取消所有尚未触发的回调"""
+        with self._lock:
+            for timer in self._timers.values():
+                timer.cancel()
+            self._timers.clear()
+            self._structural.clear()
+            self._pending_since.clear()
+
+
+class ClaudeDirWatcher:
+    """Claude 数据目录监听器"""
+
+    def __init__(self, claude_dir: Path, on_change: Callable[[Path, bool], None],
+                 debounce: float = DEBOUNCE_SECONDS, max_wait: float = MAX_WAIT_SECONDS):
+        """
+        初始化监听器
+
+        Args:
+            claude_dir: Claude 配置目录
+            on_change: 文件变化回调，参数为 (文件路径, 是否为新建/删除/移动事件)
+            debounce: 去抖时间（秒）
+            max_wait: 文件持续变化时的最长等待时间（秒）
+        """
+        self.claude_dir = Path(claude_dir)
+        self._handler = _DebouncedHandler(on_change, debounce, max_wait)
+        self._observer = None
+
+    def start(self) -> bool:
+        """
+        启动监听
+
+        Returns:
+            bool: 是否成功启动；watchdog 未安装或目录不存在时返回 False
+        """
+        if Observer is None or not self.claude_dir.is_dir():
+            return False
+
+        observer = Observer()
+        observer.daemon = True
+
+        # history.jsonl 位于根目录，只需监听根目录本身；projects/ 下有两层，需要递归
+        observer.schedule(self._handler, str(self.claude_dir), recursive=False)
+        for name, recursive in (('projects', True), ('debug', False)):
+            path = self.claude_dir / name
+            if path.is_dir():
+                observer.schedule(self._handler, str(path), recursive=recursive)
+
+        try:
+            observer.start()
+        except Exception as e:
+            print(f"启动文件监听失败: {e}")
+            return False
+
+        self._observer = observer
+        return True
+
+    def stop(self):
+        """停止监听"""
+        self._handler.cancel_all()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
@@ -0,0 +1,129 @@
+"""
+HTTP 响应压缩与缓存校验
+为较大的 HTML / JSON 响应启用 gzip（安装了 brotli 时优先使用 br）压缩，
+并为没有 ETag 的响应按内容生成 ETag，支持 If-None-Match 条件请求。
+
+配置项（app.config，默认值可通过环境变量覆盖）:
+    COMPRESS_RESPONSES   是否压缩响应，环境变量 CLAUDE_VIS_COMPRESS=0 关闭（如由反向代理负责压缩）
+    COMPRESS_MIN_SIZE    小于该字节数的响应不压缩，环境变量 CLAUDE_VIS_COMPRESS_MIN_SIZE
+    COMPRESS_LEVEL       gzip 压缩级别（1-9），环境变量 CLAUDE_VIS_COMPRESS_LEVEL
+    HTTP_ETAGS           是否为响应生成 ETag 并处理条件请求，环境变量 CLAUDE_VIS_ETAGS=0 关闭
+"""
+
+import gzip
+import os
+
+from flask import Flask, Response, request
+
+try:
+    import brotli
+except ImportError:  # 未安装 brotli 时只使用 gzip
+    brotli = None
+
+# 可以压缩的响应类型
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/plain', 'text/css', 'application/json', 'application/javascript'
+}
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    """读取开关型环境变量"""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() not in ('0', 'false', 'no', 'off')
+
+
+def init_app(app: Flask):
+    """
+    为 Flask 应用注册压缩和缓存校验
+
+    Args:
+        app: Flask 应用
+    """
+    app.config.setdefault('COMPRESS_RESPONSES', _env_flag('CLAUDE_VIS_COMPRESS', True))
+    app.config.setdefault('COMPRESS_MIN_SIZE', int(os.environ.get('CLAUDE_VIS_COMPRESS_MIN_SIZE', 1024)))
+    app.config.setdefault('COMPRESS_LEVEL', int(os.environ.get('CLAUDE_VIS_COMPRESS_LEVEL', 6)))
+    app.config.setdefault('HTTP_ETAGS', _env_flag('CLAUDE_VIS_ETAGS', True))
+
+    @app.after_request
+    def _finalize_response(response: Response) -> Response:
+        if request.method not in ('GET', 'HEAD') or response.is_streamed or response.direct_passthrough:
+            return response
+
+        if app.config['HTTP_ETAGS'] and response.status_code == 200:
+            # 路由已按数据版本设置 ETag 时直接使用，否则按响应内容生成
+            if response.get_etag()[0] is None:
+                response.add_etag()
+            if not response.cache_control.no_cache and response.cache_control.max_age is None:
+                response.cache_control.no_cache = True
+            response.make_conditional(request)
+
+        if app.config['COMPRESS_RESPONSES']:
+            _compress(response, app.config['COMPRESS_MIN_SIZE'], app.config['COMPRESS_LEVEL'])
+
+        return response
+
+
+def not_modified(etag: str) -> bool:
+    """
+    判断请求的 If-None-Match 是否与 etag 匹配（弱比较，兼容压缩后的弱 ETag）
+
+    路由可以在读取数据之前调用，匹配时直接返回 304
+
+    Args:
+        etag: 不带引号的 ETag 值
+
+    Returns:
+        bool: 客户端缓存是否仍然有效
+    """
+    return request.if_none_match.contains_weak(etag)
+
+
+def not_modified_response(etag: str) -> Response:
+    """
+    生成 304 响应
+
+    Args:
+        etag: 不带引号的 ETag 值
+
+    Returns:
+        Response: 带 ETag 的 304 响应
+    """
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def _compress(response: Response, min_size: int, level: int):
+    """按客户端支持的编码压缩响应"""
+    if (response.status_code != 200
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or 'Content-Encoding' in response.headers):
+        return
+
+    response.vary.add('Accept-Encoding')
+
+    data = response.get_data()
+    if len(data) < min_size:
+        return
+
+    accept = request.accept_encodings
+    if brotli is not None and accept['br']:
+        data = brotli.compress(data, quality=5)
+        encoding = 'br'
+    elif accept['gzip']:
+        data = gzip.compress(data, compresslevel=level)
+        encoding = 'gzip'
+    else:
+        return
+
+    response.set_data(data)
+    response.headers['Content-Encoding'] = encoding
+
+    # 压缩后的内容与原内容字节不同，强 ETag 改为弱 ETag
+    etag, weak = response.get_etag()
+    if etag is not None and not weak:
+        response.set_etag(etag, weak=True)
@@ -0,0 +1,304 @@
+"""
+请求级性能指标
+记录每个请求在各阶段（读取历史记录、读取解析缓存、读取并解码对话文件、查询全文索引、
+读取调试日志、渲染模板、序列化 JSON）的耗时，以及读取的字节数和打开的文件数。
+汇总结果以 Prometheus 文本格式导出，单个请求的耗时通过 Server-Timing 响应头返回；
+还可以对单个请求生成 cProfile（安装了 pyinstrument 时使用 pyinstrument）性能分析报告。
+
+配置项（app.config，默认值可通过环境变量覆盖）:
+    METRICS     是否记录性能指标，环境变量 CLAUDE_VIS_METRICS=1 开启（默认关闭）
+    PROFILING   是否允许 ?profile=1 性能分析，环境变量 CLAUDE_VIS_PROFILE=1 开启（调试模式下总是允许）
+
+没有正在记录的请求时（未开启、后台线程、解析进程池），stage() 等函数不做任何记录。
+解析器（包括解析进程池的子进程）也导入本模块，Flask 只在 init_app() 中导入
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+try:
+    from pyinstrument import Profiler
+except ImportError:  # 未安装 pyinstrument 时使用 cProfile
+    Profiler = None
+
+# 请求耗时直方图的分桶上限（秒）
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# cProfile 报告中显示的函数数
+PROFILE_STATS_LIMIT = 60
+
+_local = threading.local()
+_lock = threading.Lock()
+
+
+class RequestMetrics:
+    """单个请求的指标"""
+
+    __slots__ = ('start', 'stages', 'bytes_read', 'files_opened')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        # 阶段名称 -> [耗时（秒）, 次数]，按首次出现的顺序排列
+        self.stages: Dict[str, list] = {}
+        self.bytes_read = Counter()
+        self.files_opened = Counter()
+
+    def add_stage(self, name: str, seconds: float):
+        totals = self.stages.get(name)
+        if totals is None:
+            self.stages[name] = [seconds, 1]
+        else:
+            totals[0] += seconds
+            totals[1] += 1
+
+    def server_timing(self, total: float) -> str:
+        """
+        生成 Server-Timing 响应头
+
+        Args:
+            total: 请求总耗时（秒）
+
+        Returns:
+            str: 各阶段耗时（毫秒），total 的描述中附带打开文件数和读取字节数
+        """
+        parts = [f"{name};dur={seconds * 1000:.2f}" for name, (seconds, _) in self.stages.items()]
+        files = sum(self.files_opened.values())
+        size = sum(self.bytes_read.values())
+        parts.append(f'total;dur={total * 1000:.2f};desc="{files} files, {size} bytes"')
+        return ', '.join(parts)
+
+
+class _Totals:
+    """进程内所有请求的累计指标"""
+
+    def __init__(self):
+        self.requests = Counter()          # (endpoint, status) -> 请求数
+        self.durations: Dict[str, list] = {}  # endpoint -> 各分桶计数 + [总耗时, 请求数]
+        self.stage_seconds = Counter()
+        self.stage_calls = Counter()
+        self.bytes_read = Counter()
+        self.files_opened = Counter()
+
+    def add(self, endpoint: str, status: int, total: float, record: RequestMetrics):
+        self.requests[(endpoint, status)] += 1
+
+        histogram = self.durations.get(endpoint)
+        if histogram is None:
+            histogram = self.durations[endpoint] = [0] * len(DURATION_BUCKETS) + [0.0, 0]
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if total <= bound:
+                histogram[i] += 1
+        histogram[-2] += total
+        histogram[-1] += 1
+
+        for name, (seconds, calls) in record.stages.items():
+            self.stage_seconds[name] += seconds
+            self.stage_calls[name] += calls
+        self.bytes_read.update(record.bytes_read)
+        self.files_opened.update(record.files_opened)
+
+
+_totals = _Totals()
+
+
+def current() -> Optional[RequestMetrics]:
+    """当前线程正在记录的请求指标，没有时返回 None"""
+    return getattr(_local, 'request', None)
+
+
+@contextmanager
+def stage(name: str):
+    """
+    记录代码块的耗时，计入当前请求的 name 阶段
+
+    阶段可以嵌套（如查询索引时同步并解析了对话文件），此时外层阶段的耗时包含内层阶段
+
+    Args:
+        name: 阶段名称
+    """
+    record = getattr(_local, 'request', None)
+    if record is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record.add_stage(name, time.perf_counter() - start)
+
+
+def record_read(source: str, size: int, files: int = 1):
+    """
+    记录当前请求读取的文件
+
+    Args:
+        source: 数据来源（history、transcript、debug_log 等）
+        size: 读取的字节数
+        files: 打开的文件数
+    """
+    record = getattr(_local, 'request', None)
+    if record is not None:
+        record.bytes_read[source] += size
+        record.files_opened[source] += files
+
+
+def begin_request() -> RequestMetrics:
+    """开始记录当前线程的请求"""
+    _local.request = record = RequestMetrics()
+    return record
+
+
+def end_request(endpoint: str, status: int) -> Optional[str]:
+    """
+    结束记录当前线程的请求并计入累计指标
+
+    Args:
+        endpoint: 路由名称
+        status: 响应状态码
+
+    Returns:
+        str: Server-Timing 响应头，当前没有正在记录的请求时返回 None
+    """
+    record = getattr(_local, 'request', None)
+    if record is None:
+        return None
+    _local.request = None
+
+    total = time.perf_counter() - record.start
+    with _lock:
+        _totals.add(endpoint, status, total, record)
+    return record.server_timing(total)
+
+
+def _escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def export_prometheus() -> str:
+    """
+    以 Prometheus 文本格式导出累计指标
+
+    Returns:
+        str: 指标文本
+    """
+    with _lock:
+        requests = dict(_totals.requests)
+        durations = {endpoint: list(values) for endpoint, values in _totals.durations.items()}
+        counters = [
+            ('claude_vis_stage_seconds_total', "各阶段累计耗时（秒）", 'stage', dict(_totals.stage_seconds)),
+            ('claude_vis_stage_calls_total', "各阶段执行次数", 'stage', dict(_totals.stage_calls)),
+            ('claude_vis_read_bytes_total', "读取的字节数", 'source', dict(_totals.bytes_read)),
+            ('claude_vis_files_opened_total', "打开的文件数", 'source', dict(_totals.files_opened)),
+        ]
+
+    lines = [
+        "# HELP claude_vis_requests_total 处理的请求数",
+        "# TYPE claude_vis_requests_total counter",
+    ]
+    for (endpoint, status), count in sorted(requests.items()):
+        lines.append(f'claude_vis_requests_total{{endpoint="{_escape_label(endpoint)}",'
+                     f'status="{status}"}} {count}')
+
+    lines.append("# HELP claude_vis_request_duration_seconds 请求处理耗时（秒）")
+    lines.append("# TYPE claude_vis_request_duration_seconds histogram")
+    for endpoint, values in sorted(durations.items()):
+        label = f'endpoint="{_escape_label(endpoint)}"'
+        for bound, count in zip(DURATION_BUCKETS, values):
+            lines.append(f'claude_vis_request_duration_seconds_bucket{{{label},le="{bound}"}} {count}')
+        lines.append(f'claude_vis_request_duration_seconds_bucket{{{label},le="+Inf"}} {values[-1]}')
+        lines.append(f'claude_vis_request_duration_seconds_sum{{{label}}} {values[-2]:.6f}')
+        lines.append(f'claude_vis_request_duration_seconds_count{{{label}}} {values[-1]}')
+
+    for name, help_text, label_name, values in counters:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for key, value in sorted(values.items()):
+            value = f"{value:.6f}" if isinstance(value, float) else value
+            lines.append(f'{name}{{{label_name}="{_escape_label(key)}"}} {value}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    """
+    为 Flask 应用注册性能指标记录和单请求性能分析
+
+    Args:
+        app: Flask 应用
+    """
+    from flask import before_render_template, g, request, template_rendered
+
+    app.config.setdefault('METRICS', os.environ.get('CLAUDE_VIS_METRICS', '0').strip().lower()
+                          in ('1', 'true', 'yes', 'on'))
+    app.config.setdefault('PROFILING', os.environ.get('CLAUDE_VIS_PROFILE', '0').strip().lower()
+                          in ('1', 'true', 'yes', 'on'))
+
+    @app.before_request
+    def _begin():
+        if app.config['METRICS']:
+            begin_request()
+        if request.args.get('profile') == '1' and (app.config['PROFILING'] or app.debug):
+            g._profiler = _start_profiler()
+
+    @app.after_request
+    def _finish(response):
+        profiler = g.pop('_profiler', None)
+        if profiler is not None:
+            response = _profile_response(profiler)
+
+        timing = end_request(request.endpoint or 'unknown', response.status_code)
+        if timing is not None:
+            response.headers['Server-Timing'] = timing
+        return response
+
+    @app.teardown_request
+    def _teardown(exc):
+        # 视图抛出异常时 after_request 不会执行，丢弃未完成的记录
+        _local.request = None
+
+    def _render_started(sender, template, context, **extra):
+        _local.render_start = time.perf_counter()
+
+    def _render_finished(sender, template, context, **extra):
+        record = getattr(_local, 'request', None)
+        start = getattr(_local, 'render_start', None)
+        if record is not None and start is not None:
+            record.add_stage('render', time.perf_counter() - start)
+        _local.render_start = None
+
+    before_render_template.connect(_render_started, app, weak=False)
+    template_rendered.connect(_render_finished, app, weak=False)
+
+
+def _start_profiler():
+    """开始对当前请求进行性能分析"""
+    if Profiler is not None:
+        profiler = Profiler()
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    return profiler
+
+
+def _profile_response(profiler):
+    """停止性能分析，生成替代原响应的报告"""
+    from flask import Response
+
+    if Profiler is not None and isinstance(profiler, Profiler):
+        profiler.stop()
+        return Response(profiler.output_html(), mimetype='text/html')
+
+    profiler.disable()
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.sort_stats('cumulative').print_stats(PROFILE_STATS_LIMIT)
+    return Response(output.getvalue(), mimetype='text/plain')
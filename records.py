@@ -0,0 +1,227 @@
+"""
+Claude Code 紧凑记录类型
+消息和历史记录使用 __slots__ 保存，比等价的字典占用更少内存；
+formatted_time 在访问时才计算，项目路径和会话ID经过驻留（intern）共享同一个字符串对象。
+记录实现了 Mapping 接口，读取方式（record['key']、record.get()、{**record}）与字典相同，
+序列化为 JSON 时通过 json_default() 转换为与原来相同结构的字典
+"""
+
+import sys
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+# 消息类型只有少数几种，统一使用同一个字符串对象
+_MESSAGE_TYPES = {name: sys.intern(name) for name in ('user', 'assistant')}
+
+
+def format_iso_timestamp(timestamp: Optional[str]) -> str:
+    """
+    格式化ISO时间戳
+
+    Args:
+        timestamp: ISO格式时间戳
+
+    Returns:
+        str: 格式化后的时间字符串
+    """
+    if not timestamp:
+        return "Unknown"
+
+    try:
+        # 解析ISO时间戳
+        dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+        # 转换为本地时间
+        local_dt = dt.replace(tzinfo=None)
+        return local_dt.strftime('%Y-%m-%d %H:%M:%S')
+    except:
+        return "Unknown"
+
+
+def parse_iso_timestamp(timestamp: Optional[str]) -> Optional[int]:
+    """
+    将ISO时间戳转换为毫秒级时间戳
+
+    Args:
+        timestamp: ISO格式时间戳
+
+    Returns:
+        int: 毫秒级时间戳，无法解析时返回 None
+    """
+    if not timestamp:
+        return None
+
+    try:
+        dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+        return int(dt.timestamp() * 1000)
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def format_timestamp(timestamp: int) -> str:
+    """
+    格式化时间戳
+
+    Args:
+        timestamp: 毫秒级时间戳
+
+    Returns:
+        str: 格式化后的时间字符串
+    """
+    try:
+        dt = datetime.fromtimestamp(timestamp / 1000)
+        return dt.strftime('%Y-%m-%d %H:%M:%S')
+    except:
+        return "Unknown"
+
+
+def _intern(value):
+    """驻留字符串，其他类型原样返回"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Message(Mapping):
+    """
+    对话消息
+
+    tools 为消息中各次工具调用（tool_use）的工具名，供统计分析使用，不属于展示的字段
+    """
+
+    __slots__ = ('type', 'content', 'timestamp', 'uuid', 'tools')
+
+    _KEYS = ('type', 'content', 'timestamp', 'uuid', 'formatted_time')
+
+    # 写入缓存的字段，formatted_time 读取时由 timestamp 计算，不保存
+    _STORED_KEYS = ('type', 'content', 'timestamp', 'uuid')
+
+    def __init__(self, type: str, content: str, timestamp: str = None, uuid: str = None,
+                 tools: Tuple[str, ...] = ()):
+        self.type = _MESSAGE_TYPES.get(type, type)
+        self.content = content
+        self.timestamp = timestamp
+        self.uuid = uuid
+        self.tools = tuple(_intern(name) for name in tools) if tools else ()
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Message':
+        """从字典（如缓存中的 JSON）创建消息"""
+        return cls(data['type'], data['content'], data.get('timestamp'), data.get('uuid'),
+                   data.get('tools', ()))
+
+    @property
+    def formatted_time(self) -> str:
+        """格式化后的时间，访问时才计算"""
+        return format_iso_timestamp(self.timestamp)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self._KEYS)
+
+    def __len__(self) -> int:
+        return len(self._KEYS)
+
+    def to_dict(self) -> Dict:
+        """转换为字典"""
+        return {key: getattr(self, key) for key in self._KEYS}
+
+    def to_record(self) -> Dict:
+        """转换为写入解析缓存的字典，只包含保存的字段（有工具调用时包含 tools），可由 from_dict() 还原"""
+        record = {key: getattr(self, key) for key in self._STORED_KEYS}
+        if self.tools:
+            record['tools'] = list(self.tools)
+        return record
+
+    def __repr__(self) -> str:
+        return f"Message({self.to_dict()!r})"
+
+
+class HistoryEntry(Mapping):
+    """history.jsonl 中的一条历史记录"""
+
+    # 没有出现在原始记录中的字段保持未赋值，与字典缺少该键时的行为一致
+    __slots__ = ('display', 'pastedContents', 'timestamp', 'project', 'sessionId', '_extra')
+
+    _FIELDS = ('display', 'pastedContents', 'timestamp', 'project', 'sessionId')
+
+    def __init__(self, data: Dict):
+        """
+        Args:
+            data: history.jsonl 中一行解码后的字典
+        """
+        extra = None
+        for key, value in data.items():
+            if key in self._FIELDS:
+                if key in ('project', 'sessionId'):
+                    value = _intern(value)
+                setattr(self, key, value)
+            elif key != 'formatted_time':
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        self._extra = extra
+
+    @property
+    def formatted_time(self) -> str:
+        """格式化后的时间，访问时才计算；记录没有 timestamp 时不存在该字段"""
+        try:
+            timestamp = self.timestamp
+        except AttributeError:
+            raise AttributeError('formatted_time') from None
+        return format_timestamp(timestamp)
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._FIELDS or key == 'formatted_time':
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __iter__(self):
+        for key in self._FIELDS:
+            if hasattr(self, key):
+                yield key
+        if self._extra is not None:
+            yield from self._extra
+        if hasattr(self, 'timestamp'):
+            yield 'formatted_time'
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> Dict:
+        """转换为字典"""
+        return {key: self[key] for key in self}
+
+    def __repr__(self) -> str:
+        return f"HistoryEntry({self.to_dict()!r})"
+
+
+def record_default(value: Any) -> Any:
+    """
+    写入缓存时 json.dumps 的 default 参数，消息转换为 Message.to_record() 的结果
+
+    Raises:
+        TypeError: 不支持的类型
+    """
+    if isinstance(value, Message):
+        return value.to_record()
+    return json_default(value)
+
+
+def json_default(value: Any) -> Any:
+    """
+    json.dumps 的 default 参数，将记录转换为字典
+
+    Raises:
+        TypeError: 不支持的类型
+    """
+    if isinstance(value, (Message, HistoryEntry)):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -82,7 +82,8 @@ def start_app():
 
     try:
         # 导入并运行Flask应用
-        from app import app
+        from app import app, parser
+        parser.start_watching()
         app.run(debug=False, host='0.0.0.0', port=5000)
     except ImportError:
         print("❌ 无法导入应用，请检查app.py文件是否存在")
@@ -0,0 +1,383 @@
+"""
+Claude Code 对话全文索引
+基于 SQLite FTS5 trigram 分词器的倒排索引，随 history.jsonl 和对话文件的变化增量更新。
+匹配语义与逐条扫描相同: 每个关键词按不区分大小写的子串匹配（"gram" 可以匹配 "programming"），
+3 个字符及以上的关键词通过索引查找，更短的关键词（如单个字母、两个汉字）在索引命中或文档上逐条比较
+"""
+
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import fast_json
+from session_cache import default_cache_dir
+
+# 索引结构版本，结构或切分规则变化时递增，旧索引会被自动丢弃重建
+SCHEMA_VERSION = 2
+
+# 单次查询最多返回的命中数（每个会话的内容命中合并为一条）
+SEARCH_HIT_LIMIT = 5000
+
+# 片段前后保留的字符数
+SNIPPET_CONTEXT = 60
+
+# trigram 索引能够查找的最短关键词长度（字符数）
+TRIGRAM_MIN_LENGTH = 3
+
+# 查询语法: "带引号的短语" 或 空白分隔的词
+_QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+
+def query_terms(query: str) -> List[str]:
+    """
+    拆分用户查询
+
+    空白分隔的词之间为 AND 关系，引号内为完整短语（可以包含空格）
+
+    Args:
+        query: 用户输入的查询
+
+    Returns:
+        List[str]: 转为小写的关键词列表，逐条扫描时每个关键词都须是文本的子串
+    """
+    return [text.lower() for text in (phrase or term for phrase, term in _QUERY_RE.findall(query)) if text]
+
+
+def build_match_expression(terms: List[str]) -> Optional[str]:
+    """
+    将关键词转换为 FTS5 MATCH 表达式
+
+    每个关键词作为一个短语，trigram 分词器对短语按子串匹配；
+    短于 TRIGRAM_MIN_LENGTH 的关键词无法通过索引查找，不包含在表达式中
+
+    Args:
+        terms: query_terms() 返回的关键词
+
+    Returns:
+        str: MATCH 表达式，没有可以通过索引查找的关键词时返回 None
+    """
+    clauses = ['"' + term.replace('"', '""') + '"' for term in terms if len(term) >= TRIGRAM_MIN_LENGTH]
+    return ' AND '.join(clauses) if clauses else None
+
+
+def _contains_text(content: Optional[str], term: str) -> bool:
+    """SQL 函数 contains_text(content, term): 与逐条扫描相同的不区分大小写的子串判断"""
+    return content is not None and term in content.lower()
+
+
+def make_snippet(content: str, query: str, context: int = SNIPPET_CONTEXT) -> str:
+    """
+    截取内容中第一个匹配位置附近的片段
+
+    Args:
+        content: 原始内容
+        query: 用户输入的查询
+        context: 匹配位置前后保留的字符数
+
+    Returns:
+        str: 片段文本
+    """
+    content_lower = content.lower()
+    terms = query_terms(query)
+    positions = [content_lower.find(term) for term in terms]
+    positions = [pos for pos in positions if pos >= 0]
+
+    start = max(min(positions) - context, 0) if positions else 0
+    end = min(start + context * 2 + max((len(t) for t in terms), default=0), len(content))
+
+    snippet = content[start:end].replace('\n', ' ')
+    if start > 0:
+        snippet = '...' + snippet
+    if end < len(content):
+        snippet = snippet + '...'
+    return snippet
+
+
+class SearchIndex:
+    """基于 SQLite FTS5 的对话全文索引"""
+
+    def __init__(self, cache_dir: str = None):
+        """
+        初始化索引
+
+        Args:
+            cache_dir: 缓存目录路径，默认为 default_cache_dir()
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.cache_dir / "search.db"
+
+        self._local = threading.local()
+        self._sync_lock = threading.Lock()
+
+        # 已索引文件 -> (mtime_ns, size)，避免每次同步都查询数据库
+        self._sources: Optional[Dict[str, tuple]] = None
+
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.create_function('contains_text', 2, _contains_text, deterministic=True)
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        """创建表结构，版本不一致时重建；SQLite 不支持 FTS5 或 trigram 分词器（3.34 之前）时抛出 sqlite3.OperationalError"""
+        conn = self._connect()
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+        with conn:
+            if version != SCHEMA_VERSION:
+                for table in ('docs_fts', 'docs', 'sources', 'meta'):
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS docs (
+                    id INTEGER PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    session_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    ref TEXT,
+                    content TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_docs_source ON docs(source)")
+            # 内容保存在 docs 表中，索引只保存 trigram
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5("
+                "content, content='docs', content_rowid='id', tokenize='trigram')"
+            )
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sources (
+                    source TEXT PRIMARY KEY,
+                    mtime_ns INTEGER NOT NULL,
+                    size INTEGER NOT NULL
+                )
+            """)
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)")
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def sync_history(self, history_file: Path):
+        """
+        将 history.jsonl 新追加的问题加入索引
+
+        Args:
+            history_file: history.jsonl 路径
+        """
+        with self._sync_lock:
+            conn = self._connect()
+            try:
+                stat = history_file.stat()
+            except OSError:
+                return
+
+            # 多个进程共享同一个索引时，在写事务中读取同步进度，避免同一段内容被重复索引
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                meta = dict(conn.execute("SELECT key, value FROM meta"))
+                inode = meta.get('history_inode')
+                offset = meta.get('history_offset', 0)
+
+                reset = stat.st_ino != inode or stat.st_size < offset
+                if reset:
+                    offset = 0
+                elif stat.st_size == offset:
+                    return
+
+                with open(history_file, 'rb') as f:
+                    f.seek(offset)
+                    chunk = f.read(stat.st_size - offset)
+
+                # 只处理完整的行
+                end = chunk.rfind(b'\n')
+                if end < 0 and not reset:
+                    return
+
+                docs = []
+                for line in chunk[:max(end, 0)].split(b'\n'):
+                    if not line.strip():
+                        continue
+                    try:
+                        data = fast_json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(data, dict) and data.get('sessionId') and data.get('display'):
+                        docs.append(('history', data['sessionId'], 'prompt',
+                                     str(data.get('timestamp', '')), data['display']))
+
+                if reset:
+                    self._delete_source(conn, 'history')
+                self._insert_docs(conn, docs)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                    [('history_inode', stat.st_ino), ('history_offset', offset + end + 1)]
+                )
+
+    def sync_transcripts(self, transcripts: Dict[str, Path],
+                         load_messages: Callable[[str, Path], List[Dict]], prune: bool = True):
+        """
+        同步对话文件的索引，只重新索引新增或发生变化的文件
+
+        Args:
+            transcripts: sessionId -> 对话文件路径
+            load_messages: 读取对话消息的函数，参数为 (sessionId, 文件路径)
+            prune: transcripts 是否为全部对话文件；为 True 时删除不在其中的文件的索引
+        """
+        with self._sync_lock:
+            conn = self._connect()
+            if self._sources is None:
+                self._sources = {
+                    source: (mtime_ns, size)
+                    for source, mtime_ns, size in conn.execute(
+                        "SELECT source, mtime_ns, size FROM sources")
+                }
+
+            current = set()
+            for session_id, path in transcripts.items():
+                source = str(path)
+                current.add(source)
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+
+                version = (stat.st_mtime_ns, stat.st_size)
+                if self._sources.get(source) == version or self._indexed_version(conn, source) == version:
+                    self._sources[source] = version
+                    continue
+
+                messages = load_messages(session_id, path)
+                docs = [(source, session_id, message['type'], message.get('uuid'), message['content'])
+                        for message in messages]
+
+                with conn:
+                    conn.execute("BEGIN IMMEDIATE")
+
+                    # 解析期间共享索引的其他进程可能已经索引了同一版本
+                    if self._indexed_version(conn, source) == version:
+                        self._sources[source] = version
+                        continue
+
+                    self._delete_source(conn, source)
+                    self._insert_docs(conn, docs)
+                    conn.execute(
+                        "INSERT OR REPLACE INTO sources (source, mtime_ns, size) VALUES (?, ?, ?)",
+                        (source, stat.st_mtime_ns, stat.st_size)
+                    )
+                self._sources[source] = version
+
+            # 已删除的对话文件
+            if prune:
+                self._remove_sources([source for source in self._sources if source not in current])
+
+    def remove_transcript(self, path: Path):
+        """
+        删除某个对话文件的索引
+
+        Args:
+            path: 对话文件路径
+        """
+        with self._sync_lock:
+            self._remove_sources([str(path)])
+
+    def _remove_sources(self, sources: List[str]):
+        """删除若干来源的文档及其索引记录"""
+        if not sources:
+            return
+
+        conn = self._connect()
+        with conn:
+            for source in sources:
+                self._delete_source(conn, source)
+                conn.execute("DELETE FROM sources WHERE source = ?", (source,))
+                if self._sources is not None:
+                    self._sources.pop(source, None)
+
+    def search(self, query: str, limit: int = SEARCH_HIT_LIMIT) -> Optional[List[Dict]]:
+        """
+        查询索引
+
+        Args:
+            query: 用户输入的查询，空格分隔的词为 AND 关系，引号内为短语，每个词按子串匹配
+            limit: 最多返回的命中数
+
+        Returns:
+            List[Dict]: 按相关度排序的命中列表，每项包含 session_id、kind、ref、score、snippet；
+                        同一会话的消息命中只返回得分最高的一条，查询没有关键词时返回 None
+        """
+        terms = query_terms(query)
+        if not terms:
+            return None
+
+        # 长关键词通过 trigram 索引查找并计算相关度，短关键词在命中的文档上逐条比较；
+        # 全部是短关键词时逐条比较所有文档（不计算相关度）
+        short_terms = [term for term in terms if len(term) < TRIGRAM_MIN_LENGTH]
+        expression = build_match_expression(terms)
+        if expression is not None:
+            hits = ("SELECT docs_fts.rowid AS rowid, bm25(docs_fts) AS score FROM docs_fts "
+                    "WHERE docs_fts MATCH ?" + " AND contains_text(docs_fts.content, ?)" * len(short_terms))
+            params = [expression] + short_terms
+        else:
+            hits = ("SELECT id AS rowid, 0.0 AS score FROM docs WHERE "
+                    + " AND ".join(["contains_text(content, ?)"] * len(short_terms)))
+            params = short_terms
+
+        # 每个会话只保留得分最高的一条内容命中，问题命中按条保留
+        rows = self._connect().execute(
+            f"WITH hits AS MATERIALIZED ({hits}) "
+            ", best AS ("
+            "  SELECT docs.id AS id, MIN(hits.score) AS score "
+            "  FROM hits JOIN docs ON docs.id = hits.rowid "
+            "  GROUP BY docs.session_id, CASE docs.kind WHEN 'prompt' THEN docs.ref ELSE '' END "
+            "  ORDER BY score LIMIT ?"
+            ") "
+            "SELECT docs.session_id, docs.kind, docs.ref, docs.content, best.score "
+            "FROM best JOIN docs ON docs.id = best.id ORDER BY best.score",
+            (*params, limit)
+        ).fetchall()
+
+        return [{
+            'session_id': session_id,
+            'kind': kind,
+            'ref': ref,
+            'score': score,
+            'snippet': make_snippet(content, query)
+        } for session_id, kind, ref, content, score in rows]
+
+    @staticmethod
+    def _indexed_version(conn: sqlite3.Connection, source: str) -> Optional[tuple]:
+        """读取数据库中记录的某个来源的已索引版本 (mtime_ns, size)"""
+        row = conn.execute(
+            "SELECT mtime_ns, size FROM sources WHERE source = ?", (source,)
+        ).fetchone()
+        return tuple(row) if row is not None else None
+
+    @staticmethod
+    def _delete_source(conn: sqlite3.Connection, source: str):
+        """删除某个来源的全部文档（外部内容表需要提供原内容才能删除索引）"""
+        conn.execute(
+            "INSERT INTO docs_fts (docs_fts, rowid, content) "
+            "SELECT 'delete', id, content FROM docs WHERE source = ?",
+            (source,)
+        )
+        conn.execute("DELETE FROM docs WHERE source = ?", (source,))
+
+    @staticmethod
+    def _insert_docs(conn: sqlite3.Connection, docs: List[tuple]):
+        """插入文档及其索引"""
+        for doc in docs:
+            cursor = conn.execute(
+                "INSERT INTO docs (source, session_id, kind, ref, content) VALUES (?, ?, ?, ?, ?)",
+                doc
+            )
+            conn.execute(
+                "INSERT INTO docs_fts (rowid, content) VALUES (?, ?)",
+                (cursor.lastrowid, doc[4])
+            )
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Claude Code 可视化工具生产模式启动脚本
+使用多线程 WSGI 服务器（waitress 或 gunicorn，均为可选依赖）代替 Flask 开发服务器，
+不启用调试器和自动重载。多个 worker 进程通过同一个缓存目录共享解析缓存和搜索索引:
+SQLite 使用 WAL 模式，读取互不阻塞，写入由忙等待超时和 BEGIN IMMEDIATE 串行化。
+实时推送（/api/stream）的每个连接在断开前一直占用一个处理线程，
+因此每个进程只允许一部分线程用于实时推送（--stream-connections），其余线程始终可以处理普通请求。
+
+用法:
+    python3 serve.py [--server auto|waitress|gunicorn|werkzeug] [--host 0.0.0.0] [--port 5000]
+                     [--threads 8] [--processes 2] [--stream-connections N]
+                     [--claude-dir DIR] [--cache-dir DIR] [--workers N]
+"""
+
+import argparse
+import multiprocessing
+import os
+
+# 可选的生产 WSGI 服务器，按优先顺序尝试
+SERVERS = ('waitress', 'gunicorn', 'werkzeug')
+
+
+def parse_args():
+    """解析命令行参数"""
+    arg_parser = argparse.ArgumentParser(description="Claude Code 可视化工具（生产模式）")
+    arg_parser.add_argument('--server', choices=('auto',) + SERVERS, default='auto',
+                            help="WSGI 服务器，auto 表示按 waitress、gunicorn、werkzeug 的顺序选择已安装的")
+    arg_parser.add_argument('--host', default='0.0.0.0', help="监听地址")
+    arg_parser.add_argument('--port', type=int, default=5000, help="监听端口")
+    arg_parser.add_argument('--threads', type=int, default=8, help="每个进程处理请求的线程数")
+    arg_parser.add_argument('--processes', type=int, default=2,
+                            help="gunicorn 的 worker 进程数，各进程共享同一个缓存目录")
+    arg_parser.add_argument('--stream-connections', type=int, default=-1,
+                            help="每个进程同时保持的实时推送连接数，默认为线程数的一半，0 表示关闭实时推送")
+    arg_parser.add_argument('--claude-dir', help="Claude 配置目录，默认为 ~/.claude")
+    arg_parser.add_argument('--cache-dir', help="解析缓存和搜索索引目录，默认为 ~/.cache/claude-code-visualization")
+    arg_parser.add_argument('--workers', type=int, default=0,
+                            help="冷启动时并行解析对话文件的进程数，0 表示使用 CPU 核数，1 表示不并行")
+    return arg_parser.parse_args()
+
+
+def resolve_server(name: str) -> str:
+    """
+    确定使用的服务器
+
+    Args:
+        name: 命令行指定的服务器，auto 表示自动选择
+
+    Returns:
+        str: 服务器名称
+
+    Raises:
+        ImportError: 指定的服务器未安装
+    """
+    candidates = SERVERS if name == 'auto' else (name,)
+    for candidate in candidates:
+        try:
+            __import__(candidate)
+            return candidate
+        except ImportError:
+            if name != 'auto':
+                raise
+    return 'werkzeug'
+
+
+def stream_connection_limit(args) -> int:
+    """
+    每个进程允许的实时推送连接数
+
+    每个连接占用一个处理线程，默认最多使用一半的线程，保证普通请求不会因长连接而排队
+
+    Args:
+        args: 命令行参数
+
+    Returns:
+        int: 连接数上限，0 表示关闭实时推送
+    """
+    if args.stream_connections >= 0:
+        return min(args.stream_connections, max(args.threads - 1, 0))
+    return args.threads // 2
+
+
+def load_app(args):
+    """
+    导入 Flask 应用、设置实时推送连接数上限并启动文件监听
+
+    Args:
+        args: 命令行参数
+
+    Returns:
+        Flask: 应用对象
+    """
+    from app import app, parser
+    if args.workers > 0:
+        parser.workers = args.workers
+    app.config['STREAM_MAX_CONNECTIONS'] = stream_connection_limit(args)
+    if parser.start_watching():
+        print(f"[{os.getpid()}] 已启用文件监听，数据变化会自动更新")
+    return app
+
+
+def serve_waitress(args):
+    """使用 waitress（单进程多线程，支持 Windows）"""
+    import waitress
+    app = load_app(args)
+    waitress.serve(app, host=args.host, port=args.port, threads=args.threads)
+
+
+def serve_gunicorn(args):
+    """使用 gunicorn（多进程 x 多线程，仅支持类 Unix 系统）"""
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f"{args.host}:{args.port}")
+            self.cfg.set('workers', args.processes)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('threads', args.threads)
+            # 实时推送是长连接，不能被 worker 超时中断
+            self.cfg.set('timeout', 0)
+
+        def load(self):
+            # 每个 worker 进程在 fork 之后各自导入应用，SQLite 连接和监听线程不跨进程共享
+            return load_app(args)
+
+    Application().run()
+
+
+def serve_werkzeug(args):
+    """使用 werkzeug 多线程服务器（未安装生产服务器时的后备方案）"""
+    app = load_app(args)
+    app.run(host=args.host, port=args.port, debug=False, threaded=True, use_reloader=False)
+
+
+def main():
+    """主函数"""
+    args = parse_args()
+
+    # 在导入应用之前设置，app 模块据此创建解析器
+    if args.claude_dir:
+        os.environ['CLAUDE_VIS_CLAUDE_DIR'] = args.claude_dir
+    if args.cache_dir:
+        os.environ['CLAUDE_VIS_CACHE_DIR'] = args.cache_dir
+
+    try:
+        server = resolve_server(args.server)
+    except ImportError as e:
+        print(f"启动服务器出错: {e}")
+        print(f"请先安装: pip install {args.server}")
+        return
+
+    print(f"使用 {server} 启动 Claude Code 可视化工具（生产模式）")
+    print(f"访问 http://localhost:{args.port} 查看界面")
+    stream_limit = stream_connection_limit(args)
+    if stream_limit:
+        print(f"每个进程最多 {stream_limit} 个实时推送连接（共 {args.threads} 个处理线程）")
+    else:
+        print("已关闭实时推送")
+    if server == 'werkzeug':
+        print("提示: 未安装 waitress 或 gunicorn，使用 werkzeug 多线程服务器")
+
+    if server == 'waitress':
+        serve_waitress(args)
+    elif server == 'gunicorn':
+        serve_gunicorn(args)
+    else:
+        serve_werkzeug(args)
+
+
+if __name__ == '__main__':
+    # 打包为可执行文件后，进程池的子进程也从这里启动
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,143 @@
+"""
+Claude Code 会话统计分析
+每个对话文件在解析时计算一次统计数据（用户/助手消息数、各工具的调用次数、首末消息时间），
+随解析缓存一起保存；SessionAnalytics 汇总所有会话的统计数据，
+某个会话变化时只减去它的旧数据、加上新数据，不需要重新遍历全部会话
+"""
+
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+
+def aggregate_messages(messages: Iterable[Dict]) -> Dict:
+    """
+    计算一组消息的统计数据
+
+    Args:
+        messages: 消息列表（按时间顺序），工具调用次数按 Message.tools 统计
+
+    Returns:
+        Dict: 包含 user_messages、assistant_messages、tools（工具名 -> 调用次数）、
+              first_timestamp、last_timestamp 的字典
+    """
+    user_messages = 0
+    assistant_messages = 0
+    tools = Counter()
+    first_timestamp = None
+    last_timestamp = None
+
+    for message in messages:
+        if message['type'] == 'user':
+            user_messages += 1
+        else:
+            assistant_messages += 1
+            if message.tools:
+                tools.update(message.tools)
+
+        timestamp = message['timestamp']
+        if timestamp:
+            if first_timestamp is None:
+                first_timestamp = timestamp
+            last_timestamp = timestamp
+
+    return {
+        'user_messages': user_messages,
+        'assistant_messages': assistant_messages,
+        'tools': dict(tools),
+        'first_timestamp': first_timestamp,
+        'last_timestamp': last_timestamp
+    }
+
+
+def merge_aggregates(previous: Dict, appended: Dict) -> Dict:
+    """
+    合并同一对话文件先后两部分的统计数据（文件追加内容后增量解析时使用）
+
+    Args:
+        previous: 之前已解析部分的统计数据
+        appended: 新追加部分的统计数据
+
+    Returns:
+        Dict: 合并后的统计数据
+    """
+    tools = Counter(previous['tools'])
+    tools.update(appended['tools'])
+    return {
+        'user_messages': previous['user_messages'] + appended['user_messages'],
+        'assistant_messages': previous['assistant_messages'] + appended['assistant_messages'],
+        'tools': dict(tools),
+        'first_timestamp': previous['first_timestamp'] or appended['first_timestamp'],
+        'last_timestamp': appended['last_timestamp'] or previous['last_timestamp']
+    }
+
+
+class SessionAnalytics:
+    """所有会话统计数据的汇总，按对话文件增量更新"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 对话文件路径 -> (sessionId, 文件版本 (mtime_ns, size), 统计数据)
+        self._sessions: Dict[str, Tuple[str, tuple, Dict]] = {}
+        self.tools = Counter()
+        self.user_messages = 0
+        self.assistant_messages = 0
+        # 每次数据变化时递增，用于判断汇总结果是否需要重新生成
+        self.version = 0
+
+    def is_current(self, path: str, version: tuple) -> bool:
+        """对话文件的统计数据是否已是该版本"""
+        current = self._sessions.get(path)
+        return current is not None and current[1] == version
+
+    def paths(self) -> List[str]:
+        """已汇总的对话文件路径"""
+        with self._lock:
+            return list(self._sessions)
+
+    def update(self, path: str, session_id: str, version: tuple, aggregate: Dict):
+        """
+        更新一个对话文件的统计数据
+
+        Args:
+            path: 对话文件路径
+            session_id: 会话ID
+            version: 文件版本 (mtime_ns, size)
+            aggregate: aggregate_messages() 的结果
+        """
+        with self._lock:
+            previous = self._sessions.get(path)
+            if previous is not None:
+                if previous[1] == version:
+                    return
+                self._subtract(previous[2])
+
+            self._sessions[path] = (session_id, version, aggregate)
+            self.tools.update(aggregate['tools'])
+            self.user_messages += aggregate['user_messages']
+            self.assistant_messages += aggregate['assistant_messages']
+            self.version += 1
+
+    def remove(self, path: str):
+        """移除已删除的对话文件的统计数据"""
+        with self._lock:
+            previous = self._sessions.pop(path, None)
+            if previous is not None:
+                self._subtract(previous[2])
+                self.version += 1
+
+    def _subtract(self, aggregate: Dict):
+        self.tools.subtract(aggregate['tools'])
+        self.tools = +self.tools  # 去掉计数为 0 的工具
+        self.user_messages -= aggregate['user_messages']
+        self.assistant_messages -= aggregate['assistant_messages']
+
+    def sessions(self) -> List[Tuple[str, Dict]]:
+        """
+        获取各会话的统计数据
+
+        Returns:
+            List[tuple]: (sessionId, 统计数据) 列表
+        """
+        with self._lock:
+            return [(session_id, aggregate) for session_id, _, aggregate in self._sessions.values()]
@@ -0,0 +1,367 @@
+"""
+Claude Code 会话解析缓存
+将解析后的对话记录持久化到本地 SQLite 数据库，
+以 对话文件路径 + mtime + size 作为键，只有文件发生变化时才重新解析；
+对话文件只会追加写入，同时记录已完整解析到的位置，文件变长时只需解析新增部分。
+每个对话文件的统计数据（见 session_analytics）也保存在这里，统计分析不需要重新解析消息
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import fast_json
+from records import Message, record_default
+
+# 缓存结构版本，结构变化时递增，旧缓存会被自动丢弃重建
+SCHEMA_VERSION = 6
+
+# 每个会话在缓存中单独保存的预览消息数量，列表页只需读取这部分
+PREVIEW_MESSAGE_LIMIT = 6
+
+
+def default_cache_dir() -> Path:
+    """
+    获取默认缓存目录
+
+    优先使用环境变量 CLAUDE_VIS_CACHE_DIR，其次为 $XDG_CACHE_HOME 或 ~/.cache
+    下的 claude-code-visualization 目录
+
+    Returns:
+        Path: 缓存目录路径
+    """
+    env_dir = os.environ.get("CLAUDE_VIS_CACHE_DIR")
+    if env_dir:
+        return Path(env_dir).expanduser()
+
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return Path(base) / "claude-code-visualization"
+
+
+class SessionCache:
+    """基于 SQLite 的会话解析缓存"""
+
+    def __init__(self, cache_dir: str = None):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 缓存目录路径，默认为 default_cache_dir()
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.cache_dir / "sessions.db"
+
+        # sqlite3 连接不能跨线程共享，每个线程各自持有一个连接
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        """获取当前线程的数据库连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.db_path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        """创建表结构，版本不一致时重建"""
+        conn = self._connect()
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+        with conn:
+            if version != SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS transcripts")
+                conn.execute("DROP TABLE IF EXISTS line_index")
+
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS transcripts (
+                    path TEXT PRIMARY KEY,
+                    session_id TEXT NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    inode INTEGER,
+                    parsed_offset INTEGER NOT NULL,
+                    message_count INTEGER NOT NULL,
+                    first_timestamp TEXT,
+                    last_timestamp TEXT,
+                    preview TEXT NOT NULL,
+                    messages TEXT NOT NULL,
+                    stats TEXT
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_transcripts_session ON transcripts(session_id)"
+            )
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS line_index (
+                    path TEXT PRIMARY KEY,
+                    mtime_ns INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    inode INTEGER,
+                    scanned_offset INTEGER NOT NULL,
+                    offsets BLOB NOT NULL
+                )
+            """)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def get_messages(self, path: str, mtime_ns: int, size: int) -> Optional[List[Dict]]:
+        """
+        读取缓存的对话消息
+
+        Args:
+            path: 对话文件路径
+            mtime_ns: 文件修改时间（纳秒）
+            size: 文件大小
+
+        Returns:
+            List[Dict]: 缓存的消息列表；缓存不存在或已过期时返回 None
+        """
+        row = self._connect().execute(
+            "SELECT messages FROM transcripts WHERE path = ? AND mtime_ns = ? AND size = ?",
+            (path, mtime_ns, size)
+        ).fetchone()
+
+        if row is None:
+            return None
+        return [Message.from_dict(message) for message in fast_json.loads(row[0])]
+
+    def has_messages(self, path: str, mtime_ns: int, size: int) -> bool:
+        """
+        检查缓存是否存在且未过期（不解码消息）
+
+        Args:
+            path: 对话文件路径
+            mtime_ns: 文件修改时间（纳秒）
+            size: 文件大小
+
+        Returns:
+            bool: 缓存是否可用
+        """
+        row = self._connect().execute(
+            "SELECT 1 FROM transcripts WHERE path = ? AND mtime_ns = ? AND size = ?",
+            (path, mtime_ns, size)
+        ).fetchone()
+        return row is not None
+
+    def get_summary(self, path: str, mtime_ns: int, size: int) -> Optional[Dict]:
+        """
+        读取缓存的会话摘要（不解码完整消息列表）
+
+        Args:
+            path: 对话文件路径
+            mtime_ns: 文件修改时间（纳秒）
+            size: 文件大小
+
+        Returns:
+            Dict: 包含 message_count、first_timestamp、last_timestamp、preview_messages 的字典；
+                  缓存不存在或已过期时返回 None
+        """
+        row = self._connect().execute(
+            "SELECT message_count, first_timestamp, last_timestamp, preview FROM transcripts "
+            "WHERE path = ? AND mtime_ns = ? AND size = ?",
+            (path, mtime_ns, size)
+        ).fetchone()
+
+        if row is None:
+            return None
+        return {
+            'message_count': row[0],
+            'first_timestamp': row[1],
+            'last_timestamp': row[2],
+            'preview_messages': [Message.from_dict(message) for message in fast_json.loads(row[3])]
+        }
+
+    def get_stats(self, path: str, mtime_ns: int, size: int) -> Optional[Dict]:
+        """
+        读取对话文件的统计数据（不解码消息）
+
+        Args:
+            path: 对话文件路径
+            mtime_ns: 文件修改时间（纳秒）
+            size: 文件大小
+
+        Returns:
+            Dict: 统计数据；缓存不存在、已过期或没有统计数据时返回 None
+        """
+        row = self._connect().execute(
+            "SELECT stats FROM transcripts WHERE path = ? AND mtime_ns = ? AND size = ?",
+            (path, mtime_ns, size)
+        ).fetchone()
+
+        if row is None or row[0] is None:
+            return None
+        return fast_json.loads(row[0])
+
+    def iter_stats(self) -> Iterator[Tuple[str, str, int, int, Dict]]:
+        """
+        遍历所有对话文件的统计数据（不解码消息）
+
+        Yields:
+            tuple: (路径, sessionId, mtime_ns, size, 统计数据)
+        """
+        rows = self._connect().execute(
+            "SELECT path, session_id, mtime_ns, size, stats FROM transcripts WHERE stats IS NOT NULL"
+        )
+        for path, session_id, mtime_ns, size, stats in rows:
+            yield path, session_id, mtime_ns, size, fast_json.loads(stats)
+
+    def get_resumable(self, path: str, inode: int, size: int) -> Optional[Tuple[List[Dict], int, Optional[Dict]]]:
+        """
+        读取可以继续增量解析的旧缓存
+
+        文件仍是同一个（inode 相同）且比缓存时更大时，缓存的消息仍然有效，
+        只需从已解析到的位置继续解析新追加的内容
+
+        Args:
+            path: 对话文件路径
+            inode: 文件当前的 inode
+            size: 文件当前的大小
+
+        Returns:
+            tuple: (缓存的消息列表, 已完整解析到的字节位置, 统计数据)；没有可用的旧缓存时返回 None
+        """
+        row = self._connect().execute(
+            "SELECT messages, parsed_offset, stats FROM transcripts "
+            "WHERE path = ? AND inode = ? AND size < ? AND parsed_offset <= ?",
+            (path, inode, size, size)
+        ).fetchone()
+
+        if row is None:
+            return None
+        messages = [Message.from_dict(message) for message in fast_json.loads(row[0])]
+        return messages, row[1], fast_json.loads(row[2]) if row[2] is not None else None
+
+    def put_messages(self, path: str, session_id: str, mtime_ns: int, size: int,
+                     messages: List[Dict], parsed_offset: int = None, inode: int = None,
+                     stats: Dict = None):
+        """
+        写入（或覆盖）对话消息缓存
+
+        Args:
+            path: 对话文件路径
+            session_id: 会话ID
+            mtime_ns: 文件修改时间（纳秒）
+            size: 文件大小
+            messages: 解析后的消息列表，可以为空列表
+            parsed_offset: 已完整解析到的字节位置（之后是尚未写完的行），默认为 size
+            inode: 文件的 inode，提供时文件变长后可以从 parsed_offset 继续解析
+            stats: 对话文件的统计数据（可选）
+        """
+        first_timestamp = messages[0].get('timestamp') if messages else None
+        last_timestamp = messages[-1].get('timestamp') if messages else None
+        if parsed_offset is None:
+            parsed_offset = size
+
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO transcripts "
+                "(path, session_id, mtime_ns, size, inode, parsed_offset, message_count, "
+                "first_timestamp, last_timestamp, preview, messages, stats) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, session_id, mtime_ns, size, inode, parsed_offset, len(messages),
+                 first_timestamp, last_timestamp,
+                 self._dumps(messages[:PREVIEW_MESSAGE_LIMIT]),
+                 self._dumps(messages),
+                 self._dumps(stats) if stats is not None else None)
+            )
+
+    def get_line_index(self, path: str, mtime_ns: int, size: int) -> Optional[array]:
+        """
+        读取对话文件的消息行偏移索引
+
+        Args:
+            path: 对话文件路径
+            mtime_ns: 文件修改时间（纳秒）
+            size: 文件大小
+
+        Returns:
+            array: 每条消息所在行的起始字节位置；缓存不存在或已过期时返回 None
+        """
+        row = self._connect().execute(
+            "SELECT offsets FROM line_index WHERE path = ? AND mtime_ns = ? AND size = ?",
+            (path, mtime_ns, size)
+        ).fetchone()
+
+        if row is None:
+            return None
+        offsets = array('Q')
+        offsets.frombytes(row[0])
+        return offsets
+
+    def get_resumable_line_index(self, path: str, inode: int, size: int) -> Optional[Tuple[array, int]]:
+        """
+        读取可以继续扫描的旧行偏移索引
+
+        文件仍是同一个（inode 相同）且比索引时更大时，已有的偏移仍然有效，
+        只需从已扫描到的位置继续扫描新追加的内容
+
+        Args:
+            path: 对话文件路径
+            inode: 文件当前的 inode
+            size: 文件当前的大小
+
+        Returns:
+            tuple: (消息行起始字节位置, 已扫描到的字节位置)；没有可用的旧索引时返回 None
+        """
+        row = self._connect().execute(
+            "SELECT offsets, scanned_offset FROM line_index "
+            "WHERE path = ? AND inode = ? AND size < ? AND scanned_offset <= ?",
+            (path, inode, size, size)
+        ).fetchone()
+
+        if row is None:
+            return None
+        offsets = array('Q')
+        offsets.frombytes(row[0])
+        return offsets, row[1]
+
+    def put_line_index(self, path: str, mtime_ns: int, size: int, offsets: array,
+                       scanned_offset: int = None, inode: int = None):
+        """
+        写入（或覆盖）对话文件的消息行偏移索引
+
+        Args:
+            path: 对话文件路径
+            mtime_ns: 文件修改时间（纳秒）
+            size: 文件大小
+            offsets: 每条消息所在行的起始字节位置
+            scanned_offset: 已扫描到的字节位置（之后是尚未写完的行），默认为 size
+            inode: 文件的 inode，提供时文件变长后可以从 scanned_offset 继续扫描
+        """
+        if scanned_offset is None:
+            scanned_offset = size
+
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO line_index (path, mtime_ns, size, inode, scanned_offset, offsets) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (path, mtime_ns, size, inode, scanned_offset, offsets.tobytes())
+            )
+
+    def prune_line_index(self, paths: Iterable[str]):
+        """
+        删除不在 paths 中的对话文件（已删除或移动）的行偏移索引
+
+        Args:
+            paths: 当前存在的对话文件路径
+        """
+        keep = set(paths)
+        conn = self._connect()
+        stale = [(path,) for (path,) in conn.execute("SELECT path FROM line_index") if path not in keep]
+        if stale:
+            with conn:
+                conn.executemany("DELETE FROM line_index WHERE path = ?", stale)
+
+    @staticmethod
+    def _dumps(value) -> str:
+        """紧凑格式的 JSON 序列化"""
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=record_default)
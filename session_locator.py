@@ -0,0 +1,177 @@
+"""
+Claude Code 会话文件定位索引
+扫描 projects/ 和 debug/ 目录，建立 sessionId -> 文件路径 的映射，
+目录的修改时间变化时才重新扫描对应目录
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+
+class SessionLocator:
+    """sessionId 到对话文件、调试日志路径的定位索引"""
+
+    def __init__(self, projects_dir: Path, debug_dir: Path):
+        """
+        初始化定位索引
+
+        Args:
+            projects_dir: 对话文件所在的 projects 目录
+            debug_dir: 调试日志所在的 debug 目录
+        """
+        self.projects_dir = Path(projects_dir)
+        self.debug_dir = Path(debug_dir)
+
+        self._lock = threading.RLock()
+        self._scanned = False
+
+        # 由文件监听器维护时，只有收到新建/删除/移动事件后才需要重新检查目录
+        self.watched = False
+        self._dirty = True
+
+        # sessionId -> 文件路径
+        self._transcripts: Dict[str, Path] = {}
+        self._debug_logs: Dict[str, Path] = {}
+
+        # 目录 -> 上次扫描时的 mtime_ns，以及每个项目目录下找到的会话
+        self._dir_mtimes: Dict[str, int] = {}
+        self._dir_sessions: Dict[str, Set[str]] = {}
+
+    def refresh(self):
+        """检查目录修改时间，只重新扫描发生变化的目录"""
+        with self._lock:
+            if self.watched and not self._dirty:
+                return
+
+            self._dirty = False
+            self._refresh_projects()
+            self._refresh_debug_logs()
+            self._scanned = True
+
+    def mark_dirty(self):
+        """标记目录结构已变化（由文件监听器调用），下次 refresh 时重新检查"""
+        with self._lock:
+            self._dirty = True
+
+    def find_transcript(self, session_id: str) -> Optional[Path]:
+        """
+        查找会话的对话文件
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            Path: 对话文件路径，如果不存在则返回 None
+        """
+        if not self._scanned:
+            self.refresh()
+        return self._transcripts.get(session_id)
+
+    def find_debug_log(self, session_id: str) -> Optional[Path]:
+        """
+        查找会话的调试日志文件
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            Path: 调试日志路径，如果不存在则返回 None
+        """
+        if not self._scanned:
+            self.refresh()
+        return self._debug_logs.get(session_id)
+
+    def all_transcripts(self) -> Dict[str, Path]:
+        """
+        获取全部已知的对话文件
+
+        Returns:
+            Dict[str, Path]: sessionId -> 对话文件路径
+        """
+        if not self._scanned:
+            self.refresh()
+        with self._lock:
+            return dict(self._transcripts)
+
+    def _refresh_projects(self):
+        """扫描 projects 目录下发生变化的项目目录"""
+        try:
+            project_entries = [entry for entry in os.scandir(self.projects_dir)
+                               if entry.is_dir()]
+        except OSError:
+            project_entries = []
+
+        # 按名称排序，保证同一会话出现在多个目录时结果稳定
+        project_entries.sort(key=lambda entry: entry.name)
+        current_dirs = set()
+
+        for entry in project_entries:
+            current_dirs.add(entry.path)
+            try:
+                mtime_ns = entry.stat().st_mtime_ns
+            except OSError:
+                continue
+
+            if self._dir_mtimes.get(entry.path) == mtime_ns:
+                continue
+
+            self._forget_project_dir(entry.path)
+            self._dir_mtimes[entry.path] = mtime_ns
+
+            sessions = set()
+            try:
+                for file_entry in os.scandir(entry.path):
+                    if file_entry.name.endswith('.jsonl') and file_entry.is_file():
+                        session_id = file_entry.name[:-len('.jsonl')]
+                        sessions.add(session_id)
+                        self._transcripts.setdefault(session_id, Path(file_entry.path))
+            except OSError as e:
+                print(f"扫描项目目录时出错 {entry.path}: {e}")
+
+            self._dir_sessions[entry.path] = sessions
+
+        # 已删除的项目目录
+        for path in list(self._dir_sessions):
+            if path not in current_dirs:
+                self._forget_project_dir(path)
+
+    def _forget_project_dir(self, path: str):
+        """移除某个项目目录下的会话映射"""
+        self._dir_mtimes.pop(path, None)
+        for session_id in self._dir_sessions.pop(path, set()):
+            transcript = self._transcripts.get(session_id)
+            if transcript is None or str(transcript.parent) != path:
+                continue
+
+            del self._transcripts[session_id]
+            # 同一会话在其他项目目录中也存在时改为指向那里
+            for other_path in sorted(self._dir_sessions):
+                if session_id in self._dir_sessions[other_path]:
+                    self._transcripts[session_id] = Path(other_path) / f"{session_id}.jsonl"
+                    break
+
+    def _refresh_debug_logs(self):
+        """debug 目录发生变化时重新扫描调试日志"""
+        debug_key = str(self.debug_dir)
+        try:
+            mtime_ns = self.debug_dir.stat().st_mtime_ns
+        except OSError:
+            self._debug_logs = {}
+            self._dir_mtimes.pop(debug_key, None)
+            return
+
+        if self._dir_mtimes.get(debug_key) == mtime_ns:
+            return
+
+        debug_logs = {}
+        try:
+            for entry in os.scandir(self.debug_dir):
+                if entry.name.endswith('.txt'):
+                    debug_logs[entry.name[:-len('.txt')]] = Path(entry.path)
+        except OSError as e:
+            print(f"扫描调试日志目录时出错: {e}")
+
+        self._debug_logs = debug_logs
+        self._dir_mtimes[debug_key] = mtime_ns
@@ -3,6 +3,7 @@
 Claude Code 可视化工具启动脚本
 """
 
+import argparse
 import subprocess
 import sys
 import os
@@ -51,14 +52,23 @@ def install_dependencies():
         print(f"❌ 依赖安装失败: {e}")
         return False
 
-def start_server():
-    """启动服务器"""
+def start_server(workers: int = 0):
+    """
+    启动服务器
+
+    Args:
+        workers: 冷启动时并行解析对话文件的进程数，0 表示使用 CPU 核数
+    """
     print("\n" + "="*50)
     print("🚀 启动 Claude Code 可视化工具")
     print("="*50)
 
     try:
-        from app import app
+        from app import app, parser
+        if workers > 0:
+            parser.workers = workers
+        if parser.start_watching():
+            print("✅ 已启用文件监听，数据变化会自动更新")
         print("\n📱 访问地址:")
         print("   http://localhost:5000")
         print("\n💡 功能:")
@@ -83,6 +93,11 @@ def start_server():
 
 def main():
     """主函数"""
+    arg_parser = argparse.ArgumentParser(description="Claude Code 可视化工具启动脚本")
+    arg_parser.add_argument('--workers', type=int, default=0,
+                            help="冷启动时并行解析对话文件的进程数，0 表示使用 CPU 核数，1 表示不并行")
+    args = arg_parser.parse_args()
+
     print("Claude Code 可视化工具")
     print("="*30)
 
@@ -100,7 +115,7 @@ def main():
             return
 
     # 启动服务器
-    start_server()
+    start_server(args.workers)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,50 @@
+"""
+测试公共设置: 将项目根目录加入模块搜索路径，并提供合成的 Claude 数据目录
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def write_jsonl(path: Path, records, tail: bytes = b''):
+    """写入 JSONL 文件，tail 为追加在末尾的原始字节（如未写完的行）"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+        f.write(tail)
+
+
+def user_line(text: str, uuid: str, timestamp: str = '2025-06-15T10:00:00.000Z') -> dict:
+    """对话文件中的一条用户消息"""
+    return {'type': 'user', 'message': {'role': 'user', 'content': text}, 'uuid': uuid, 'timestamp': timestamp}
+
+
+def assistant_line(text: str, uuid: str, timestamp: str = '2025-06-15T10:00:01.000Z') -> dict:
+    """对话文件中的一条助手消息"""
+    return {'type': 'assistant', 'uuid': uuid, 'timestamp': timestamp,
+            'message': {'role': 'assistant', 'content': [{'type': 'text', 'text': text}]}}
+
+
+@pytest.fixture
+def claude_dir(tmp_path):
+    """包含三个会话的 Claude 数据目录"""
+    root = tmp_path / "claude"
+    sessions = {
+        's1': ('学习 programming 基础', 'I love Programming in Python'),
+        's2': ('修复报错', 'TypeError: x is not callable'),
+        's3': ('程序员的日常', 'hello world'),
+    }
+    history = []
+    for index, (session_id, (prompt, answer)) in enumerate(sessions.items()):
+        timestamp = 1750000000000 + index * 1000
+        history.append({'display': prompt, 'timestamp': timestamp, 'project': '/p', 'sessionId': session_id})
+        write_jsonl(root / "projects" / "-p" / f"{session_id}.jsonl",
+                    [user_line(prompt, f'{session_id}-u'), assistant_line(answer, f'{session_id}-a')])
+    write_jsonl(root / "history.jsonl", history)
+    return root
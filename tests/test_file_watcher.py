@@ -0,0 +1,64 @@
+"""
+文件监听的去抖与最长等待时间
+"""
+
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('watchdog')
+
+from file_watcher import ClaudeDirWatcher  # noqa: E402
+
+
+def test_continuous_writes_still_trigger_callback(tmp_path):
+    transcript = tmp_path / "projects" / "-p" / "s1.jsonl"
+    transcript.parent.mkdir(parents=True)
+    transcript.write_text('')
+
+    calls = []
+    called = threading.Event()
+
+    def on_change(path, structural):
+        if path == transcript:
+            calls.append(time.monotonic())
+            called.set()
+
+    watcher = ClaudeDirWatcher(tmp_path, on_change, debounce=0.5, max_wait=1.0)
+    assert watcher.start()
+    try:
+        # 每 0.1 秒追加一行，间隔始终小于去抖时间，持续 3 秒
+        start = time.monotonic()
+        with open(transcript, 'a') as f:
+            while time.monotonic() - start < 3.0:
+                f.write('{"type":"user"}\n')
+                f.flush()
+                time.sleep(0.1)
+        writing_calls = [t for t in calls if t - start < 3.0]
+    finally:
+        watcher.stop()
+
+    assert called.is_set()
+    assert len(writing_calls) >= 2
+
+
+def test_debounce_merges_a_burst_into_one_callback(tmp_path):
+    history = tmp_path / "history.jsonl"
+    history.write_text('')
+
+    calls = []
+    watcher = ClaudeDirWatcher(tmp_path, lambda path, structural: calls.append(path),
+                               debounce=0.3, max_wait=5.0)
+    assert watcher.start()
+    try:
+        with open(history, 'a') as f:
+            for _ in range(5):
+                f.write('{}\n')
+                f.flush()
+                time.sleep(0.02)
+        time.sleep(1.0)
+    finally:
+        watcher.stop()
+
+    assert calls.count(history) == 1
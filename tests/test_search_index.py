@@ -0,0 +1,42 @@
+"""
+全文索引与逐条扫描的搜索结果一致性
+"""
+
+import pytest
+
+from claude_parser import ClaudeDataParser
+
+
+def result_keys(results):
+    return sorted((entry['sessionId'], entry['timestamp']) for entry in results)
+
+
+@pytest.mark.parametrize('query', [
+    'gram',            # 单词中间的子串
+    'Error',           # 单词末尾的子串，大小写不同
+    'x',               # 单个字母
+    'o',
+    '程序',            # 两个汉字
+    '程',              # 单个汉字
+    'programming',
+    'hello world',     # 多个关键词
+    '"hello world"',   # 短语
+    'gram x',          # 长短关键词混合
+    'nothing-here',
+])
+def test_indexed_search_matches_scan(claude_dir, tmp_path, query):
+    indexed = ClaudeDataParser(str(claude_dir), cache_dir=str(tmp_path / "cache"), workers=1)
+    scanned = ClaudeDataParser(str(claude_dir), use_cache=False, workers=1)
+    assert indexed.search_index is not None
+    assert scanned.search_index is None
+
+    assert result_keys(indexed.search_full_conversations(query)) == \
+        result_keys(scanned.search_full_conversations(query))
+
+
+def test_infix_and_single_character_queries_hit(claude_dir, tmp_path):
+    parser = ClaudeDataParser(str(claude_dir), cache_dir=str(tmp_path / "cache"), workers=1)
+
+    assert [entry['sessionId'] for entry in parser.search_full_conversations('gram')] == ['s1']
+    assert [entry['sessionId'] for entry in parser.search_full_conversations('Error')] == ['s2']
+    assert {entry['sessionId'] for entry in parser.search_full_conversations('x')} == {'s2'}
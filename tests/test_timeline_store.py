@@ -0,0 +1,42 @@
+"""
+时间序列存储的分组数限制
+"""
+
+import pytest
+
+import timeline_store
+from records import HistoryEntry
+from timeline_store import TimelineStore
+
+
+def make_store():
+    store = TimelineStore()
+    entries = [HistoryEntry({'display': 'q' * index, 'timestamp': 1750000000000 + index,
+                             'project': f'/p{index % 3}', 'sessionId': f's{index}'})
+               for index in range(6)]
+    store.append_history(entries, 1, 0, 100)
+    return store
+
+
+@pytest.mark.parametrize('use_numpy', [False, True])
+@pytest.mark.parametrize('limit', [0, -1])
+def test_limit_below_one_is_rejected(monkeypatch, use_numpy, limit):
+    if use_numpy and timeline_store.numpy is None:
+        pytest.skip('NumPy 未安装')
+    if not use_numpy:
+        monkeypatch.setattr(timeline_store, 'numpy', None)
+
+    with pytest.raises(ValueError):
+        make_store().query('history', by='project', limit=limit)
+
+
+@pytest.mark.parametrize('use_numpy', [False, True])
+def test_limit_keeps_largest_groups(monkeypatch, use_numpy):
+    if use_numpy and timeline_store.numpy is None:
+        pytest.skip('NumPy 未安装')
+    if not use_numpy:
+        monkeypatch.setattr(timeline_store, 'numpy', None)
+
+    groups = make_store().query('history', by='project', limit=2)['groups']
+    assert len(groups) == 2
+    assert all(group['count'] == 2 for group in groups)
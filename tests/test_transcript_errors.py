@@ -0,0 +1,45 @@
+"""
+对话文件中无法解析的行的跳过与计数
+"""
+
+import pytest
+
+from claude_parser import ClaudeDataParser
+from conftest import assistant_line, user_line, write_jsonl
+
+
+@pytest.mark.parametrize('bad_line, counted', [
+    (b'{"type":"user", broken', True),          # 通过预筛选的消息行，解码失败
+    (b'{bad json', True),                         # 未通过预筛选，首尾字符不像 JSON 对象
+    (b'not json at all', True),
+    (b'{"type":"summary", broken}', False),       # 未通过预筛选，首尾字符正常，不解码也不计数
+    (b'{"type":"summary","summary":"ok"}', False),
+])
+def test_bad_lines_are_skipped_and_counted(tmp_path, bad_line, counted):
+    root = tmp_path / "claude"
+    write_jsonl(root / "history.jsonl", [])
+    transcript = root / "projects" / "-p" / "s1.jsonl"
+    write_jsonl(transcript, [user_line('hello', 'u1')])
+    with open(transcript, 'ab') as f:
+        f.write(bad_line + b'\n')
+    with open(transcript, 'ab') as f:
+        f.write(b'{"type":"assistant","uuid":"a1","timestamp":"2025-06-15T10:00:01.000Z",'
+                b'"message":{"role":"assistant","content":"world"}}\n')
+
+    parser = ClaudeDataParser(str(root), use_cache=False, workers=1)
+    messages = parser.get_session_messages('s1')['messages']
+
+    assert [message['uuid'] for message in messages] == ['u1', 'a1']
+    assert parser.get_parse_errors()['transcript_lines'] == (1 if counted else 0)
+
+
+def test_unterminated_last_line_is_not_counted(tmp_path):
+    root = tmp_path / "claude"
+    write_jsonl(root / "history.jsonl", [])
+    write_jsonl(root / "projects" / "-p" / "s1.jsonl",
+                [user_line('hello', 'u1'), assistant_line('world', 'a1')], tail=b'{bad json')
+
+    parser = ClaudeDataParser(str(root), use_cache=False, workers=1)
+
+    assert len(parser.get_session_messages('s1')['messages']) == 2
+    assert parser.get_parse_errors()['transcript_lines'] == 0
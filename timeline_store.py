@@ -0,0 +1,623 @@
+"""
+Claude Code 时间序列列式存储
+历史记录（时间戳、会话、项目、问题长度）和对话消息（时间戳、会话、类型、内容长度）的元数据
+按列保存在定长数组（array.array）中，日期范围过滤和按天/月/项目/会话/类型分组统计在整列上进行:
+安装了 NumPy 时使用向量化运算，否则逐行计算，两者结果相同。
+
+各列保存在缓存目录的 timeline/ 下，每列一个文件，内容为本机字节序的定长数组，
+可以直接用 numpy.memmap 映射后分析；timeline.json 记录各列的类型、行数和会话/项目名称表。
+启动时通过 mmap 读入这些文件，之后只需按文件版本补充变化过的对话文件。
+多个进程共用缓存目录时，替换 timeline.json 和删除旧列文件在 timeline.lock 的排他锁内进行，
+读入时持有共享锁（仅类 Unix 系统，Windows 上只有单进程的 waitress）
+"""
+
+import heapq
+import json
+import mmap
+import os
+import sys
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from records import parse_iso_timestamp
+
+try:
+    import numpy
+except ImportError:  # 未安装 NumPy 时逐行计算
+    numpy = None
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，不加文件锁
+    fcntl = None
+
+# 持久化格式版本，列的定义变化时递增，旧文件会被忽略
+FORMAT_VERSION = 1
+
+# 各表的列: (列名, array 类型码)
+HISTORY_COLUMNS = (('timestamp', 'q'), ('session', 'i'), ('project', 'i'), ('length', 'i'))
+MESSAGE_COLUMNS = (('timestamp', 'q'), ('session', 'i'), ('type', 'b'), ('length', 'i'), ('live', 'b'))
+
+# 消息类型编号
+MESSAGE_TYPE_CODES = {'user': 0, 'assistant': 1}
+MESSAGE_TYPE_NAMES = ('user', 'assistant')
+
+# 支持的分组方式
+GROUP_BY = ('day', 'month', 'project', 'session', 'type')
+
+# 按天分组时先按 15 分钟分桶（所有时区的偏移都是 15 分钟的整数倍），再把各桶换算为本地日期
+TIME_BUCKET_MS = 15 * 60 * 1000
+
+# 分组键的取值范围不超过该数量（或行数）时用 bincount 直接计数，否则先排序去重
+DENSE_GROUP_LIMIT = 1 << 20
+
+# 两次写入磁盘之间的最短间隔（秒）
+SAVE_INTERVAL = 30.0
+
+# 已删除的消息行超过该数量且多于有效行时压缩消息表
+COMPACT_MIN_ROWS = 10000
+
+
+class ColumnTable:
+    """一组等长的列，每列是一个 array.array"""
+
+    def __init__(self, columns: Tuple[Tuple[str, str], ...]):
+        self.typecodes = dict(columns)
+        self.columns = {name: array(code) for name, code in columns}
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values())))
+
+    def append(self, row: tuple):
+        """追加一行，row 按列定义的顺序排列"""
+        for column, value in zip(self.columns.values(), row):
+            column.append(value)
+
+    def clear(self):
+        """清空所有行"""
+        for name, code in self.typecodes.items():
+            self.columns[name] = array(code)
+
+    def view(self, name: str):
+        """
+        获取一列的 NumPy 视图（不复制数据），未安装 NumPy 时返回 array 本身
+
+        视图存在期间 array 不能改变长度，调用方需持有存储的锁并在返回前释放视图
+        """
+        column = self.columns[name]
+        if numpy is None:
+            return column
+        return numpy.frombuffer(column, dtype=numpy.dtype(column.typecode))
+
+    def compress(self, keep):
+        """只保留 keep 为真的行"""
+        for name, column in self.columns.items():
+            kept = array(column.typecode)
+            if numpy is not None:
+                kept.frombytes(self.view(name)[keep].tobytes())
+            else:
+                kept.extend(value for value, flag in zip(column, keep) if flag)
+            self.columns[name] = kept
+
+    def load(self, directory: Path, prefix: str, rows: int) -> bool:
+        """
+        通过 mmap 读入各列文件
+
+        Args:
+            directory: 存储目录
+            prefix: 文件名前缀（表名和版本号）
+            rows: 元数据中记录的行数
+
+        Returns:
+            bool: 所有列文件都存在且长度与行数一致时返回 True
+        """
+        columns = {}
+        for name, code in self.typecodes.items():
+            column = array(code)
+            path = directory / f"{prefix}.{name}.bin"
+            if os.path.getsize(path) != rows * column.itemsize:
+                return False
+            if rows:
+                with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    column.frombytes(mapped)
+            columns[name] = column
+        self.columns = columns
+        return True
+
+
+class TimelineStore:
+    """历史记录和对话消息元数据的列式存储"""
+
+    def __init__(self, cache_dir: str = None):
+        """
+        初始化存储，指定缓存目录时读入已保存的数据
+
+        Args:
+            cache_dir: 缓存目录，数据保存在其中的 timeline/ 下；为 None 时只保存在内存中
+        """
+        self.directory = Path(cache_dir) / "timeline" if cache_dir else None
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._reset()
+
+        if self.directory is not None:
+            try:
+                self._load()
+            except Exception as e:
+                print(f"读取时间序列数据时出错，将重新生成: {e}")
+                self._reset()
+
+    def _reset(self):
+        """清空所有数据"""
+        self.history = ColumnTable(HISTORY_COLUMNS)
+        self.messages = ColumnTable(MESSAGE_COLUMNS)
+
+        # 会话和项目名称表，列中保存的是名称在表中的编号
+        self._sessions: List[str] = []
+        self._session_codes: Dict[str, int] = {}
+        self._projects: List[str] = []
+        self._project_codes: Dict[str, int] = {}
+        # 会话编号 -> 项目编号（取自历史记录，-1 表示未知），消息按项目分组时使用
+        self._session_project = array('i')
+
+        # 历史记录已写入到的位置 (inode, 字节位置)
+        self._history_key = None
+        # 会话编号 -> (对话文件路径, 文件版本 (inode, mtime_ns, size), 已写入的消息数)
+        self._transcripts: Dict[int, tuple] = {}
+        self._dead_rows = 0
+
+        self._generation = 0
+        self._dirty = False
+        self._saved_at = 0.0
+
+    def _session_code(self, session_id: Optional[str]) -> int:
+        if not session_id:
+            return -1
+        code = self._session_codes.get(session_id)
+        if code is None:
+            code = self._session_codes[session_id] = len(self._sessions)
+            self._sessions.append(session_id)
+            self._session_project.append(-1)
+        return code
+
+    def _project_code(self, project: Optional[str]) -> int:
+        if not project:
+            return -1
+        code = self._project_codes.get(project)
+        if code is None:
+            code = self._project_codes[project] = len(self._projects)
+            self._projects.append(project)
+        return code
+
+    def append_history(self, entries: Iterable[Dict], inode: int, start: int, end: int):
+        """
+        写入 history.jsonl 中 [start, end) 这一段新解析的记录
+
+        调用方总是从上次读到的位置继续；位置对不上（文件被替换、截断，或是启动时
+        一次读入整个文件）时清空后重新写入，已保存的数据恰好读到 end 时跳过
+
+        Args:
+            entries: 新解析的历史记录
+            inode: history.jsonl 的 inode
+            start: 这段内容的起始字节位置
+            end: 这段内容的结束字节位置
+        """
+        with self._lock:
+            if self._history_key == (inode, end):
+                return
+            if self._history_key != (inode, start):
+                self.history.clear()
+
+            for entry in entries:
+                timestamp = entry.get('timestamp')
+                if not isinstance(timestamp, int):
+                    continue
+                session = self._session_code(entry.get('sessionId'))
+                project = self._project_code(entry.get('project'))
+                if session >= 0:
+                    self._session_project[session] = project
+                self.history.append((timestamp, session, project, len(entry.get('display') or '')))
+
+            self._history_key = (inode, end)
+            self._dirty = True
+
+    def is_current(self, session_id: str, version: tuple) -> bool:
+        """会话的对话文件是否已按该版本 (inode, mtime_ns, size) 写入"""
+        code = self._session_codes.get(session_id)
+        current = self._transcripts.get(code) if code is not None else None
+        return current is not None and current[1] == version
+
+    def update_transcript(self, session_id: str, path: str, version: tuple, messages: List[Dict]):
+        """
+        写入一个对话文件的消息元数据
+
+        对话文件只会追加写入：同一文件只是变大时保留已写入的消息，只追加新增的部分；
+        否则把该会话已有的行标记为删除后重新写入。没有时间戳的消息不写入
+
+        Args:
+            session_id: 会话ID
+            path: 对话文件路径
+            version: 文件版本 (inode, mtime_ns, size)
+            messages: 完整的消息列表
+        """
+        with self._lock:
+            code = self._session_code(session_id)
+            previous = self._transcripts.get(code)
+            if previous is not None and previous[1] == version:
+                return
+
+            start = 0
+            if previous is not None:
+                old_path, (inode, _, size), count = previous
+                if old_path == path and inode == version[0] and size <= version[2] and count <= len(messages):
+                    start = count
+                else:
+                    self._drop_rows(code)
+
+            for message in messages[start:]:
+                timestamp = parse_iso_timestamp(message['timestamp'])
+                if timestamp is None:
+                    continue
+                message_type = MESSAGE_TYPE_CODES.get(message['type'], 0)
+                self.messages.append((timestamp, code, message_type, len(message['content']), 1))
+
+            self._transcripts[code] = (path, version, len(messages))
+            self._dirty = True
+
+    def remove_transcript(self, session_id: str):
+        """移除已删除的对话文件的消息元数据"""
+        with self._lock:
+            code = self._session_codes.get(session_id)
+            if code is not None and self._transcripts.pop(code, None) is not None:
+                self._drop_rows(code)
+                self._dirty = True
+
+    def transcripts(self) -> List[str]:
+        """已写入消息元数据的会话ID"""
+        with self._lock:
+            return [self._sessions[code] for code in self._transcripts]
+
+    def _drop_rows(self, code: int):
+        """将会话的消息行标记为删除，删除的行过多时压缩消息表"""
+        if numpy is not None:
+            live = self.messages.view('live')
+            rows = (self.messages.view('session') == code) & (live != 0)
+            dropped = int(rows.sum())
+            live[rows] = 0
+            del live, rows
+        else:
+            live = self.messages.columns['live']
+            dropped = 0
+            for i, session in enumerate(self.messages.columns['session']):
+                if session == code and live[i]:
+                    live[i] = 0
+                    dropped += 1
+
+        self._dead_rows += dropped
+        if self._dead_rows >= COMPACT_MIN_ROWS and self._dead_rows * 2 > len(self.messages):
+            keep = self.messages.view('live') != 0 if numpy is not None else self.messages.columns['live']
+            self.messages.compress(keep)
+            del keep
+            self._dead_rows = 0
+
+    def query(self, source: str = 'history', start: int = None, end: int = None,
+              by: str = 'day', limit: int = None) -> Dict:
+        """
+        按时间范围过滤并分组统计
+
+        Args:
+            source: history（历史记录中的提问）或 messages（对话消息）
+            start: 起始时间（毫秒，包含），None 表示不限
+            end: 结束时间（毫秒，不包含），None 表示不限
+            by: 分组方式，day / month（本地日期）、project、session、type（仅 messages）
+            limit: 按项目、会话或类型分组时最多返回的分组数（行数最多的），None 表示全部
+
+        Returns:
+            Dict: 包含 count（行数）、length（内容长度合计）和 groups 的字典；
+                  groups 中每项为 {'key', 'count', 'length'}，按时间分组时按时间排序，否则按行数倒序
+
+        Raises:
+            ValueError: source 或 by 不支持，或 limit 小于 1
+        """
+        if source not in ('history', 'messages'):
+            raise ValueError(f"未知的数据来源: {source}")
+        if limit is not None and limit < 1:
+            raise ValueError(f"分组数必须大于 0: {limit}")
+        if by not in GROUP_BY or (by == 'type' and source != 'messages'):
+            raise ValueError(f"未知的分组方式: {by}")
+
+        with self._lock:
+            table = self.history if source == 'history' else self.messages
+            if numpy is not None:
+                raw, count, length = self._group_numpy(table, source, start, end, by, limit)
+            else:
+                raw, count, length = self._group_python(table, source, start, end, by)
+            names = self._key_names(by)
+
+        return {
+            'count': count,
+            'length': length,
+            'groups': self._label_groups(by, raw, names, limit)
+        }
+
+    def _key_column(self, table: ColumnTable, source: str, by: str) -> str:
+        if by in ('day', 'month'):
+            return 'timestamp'
+        if by == 'project' and source == 'history':
+            return 'project'
+        if by == 'type':
+            return 'type'
+        return 'session'
+
+    def _group_numpy(self, table: ColumnTable, source: str, start: Optional[int],
+                     end: Optional[int], by: str, limit: Optional[int]) -> Tuple[Dict[int, list], int, int]:
+        """
+        向量化计算各分组的行数和长度合计
+
+        Returns:
+            tuple: (原始分组键 -> [行数, 长度], 总行数, 总长度)；指定 limit 时只保留行数最多的分组
+        """
+        timestamps = table.view('timestamp')
+        mask = table.view('live') != 0 if source == 'messages' else None
+        if start is not None:
+            mask = timestamps >= start if mask is None else mask & (timestamps >= start)
+        if end is not None:
+            mask = timestamps < end if mask is None else mask & (timestamps < end)
+
+        keys = table.view(self._key_column(table, source, by))
+        lengths = table.view('length')
+        if mask is not None:
+            keys, lengths = keys[mask], lengths[mask]
+        del timestamps, mask
+
+        if by in ('day', 'month'):
+            keys = keys // TIME_BUCKET_MS
+        elif by == 'project' and source == 'messages':
+            # 消息所属项目通过会话编号查表得到
+            session_project = numpy.append(numpy.frombuffer(self._session_project, dtype=numpy.int32), -1)
+            keys = session_project[keys]
+
+        if not len(keys):
+            return {}, 0, 0
+
+        # 分组键（编号、时间桶）分布较密集时直接按下标计数，不需要排序
+        low = int(keys.min())
+        span = int(keys.max()) - low + 1
+        if span <= max(len(keys), DENSE_GROUP_LIMIT):
+            shifted = keys.astype(numpy.int64) - low
+            counts = numpy.bincount(shifted, minlength=span)
+            sums = numpy.bincount(shifted, weights=lengths, minlength=span)
+            present = numpy.flatnonzero(counts)
+            values, counts, sums = present + low, counts[present], sums[present]
+        else:
+            values, inverse = numpy.unique(keys, return_inverse=True)
+            counts = numpy.bincount(inverse, minlength=len(values))
+            sums = numpy.bincount(inverse, weights=lengths, minlength=len(values))
+
+        if limit is not None and by not in ('day', 'month'):
+            top = numpy.lexsort((values, -counts))[:limit]
+            values, counts, sums = values[top], counts[top], sums[top]
+
+        raw = {key: [count, int(total)]
+               for key, count, total in zip(values.tolist(), counts.tolist(), sums.tolist())}
+        return raw, len(keys), int(lengths.sum(dtype=numpy.int64))
+
+    def _group_python(self, table: ColumnTable, source: str, start: Optional[int],
+                      end: Optional[int], by: str) -> Tuple[Dict[int, list], int, int]:
+        """逐行计算各分组的行数和长度合计，结果与 _group_numpy 相同（limit 由调用方处理）"""
+        columns = table.columns
+        live = columns['live'] if source == 'messages' else None
+        keys = columns[self._key_column(table, source, by)]
+        session_project = self._session_project if by == 'project' and source == 'messages' else None
+
+        raw: Dict[int, list] = {}
+        for i, (timestamp, key, length) in enumerate(zip(columns['timestamp'], keys, columns['length'])):
+            if live is not None and not live[i]:
+                continue
+            if (start is not None and timestamp < start) or (end is not None and timestamp >= end):
+                continue
+            if by in ('day', 'month'):
+                key //= TIME_BUCKET_MS
+            elif session_project is not None:
+                key = session_project[key] if key >= 0 else -1
+
+            totals = raw.get(key)
+            if totals is None:
+                raw[key] = [1, length]
+            else:
+                totals[0] += 1
+                totals[1] += length
+
+        return (raw, sum(totals[0] for totals in raw.values()),
+                sum(totals[1] for totals in raw.values()))
+
+    def _key_names(self, by: str) -> Optional[List[str]]:
+        if by == 'project':
+            return list(self._projects)
+        if by == 'session':
+            return list(self._sessions)
+        if by == 'type':
+            return list(MESSAGE_TYPE_NAMES)
+        return None
+
+    @staticmethod
+    def _label_groups(by: str, raw: Dict[int, list], names: Optional[List[str]],
+                      limit: Optional[int] = None) -> List[Dict]:
+        """将原始分组键换算为日期或名称，合并同一日期的时间桶"""
+        if by in ('day', 'month'):
+            width = 10 if by == 'day' else 7
+            merged: Dict[str, list] = {}
+            key = None
+            next_day = None
+            # 按时间顺序遍历时间桶，每天只换算一次本地日期
+            for bucket in sorted(raw):
+                if next_day is None or bucket >= next_day:
+                    day = datetime.fromtimestamp(bucket * TIME_BUCKET_MS / 1000).replace(
+                        hour=0, minute=0, second=0, microsecond=0)
+                    key = day.strftime('%Y-%m-%d')[:width]
+                    next_day = int((day + timedelta(days=1)).timestamp() * 1000) // TIME_BUCKET_MS
+                count, length = raw[bucket]
+                totals = merged.get(key)
+                if totals is None:
+                    merged[key] = [count, length]
+                else:
+                    totals[0] += count
+                    totals[1] += length
+            return [{'key': key, 'count': count, 'length': length}
+                    for key, (count, length) in merged.items()]
+
+        # 行数相同时按编号排序，NumPy 和逐行计算的结果顺序一致
+        def order(item):
+            return -item[1][0], item[0]
+
+        if limit is not None:
+            ordered = heapq.nsmallest(limit, raw.items(), key=order)
+        else:
+            ordered = sorted(raw.items(), key=order)
+        return [{'key': names[code] if code >= 0 else None, 'count': count, 'length': length}
+                for code, (count, length) in ordered]
+
+    def save(self, force: bool = False):
+        """
+        将数据写入缓存目录；距上次写入不足 SAVE_INTERVAL 秒时跳过（force 为 True 时除外）
+
+        列文件名带有本次写入的版本号（纳秒时间戳，多个进程共用缓存目录时也不会重复），
+        新文件全部写好后才在文件锁内替换 timeline.json，其他进程读到的总是一组完整的文件；
+        timeline.json 已经引用了更新的版本时不替换。之后只删除比当前引用版本更旧的列文件
+        """
+        if self.directory is None or not self._dirty:
+            return
+        if not force and time.monotonic() - self._saved_at < SAVE_INTERVAL:
+            return
+
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                generation = self._generation = time.time_ns()
+                tables = {name: {column: data.tobytes() for column, data in table.columns.items()}
+                          for name, table in (('history', self.history), ('messages', self.messages))}
+                meta = {
+                    'format': FORMAT_VERSION,
+                    'byteorder': sys.byteorder,
+                    'generation': generation,
+                    'rows': {'history': len(self.history), 'messages': len(self.messages)},
+                    'dead_rows': self._dead_rows,
+                    'sessions': list(self._sessions),
+                    'projects': list(self._projects),
+                    'session_project': self._session_project.tolist(),
+                    'history_key': self._history_key,
+                    'transcripts': {str(code): [path, list(version), count]
+                                    for code, (path, version, count) in self._transcripts.items()}
+                }
+                self._dirty = False
+                self._saved_at = time.monotonic()
+
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                for name, columns in tables.items():
+                    for column, data in columns.items():
+                        with open(self.directory / f"{name}-{generation}.{column}.bin", 'wb') as f:
+                            f.write(data)
+
+                meta_file = self.directory / "timeline.json"
+                temp_file = self.directory / f"timeline.json.{os.getpid()}.tmp"
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump(meta, f, ensure_ascii=False)
+
+                with self._file_lock(exclusive=True):
+                    # 其他进程已经写入了更新的版本时保留它，删除本次写入的文件
+                    current = self._saved_generation()
+                    if current is not None and current > generation:
+                        os.unlink(temp_file)
+                        current_generation = current
+                    else:
+                        os.replace(temp_file, meta_file)
+                        current_generation = generation
+
+                    # 只删除比 timeline.json 引用的版本更旧的列文件（包括被跳过的本次写入），
+                    # 其他进程正在写入的更新版本不受影响
+                    for path in self.directory.glob("*.bin"):
+                        if self._file_generation(path) < current_generation:
+                            try:
+                                path.unlink()
+                            except FileNotFoundError:
+                                pass
+            except OSError as e:
+                print(f"保存时间序列数据时出错: {e}")
+                self._dirty = True
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        """
+        持有缓存目录的文件锁，多个进程共用缓存目录时串行化写入和读入
+
+        Args:
+            exclusive: True 为排他锁（写入），False 为共享锁（读入）
+        """
+        if fcntl is None:
+            yield
+            return
+
+        with open(self.directory / "timeline.lock", 'a+b') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    def _saved_generation(self) -> Optional[int]:
+        """timeline.json 当前引用的版本号，文件不存在或无法读取时返回 None"""
+        try:
+            with open(self.directory / "timeline.json", 'r', encoding='utf-8') as f:
+                return int(json.load(f)['generation'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    @staticmethod
+    def _file_generation(path: Path) -> int:
+        """从列文件名（{表名}-{版本号}.{列名}.bin）中取出版本号，无法识别时返回 0"""
+        try:
+            return int(path.name.split('.', 1)[0].rsplit('-', 1)[-1])
+        except ValueError:
+            return 0
+
+    def _load(self):
+        """读入已保存的数据，持有共享锁，避免读入期间其他进程删除列文件"""
+        if not self.directory.is_dir():
+            return
+        with self._file_lock(exclusive=False):
+            self._load_columns()
+
+    def _load_columns(self):
+        """读入 timeline.json 引用的各列文件，格式或字节序不一致时忽略"""
+        try:
+            with open(self.directory / "timeline.json", 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if meta.get('format') != FORMAT_VERSION or meta.get('byteorder') != sys.byteorder:
+            return
+
+        generation = meta['generation']
+        for name, table in (('history', self.history), ('messages', self.messages)):
+            if not table.load(self.directory, f"{name}-{generation}", meta['rows'][name]):
+                self._reset()
+                return
+
+        self._sessions = meta['sessions']
+        self._session_codes = {session_id: code for code, session_id in enumerate(self._sessions)}
+        self._projects = meta['projects']
+        self._project_codes = {project: code for code, project in enumerate(self._projects)}
+        self._session_project = array('i', meta['session_project'])
+        self._history_key = tuple(meta['history_key']) if meta['history_key'] else None
+        self._transcripts = {int(code): (path, tuple(version), count)
+                             for code, (path, version, count) in meta['transcripts'].items()}
+        self._dead_rows = meta['dead_rows']
+        self._generation = generation
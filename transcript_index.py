@@ -0,0 +1,113 @@
+"""
+Claude Code 对话文件按行随机读取
+通过 mmap 扫描对话文件，记录每条消息所在行的起始字节位置，
+之后可以只解码第 N..M 条消息，不需要把整个文件解析到内存
+"""
+
+import mmap
+from array import array
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+
+def build_message_offsets(path: Path, is_message: Callable[[bytes], bool],
+                          start: int = 0, offsets: array = None) -> Tuple[array, int]:
+    """
+    扫描对话文件，记录消息行的起始位置
+
+    最后一行没有换行符时可能还没写完，不做处理，返回的扫描位置停在该行开头；
+    文件变长后传入上次的结果和扫描位置，只需扫描新追加的部分
+
+    Args:
+        path: 对话文件路径
+        is_message: 判断一行是否为需要展示的消息的函数
+        start: 开始扫描的字节位置（必须是行首）
+        offsets: 已有的消息行起始位置，新找到的位置追加在其后（会被修改）
+
+    Returns:
+        tuple: (消息行起始字节位置（'Q' 类型数组，按文件顺序排列）, 已扫描到的字节位置)
+
+    Raises:
+        OSError: 文件无法读取
+    """
+    if offsets is None:
+        offsets = array('Q')
+
+    with open(path, 'rb') as f:
+        # 空文件无法 mmap
+        if f.seek(0, 2) <= start:
+            return offsets, start
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            while start < size:
+                end = mm.find(b'\n', start)
+                if end < 0:
+                    break
+
+                line = mm[start:end]
+                if line.strip() and is_message(line):
+                    offsets.append(start)
+                start = end + 1
+
+    return offsets, start
+
+
+def read_lines_at(path: Path, offsets: Iterable[int]) -> List[bytes]:
+    """
+    读取从指定位置开始的若干行
+
+    Args:
+        path: 对话文件路径
+        offsets: 各行的起始字节位置
+
+    Returns:
+        List[bytes]: 各行内容（不含换行符）；超出文件末尾的位置被忽略
+
+    Raises:
+        OSError: 文件无法读取
+    """
+    lines = []
+
+    with open(path, 'rb') as f:
+        if f.seek(0, 2) == 0:
+            return lines
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            for start in offsets:
+                if start >= size:
+                    continue
+                end = mm.find(b'\n', start)
+                lines.append(mm[start:end if end >= 0 else size])
+
+    return lines
+
+
+def find_lines_containing(path: Path, needle: bytes) -> Iterator[int]:
+    """
+    按字节查找包含 needle 的行
+
+    Args:
+        path: 对话文件路径
+        needle: 要查找的字节串
+
+    Yields:
+        int: 包含 needle 的各行起始字节位置（同一行只返回一次）
+
+    Raises:
+        OSError: 文件无法读取
+    """
+    with open(path, 'rb') as f:
+        if f.seek(0, 2) == 0 or not needle:
+            return
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            position = mm.find(needle)
+            while position >= 0:
+                line_start = mm.rfind(b'\n', 0, position) + 1
+                line_end = mm.find(b'\n', position)
+                yield line_start
+                if line_end < 0:
+                    return
+                position = mm.find(needle, line_end + 1)